@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GamesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'games'
+
+    def ready(self):
+        # Подключают сброс партий при выходе и обновление таблиц лидеров
+        from . import leaderboard, state_store  # noqa: F401
@@ -0,0 +1,275 @@
+"""
+Пакетный движок 2048 на NumPy.
+
+Массив битовых досок (uint64, формат engine_2048) обрабатывается целиком:
+ходы - через те же таблицы строк, транспонирование - векторными битовыми
+операциями, появление плиток - одной выборкой на весь массив.
+Используется командой simulate_2048 для бенчмарков и проверки правил.
+"""
+import numpy as np
+
+from . import engine_2048, expectimax_2048
+
+DIRECTIONS = engine_2048.DIRECTIONS
+
+ROW_LEFT = np.array(engine_2048.ROW_LEFT, dtype=np.uint64)
+ROW_RIGHT = np.array(engine_2048.ROW_RIGHT, dtype=np.uint64)
+ROW_LEFT_SCORE = np.array(engine_2048.ROW_LEFT_SCORE, dtype=np.int64)
+ROW_RIGHT_SCORE = np.array(engine_2048.ROW_RIGHT_SCORE, dtype=np.int64)
+
+_U = np.uint64
+_ROW_MASK = _U(0xFFFF)
+_ROW_SHIFTS = (_U(0), _U(16), _U(32), _U(48))
+_CELL_SHIFTS = (np.arange(16, dtype=np.uint64) * _U(4))
+
+# Константы splitmix64 (как в engine_2048.SeededRandom)
+_GOLDEN = _U(0x9E3779B97F4A7C15)
+_MIX1 = _U(0xBF58476D1CE4E5B9)
+_MIX2 = _U(0x94D049BB133111EB)
+
+
+def transpose(boards):
+    """Транспонировать массив полей"""
+    a1 = boards & _U(0xF0F00F0FF0F00F0F)
+    a2 = boards & _U(0x0000F0F00000F0F0)
+    a3 = boards & _U(0x0F0F00000F0F0000)
+    a = a1 | (a2 << _U(12)) | (a3 >> _U(12))
+    b1 = a & _U(0xFF00FF0000FF00FF)
+    b2 = a & _U(0x00FF00FF00000000)
+    b3 = a & _U(0x00000000FF00FF00)
+    return b1 | (b2 >> _U(24)) | (b3 << _U(24))
+
+
+def _apply_rows(boards, table, score_table):
+    result = np.zeros_like(boards)
+    score = np.zeros(boards.shape, dtype=np.int64)
+    for shift in _ROW_SHIFTS:
+        rows = ((boards >> shift) & _ROW_MASK).astype(np.intp)
+        result |= table[rows] << shift
+        score += score_table[rows]
+    return result, score
+
+
+def move(boards, direction):
+    """Сделать ход на всех полях. Возвращает (новые поля, очки)"""
+    if direction == 'left':
+        return _apply_rows(boards, ROW_LEFT, ROW_LEFT_SCORE)
+    if direction == 'right':
+        return _apply_rows(boards, ROW_RIGHT, ROW_RIGHT_SCORE)
+    if direction == 'up':
+        result, score = _apply_rows(transpose(boards), ROW_LEFT, ROW_LEFT_SCORE)
+        return transpose(result), score
+    if direction == 'down':
+        result, score = _apply_rows(transpose(boards), ROW_RIGHT, ROW_RIGHT_SCORE)
+        return transpose(result), score
+    raise ValueError(f'Неизвестное направление: {direction}')
+
+
+def move_all(boards):
+    """Все четыре хода сразу: поля (N, 4) и очки (N, 4) в порядке DIRECTIONS"""
+    results = np.empty((boards.shape[0], len(DIRECTIONS)), dtype=np.uint64)
+    scores = np.empty((boards.shape[0], len(DIRECTIONS)), dtype=np.int64)
+    for k, direction in enumerate(DIRECTIONS):
+        results[:, k], scores[:, k] = move(boards, direction)
+    return results, scores
+
+
+def cells(boards):
+    """Показатели всех клеток: массив (N, 16)"""
+    return ((boards[:, None] >> _CELL_SHIFTS) & _U(0xF)).astype(np.uint8)
+
+
+def count_empty(boards):
+    return (cells(boards) == 0).sum(axis=1)
+
+
+def max_exponent(boards):
+    return cells(boards).max(axis=1)
+
+
+def tile_sums(boards):
+    """Сумма значений плиток каждого поля (ход её не меняет)"""
+    exponents = cells(boards).astype(np.int64)
+    return np.where(exponents > 0, np.left_shift(1, exponents), 0).sum(axis=1)
+
+
+def spawn(boards, rng, four_probability=engine_2048.FOUR_PROBABILITY):
+    """Добавить по одной плитке на каждое поле, где есть пустая клетка"""
+    empty = cells(boards) == 0
+    # Случайная пустая клетка: argmax по случайным ключам, занятые клетки исключены
+    keys = rng.random(empty.shape)
+    keys[~empty] = -1.0
+    positions = keys.argmax(axis=1).astype(np.uint64)
+    exponents = np.where(rng.random(boards.shape[0]) < four_probability, _U(2), _U(1))
+    has_empty = empty.any(axis=1)
+    spawned = boards | (exponents << (positions * _U(4)))
+    return np.where(has_empty, spawned, boards)
+
+
+def _next64(states):
+    """Шаг splitmix64 для массива состояний: (новые состояния, случайные числа)"""
+    states = states + _GOLDEN
+    z = states ^ (states >> _U(30))
+    z = z * _MIX1
+    z = (z ^ (z >> _U(27))) * _MIX2
+    return states, z ^ (z >> _U(31))
+
+
+def _uniform(z):
+    return (z >> _U(11)).astype(np.float64) / float(1 << 53)
+
+
+def spawn_seeded(boards, states, four_probability=engine_2048.FOUR_PROBABILITY):
+    """
+    Добавить плитку так же, как engine_2048.spawn_tile с SeededRandom.
+
+    Все поля должны иметь пустую клетку. Возвращает (поля, состояния).
+    """
+    empty = cells(boards) == 0
+    states, z = _next64(states)
+    k = (_uniform(z) * empty.sum(axis=1)).astype(np.int64)
+    positions = (np.cumsum(empty, axis=1) > k[:, None]).argmax(axis=1).astype(np.uint64)
+    states, z = _next64(states)
+    exponents = np.where(_uniform(z) < four_probability, _U(2), _U(1))
+    return boards | (exponents << (positions * _U(4))), states
+
+
+def replay_logs(seeds, logs, counts):
+    """
+    Переиграть сразу много записей партий (см. replay_2048).
+
+    seeds, counts - последовательности целых, logs - упакованные журналы
+    (bytes). Возвращает словарь массивов valid, scores, boards.
+    """
+    games = len(seeds)
+    counts = np.asarray(counts, dtype=np.int64)
+    width = max([len(log) for log in logs] + [1])
+    packed = np.zeros((games, width), dtype=np.uint8)
+    for n, log in enumerate(logs):
+        packed[n, :len(log)] = np.frombuffer(log, dtype=np.uint8)
+    # Журнал короче заявленного числа ходов - запись некорректна
+    valid = np.array([len(log) * 4 >= count for log, count in zip(logs, counts.tolist())], dtype=bool)
+
+    states = np.array([seed & 0xFFFFFFFFFFFFFFFF for seed in seeds], dtype=np.uint64)
+    boards = np.zeros(games, dtype=np.uint64)
+    boards, states = spawn_seeded(boards, states)
+    boards, states = spawn_seeded(boards, states)
+    scores = np.zeros(games, dtype=np.int64)
+
+    for step in range(int(counts.max()) if games else 0):
+        active = np.flatnonzero(valid & (counts > step))
+        if not active.size:
+            break
+        directions = (packed[active, step >> 2] >> ((step & 3) << 1)) & 3
+
+        new_boards = np.empty(active.size, dtype=np.uint64)
+        gained = np.empty(active.size, dtype=np.int64)
+        for k, direction in enumerate(DIRECTIONS):
+            chosen = directions == k
+            if chosen.any():
+                new_boards[chosen], gained[chosen] = move(boards[active[chosen]], direction)
+
+        # Ход, не изменивший поле, в журнале быть не может
+        moved = new_boards != boards[active]
+        valid[active[~moved]] = False
+        active, new_boards, gained = active[moved], new_boards[moved], gained[moved]
+
+        scores[active] += gained
+        boards[active], states[active] = spawn_seeded(new_boards, states[active])
+
+    return {'valid': valid, 'scores': scores, 'boards': boards}
+
+
+def choose_random(boards, results, scores, rng):
+    """Случайный допустимый ход"""
+    legal = results != boards[:, None]
+    keys = rng.random(legal.shape)
+    keys[~legal] = -1.0
+    return keys.argmax(axis=1)
+
+
+def choose_greedy(boards, results, scores, rng):
+    """Ход с наибольшими очками; при равенстве - с наибольшим числом пустых клеток"""
+    legal = results != boards[:, None]
+    empty = np.stack([count_empty(results[:, k]) for k in range(len(DIRECTIONS))], axis=1)
+    keys = scores.astype(np.float64) * 32 + empty + rng.random(legal.shape) * 0.5
+    keys[~legal] = -1.0
+    return keys.argmax(axis=1)
+
+
+def make_expectimax_policy(depth, time_budget):
+    """Expectimax по одному полю (не векторизуется, для небольших прогонов)"""
+    index = {direction: k for k, direction in enumerate(DIRECTIONS)}
+
+    def choose_expectimax(boards, results, scores, rng):
+        choices = np.zeros(boards.shape[0], dtype=np.intp)
+        for n, board in enumerate(boards.tolist()):
+            direction = expectimax_2048.best_move(board, depth, time_budget)['direction']
+            if direction is not None:
+                choices[n] = index[direction]
+        return choices
+
+    return choose_expectimax
+
+
+def simulate(games, policy, rng, four_probability=engine_2048.FOUR_PROBABILITY,
+             max_moves=None, verify=0):
+    """
+    Сыграть games партий одновременно (не более max_moves ходов в каждой).
+
+    Возвращает словарь с итоговыми полями, очками, числом ходов
+    каждой партии и общим числом сделанных ходов. При verify > 0 на всех
+    полях проверяется сохранение суммы плиток, а ходы первых verify
+    активных полей сверяются со скалярным engine_2048.
+    """
+    boards = np.zeros(games, dtype=np.uint64)
+    boards = spawn(spawn(boards, rng, four_probability), rng, four_probability)
+    scores = np.zeros(games, dtype=np.int64)
+    moves = np.zeros(games, dtype=np.int64)
+    alive = np.arange(games)
+    total_moves = 0
+    step = 0
+
+    while alive.size and (max_moves is None or step < max_moves):
+        step += 1
+        current = boards[alive]
+        results, gained = move_all(current)
+        legal = results != current[:, None]
+        has_move = legal.any(axis=1)
+
+        # Партии без допустимых ходов окончены
+        alive = alive[has_move]
+        if not alive.size:
+            break
+        current, results, gained = current[has_move], results[has_move], gained[has_move]
+
+        choice = policy(current, results, gained, rng)
+        rows = np.arange(alive.size)
+        new_boards = results[rows, choice]
+        new_scores = gained[rows, choice]
+
+        if verify:
+            broken = np.flatnonzero(tile_sums(new_boards) != tile_sums(current))
+            if broken.size:
+                raise AssertionError(
+                    f'Ход изменил сумму плиток: поле {int(current[broken[0]]):#018x}'
+                )
+            for n in range(min(verify, alive.size)):
+                direction = DIRECTIONS[choice[n]]
+                expected, expected_score = engine_2048.move(int(current[n]), direction)
+                if expected != int(new_boards[n]) or expected_score != int(new_scores[n]):
+                    raise AssertionError(
+                        f'Расхождение с engine_2048: поле {int(current[n]):#018x}, ход {direction}'
+                    )
+
+        scores[alive] += new_scores
+        moves[alive] += 1
+        boards[alive] = spawn(new_boards, rng, four_probability)
+        total_moves += alive.size
+
+    return {
+        'boards': boards,
+        'scores': scores,
+        'moves': moves,
+        'total_moves': total_moves,
+    }
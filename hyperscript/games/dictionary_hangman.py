@@ -0,0 +1,358 @@
+"""
+Словарь слов для Виселицы.
+
+Список слов (одно слово в строке) компилируется командой
+build_hangman_dictionary в двоичный файл, который читается через mmap:
+все процессы сервера делят одни и те же страницы, а случайное слово
+нужной длины и сложности достается за O(1) без загрузки списка в память.
+
+Для каждого слова хранится множество его букв - 33-битная маска по
+алфавиту АБВ...Я (бит k - буква ALPHABET[k]), поэтому проверка буквы и
+проверка победы - одна операция над целыми.
+
+Сложность слова считается при сборке: сколько промахов сделает игрок,
+который называет буквы по убыванию их частоты в словаре, прежде чем
+откроет все буквы слова. Слова делятся на трети по этому числу: easy,
+medium и hard.
+
+Для подсказок при сборке строится индекс шаблонов: для каждой длины слова
+и каждой позиции - битовая карта слов с буквой k в этой позиции (бит i -
+i-е слово этой длины), плюс карта слов, содержащих букву k где угодно.
+Сужение кандидатов по открытому шаблону и подсчет слов с буквой - это
+побитовые операции над картами, без перебора слов.
+
+Формат файла (little-endian):
+    заголовок   HEADER: сигнатура, версия, число корзин, число слов, число длин
+    индекс      BUCKET для каждой корзины: длина, сложность, смещение, число слов
+    длины       LENGTH для каждой длины: длина, смещение первой записи,
+                число слов, смещение битовых карт
+    записи      по корзинам, отсортированы по (длина, сложность, слово);
+                запись - маска (8 байт) и слово в cp1251 (длина байт)
+    карты       для каждой длины L: L * 33 карт позиций (позиция, буква),
+                затем 33 карты "буква есть в слове"; карта - (n + 7) // 8 байт
+"""
+import bisect
+import mmap
+import os
+import random
+import struct
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+ALPHABET = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+
+LETTER_BITS = {letter: 1 << k for k, letter in enumerate(ALPHABET)}
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+MIN_WORD_LENGTH = 3
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+DEFAULT_WORDS_FILE = DATA_DIR / 'hangman_words.txt'
+DEFAULT_DICTIONARY_FILE = DATA_DIR / 'hangman_words.bin'
+
+MAGIC = b'HANGDICT'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sHHII')
+BUCKET = struct.Struct('<BB2xII')
+LENGTH = struct.Struct('<B3xIII')
+MASK = struct.Struct('<Q')
+ENCODING = 'cp1251'
+
+
+def letter_mask(letter):
+    """Бит буквы (0 для символа не из алфавита)"""
+    return LETTER_BITS.get(letter, 0)
+
+
+def word_mask(word):
+    """Маска множества букв слова"""
+    mask = 0
+    for letter in word:
+        mask |= LETTER_BITS[letter]
+    return mask
+
+
+def mask_to_letters(mask):
+    """Буквы маски в алфавитном порядке"""
+    return [letter for letter, bit in LETTER_BITS.items() if mask & bit]
+
+
+def reveal(word, guessed_mask):
+    """Открытая часть слова: названные буквы на своих местах, остальное '_'"""
+    return ''.join(letter if LETTER_BITS[letter] & guessed_mask else '_' for letter in word)
+
+
+def normalize_word(line):
+    """Слово из строки файла в верхнем регистре или None, если оно не подходит"""
+    word = line.strip().upper()
+    if len(word) < MIN_WORD_LENGTH or any(letter not in LETTER_BITS for letter in word):
+        return None
+    return word
+
+
+def letter_order(masks):
+    """Буквы по убыванию числа слов, в которых они встречаются"""
+    counts = [0] * len(ALPHABET)
+    for mask in masks:
+        for k in range(len(ALPHABET)):
+            if mask >> k & 1:
+                counts[k] += 1
+    return sorted(range(len(ALPHABET)), key=lambda k: -counts[k])
+
+
+def count_misses(mask, order):
+    """Промахи игрока, называющего буквы в порядке order, до открытия слова"""
+    misses = 0
+    for k in order:
+        bit = 1 << k
+        if mask & bit:
+            mask ^= bit
+            if not mask:
+                break
+        else:
+            misses += 1
+    return misses
+
+
+def difficulty_thresholds(misses):
+    """Число промахов на границах третей (easy <= первой, medium <= второй)"""
+    ordered = sorted(misses)
+    if not ordered:
+        return 0, 0
+    return ordered[(len(ordered) - 1) // 3], ordered[2 * (len(ordered) - 1) // 3]
+
+
+def difficulty_of(misses, thresholds):
+    easy, medium = thresholds
+    if misses <= easy:
+        return 'easy'
+    if misses <= medium:
+        return 'medium'
+    return 'hard'
+
+
+def read_words(path):
+    """Слова из текстового файла (неподходящие строки пропускаются)"""
+    with open(path, encoding='utf-8') as f:
+        return [word for word in map(normalize_word, f) if word]
+
+
+def build_dictionary(words, output):
+    """
+    Скомпилировать слова в двоичный словарь output.
+    Возвращает {(длина, сложность): число слов}.
+    """
+    words = sorted(set(words))
+    masks = [word_mask(word) for word in words]
+    order = letter_order(masks)
+    misses = [count_misses(mask, order) for mask in masks]
+    thresholds = difficulty_thresholds(misses)
+
+    buckets = {}
+    for word, mask, word_misses in zip(words, masks, misses):
+        key = (len(word), DIFFICULTIES.index(difficulty_of(word_misses, thresholds)))
+        buckets.setdefault(key, []).append((word, mask))
+
+    by_length = {}
+    for (length, _), entries in sorted(buckets.items()):
+        by_length.setdefault(length, []).extend(word for word, _ in entries)
+
+    offset = HEADER.size + BUCKET.size * len(buckets) + LENGTH.size * len(by_length)
+    index = []
+    records = []
+    first_record = {}
+    for (length, difficulty), entries in sorted(buckets.items()):
+        index.append(BUCKET.pack(length, difficulty, offset, len(entries)))
+        first_record.setdefault(length, offset)
+        for word, mask in entries:
+            records.append(MASK.pack(mask) + word.encode(ENCODING))
+        offset += (MASK.size + length) * len(entries)
+
+    lengths = []
+    bitmaps = []
+    for length, length_words in by_length.items():
+        lengths.append(LENGTH.pack(length, first_record[length], len(length_words), offset))
+        maps = build_pattern_maps(length_words, length)
+        bitmaps.extend(maps)
+        offset += sum(len(m) for m in maps)
+
+    # Работающие процессы держат файл в mmap: новый файл пишется рядом и
+    # атомарно подменяет старый, а они дочитывают прежнюю версию
+    directory = os.path.dirname(os.path.abspath(output))
+    fd, tmp_path = tempfile.mkstemp(prefix='.words-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(buckets), len(words), len(by_length)))
+            f.writelines(index)
+            f.writelines(lengths)
+            f.writelines(records)
+            f.writelines(bitmaps)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {(length, DIFFICULTIES[difficulty]): len(entries) for (length, difficulty), entries in buckets.items()}
+
+
+def build_pattern_maps(words, length):
+    """Битовые карты индекса шаблонов для слов одной длины (см. формат файла)"""
+    size = (len(words) + 7) // 8
+    letters = len(ALPHABET)
+    maps = [bytearray(size) for _ in range((length + 1) * letters)]
+    for i, word in enumerate(words):
+        byte, bit = i >> 3, 1 << (i & 7)
+        for position, letter in enumerate(word):
+            k = ALPHABET.index(letter)
+            maps[position * letters + k][byte] |= bit
+            maps[length * letters + k][byte] |= bit
+    return maps
+
+
+class WordDictionary:
+    """Двоичный словарь, открытый через mmap"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, bucket_count, self.word_count, length_count = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Неизвестный формат словаря: {path}')
+
+        # (длина, сложность) -> (смещение, число слов)
+        self.buckets = {}
+        for n in range(bucket_count):
+            length, difficulty, offset, count = BUCKET.unpack_from(self._data, HEADER.size + BUCKET.size * n)
+            self.buckets[(length, DIFFICULTIES[difficulty])] = (offset, count)
+
+        # длина -> (смещение первой записи, число слов, смещение битовых карт)
+        self.patterns = {}
+        start = HEADER.size + BUCKET.size * bucket_count
+        for n in range(length_count):
+            length, records, count, maps = LENGTH.unpack_from(self._data, start + LENGTH.size * n)
+            self.patterns[length] = (records, count, maps)
+        self._selections = {}
+
+    def __len__(self):
+        return self.word_count
+
+    def lengths(self):
+        return sorted({length for length, _ in self.buckets})
+
+    def count(self, length=None, difficulty=None):
+        return self._selection(length, difficulty)[0][-1]
+
+    def _selection(self, length, difficulty):
+        """Накопленные размеры подходящих корзин (для выбора слова через bisect)"""
+        key = (length, difficulty)
+        if key not in self._selections:
+            cumulative = [0]
+            keys = []
+            for (bucket_length, bucket_difficulty), (_, count) in sorted(self.buckets.items()):
+                if (length is None or bucket_length == length) and (difficulty is None or bucket_difficulty == difficulty):
+                    cumulative.append(cumulative[-1] + count)
+                    keys.append((bucket_length, bucket_difficulty))
+            self._selections[key] = (cumulative, keys)
+        return self._selections[key]
+
+    def word_at(self, key, n):
+        """n-е слово корзины key: (слово, маска)"""
+        length = key[0]
+        offset = self.buckets[key][0] + (MASK.size + length) * n
+        mask, = MASK.unpack_from(self._data, offset)
+        word = self._data[offset + MASK.size:offset + MASK.size + length].decode(ENCODING)
+        return word, mask
+
+    def random_word(self, length=None, difficulty=None, rng=random):
+        """
+        Случайное слово заданной длины и/или сложности: (слово, маска).
+        ValueError, если подходящих слов нет.
+        """
+        cumulative, keys = self._selection(length, difficulty)
+        if not cumulative[-1]:
+            raise ValueError('Нет слов с такими параметрами')
+
+        n = rng.randrange(cumulative[-1])
+        k = bisect.bisect_right(cumulative, n) - 1
+        return self.word_at(keys[k], n - cumulative[k])
+
+    # ---------- подсказки ----------
+
+    def _bitmap(self, length, position, k):
+        """Карта слов длины length с буквой k в позиции position (position == length - где угодно)"""
+        _, count, maps = self.patterns[length]
+        size = (count + 7) // 8
+        offset = maps + (position * len(ALPHABET) + k) * size
+        return int.from_bytes(self._data[offset:offset + size], 'little')
+
+    def candidates(self, pattern, guessed_mask):
+        """
+        Карта слов, подходящих под шаблон ('_' - закрытая буква) при уже
+        названных буквах guessed_mask: (карта, число слов).
+        """
+        length = len(pattern)
+        if length not in self.patterns:
+            return 0, 0
+        result = (1 << self.patterns[length][1]) - 1
+        guessed = [k for k in range(len(ALPHABET)) if guessed_mask >> k & 1]
+        wrong_mask = guessed_mask
+        for letter in pattern:
+            if letter != '_':
+                wrong_mask &= ~LETTER_BITS[letter]
+
+        for position, letter in enumerate(pattern):
+            if letter != '_':
+                result &= self._bitmap(length, position, ALPHABET.index(letter))
+            else:
+                # В закрытой позиции не может стоять названная буква
+                for k in guessed:
+                    if not wrong_mask >> k & 1:
+                        result &= ~self._bitmap(length, position, k)
+        # Отсутствующих букв нет нигде в слове
+        for k in guessed:
+            if wrong_mask >> k & 1:
+                result &= ~self._bitmap(length, length, k)
+        return result, result.bit_count()
+
+    def best_letter(self, pattern, guessed_mask, strategy='likely'):
+        """
+        Лучшая следующая буква для шаблона.
+
+        strategy='likely' - буква, которая есть в наибольшем числе
+        кандидатов; 'split' - буква, делящая кандидатов ближе всего пополам.
+        Возвращает (буква или None, доля кандидатов с ней, число кандидатов).
+        """
+        length = len(pattern)
+        candidates, total = self.candidates(pattern, guessed_mask)
+        if not total:
+            return None, 0.0, 0
+
+        best = None
+        best_key = None
+        best_count = 0
+        for k, letter in enumerate(ALPHABET):
+            if guessed_mask >> k & 1:
+                continue
+            count = (candidates & self._bitmap(length, length, k)).bit_count()
+            if not count:
+                continue
+            key = count if strategy == 'likely' else -abs(2 * count - total)
+            if best_key is None or key > best_key:
+                best, best_key, best_count = letter, key, count
+        return best, best_count / total, total
+
+
+@lru_cache(maxsize=None)
+def get_dictionary(path=None):
+    """Словарь процесса (открывается при первом обращении)"""
+    if path is None:
+        path = getattr(settings, 'HANGMAN_DICTIONARY_FILE', DEFAULT_DICTIONARY_FILE)
+    return WordDictionary(path)
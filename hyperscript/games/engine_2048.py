@@ -0,0 +1,318 @@
+"""
+Движок 2048 на битовых досках.
+
+Поле 4x4 упаковано в одно 64-битное целое: каждая клетка занимает 4 бита
+и хранит показатель степени плитки (0 - пустая клетка, 1 - плитка 2,
+11 - плитка 2048 и т.д.). Строка r занимает биты 16*r .. 16*r + 15,
+клетка c внутри строки - биты 4*c .. 4*c + 3, то есть младший полубайт
+строки - её левая клетка.
+
+Ходы влево/вправо выполняются по таблицам на 65536 строк, построенным
+один раз при импорте модуля; ходы вверх/вниз - через транспонирование.
+Плитка 32768 (показатель 15) - максимальная: две такие плитки не
+объединяются, чтобы результат помещался в 4 бита.
+"""
+import random
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+SIZE = 4
+MAX_EXPONENT = 15
+WIN_EXPONENT = 11  # 2048
+
+# Вероятность появления четвёрки вместо двойки
+FOUR_PROBABILITY = 0.1
+
+_ROW_MASK = 0xFFFF
+_NIBBLE_MASK = 0xF
+_LOW_BITS = 0x1111111111111111
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+class SeededRandom:
+    """
+    Детерминированный генератор (splitmix64) для появления плиток.
+
+    Всё состояние - одно 64-битное целое, поэтому его можно хранить в
+    состоянии игры и продолжать последовательность между запросами.
+    Поддерживает random() и choice(), как модуль random.
+    """
+
+    def __init__(self, state):
+        self.state = state & _MASK64
+
+    def next64(self):
+        self.state = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+
+    def rewind(self, draws):
+        """Отмотать генератор на draws чисел назад"""
+        self.state = (self.state - 0x9E3779B97F4A7C15 * draws) & _MASK64
+
+    def random(self):
+        return (self.next64() >> 11) / (1 << 53)
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+def _reverse_row(row):
+    """Развернуть 16-битную строку (правая клетка становится левой)"""
+    return (
+        ((row & 0x000F) << 12) |
+        ((row & 0x00F0) << 4) |
+        ((row & 0x0F00) >> 4) |
+        ((row & 0xF000) >> 12)
+    )
+
+
+def _merge_exponents(cells):
+    """Сдвинуть и объединить строку показателей влево"""
+    non_zero = [e for e in cells if e]
+    merged = []
+    score = 0
+    i = 0
+    while i < len(non_zero):
+        e = non_zero[i]
+        if i + 1 < len(non_zero) and non_zero[i + 1] == e and e < MAX_EXPONENT:
+            merged.append(e + 1)
+            score += 1 << (e + 1)
+            i += 2
+        else:
+            merged.append(e)
+            i += 1
+    merged.extend([0] * (SIZE - len(merged)))
+    return merged, score
+
+
+def _build_tables():
+    """Построить таблицы ходов для всех 65536 строк"""
+    left = [0] * 65536
+    right = [0] * 65536
+    left_score = [0] * 65536
+    right_score = [0] * 65536
+
+    for row in range(65536):
+        cells = [(row >> (4 * c)) & _NIBBLE_MASK for c in range(SIZE)]
+        merged, score = _merge_exponents(cells)
+        result = 0
+        for c, e in enumerate(merged):
+            result |= e << (4 * c)
+        left[row] = result
+        left_score[row] = score
+
+    for row in range(65536):
+        rev = _reverse_row(row)
+        right[row] = _reverse_row(left[rev])
+        right_score[row] = left_score[rev]
+
+    return left, right, left_score, right_score
+
+
+ROW_LEFT, ROW_RIGHT, ROW_LEFT_SCORE, ROW_RIGHT_SCORE = _build_tables()
+
+
+def transpose(board):
+    """Транспонировать поле (строки становятся столбцами)"""
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def _apply_rows(board, table, score_table):
+    """Применить таблицу ходов к каждой из четырёх строк"""
+    r0 = board & _ROW_MASK
+    r1 = (board >> 16) & _ROW_MASK
+    r2 = (board >> 32) & _ROW_MASK
+    r3 = (board >> 48) & _ROW_MASK
+    result = table[r0] | (table[r1] << 16) | (table[r2] << 32) | (table[r3] << 48)
+    score = score_table[r0] + score_table[r1] + score_table[r2] + score_table[r3]
+    return result, score
+
+
+def move_left(board):
+    return _apply_rows(board, ROW_LEFT, ROW_LEFT_SCORE)
+
+
+def move_right(board):
+    return _apply_rows(board, ROW_RIGHT, ROW_RIGHT_SCORE)
+
+
+def move_up(board):
+    result, score = _apply_rows(transpose(board), ROW_LEFT, ROW_LEFT_SCORE)
+    return transpose(result), score
+
+
+def move_down(board):
+    result, score = _apply_rows(transpose(board), ROW_RIGHT, ROW_RIGHT_SCORE)
+    return transpose(result), score
+
+
+_MOVES = {
+    'left': move_left,
+    'right': move_right,
+    'up': move_up,
+    'down': move_down,
+}
+
+
+def move(board, direction):
+    """Сделать ход. Возвращает (новое поле, набранные очки)"""
+    return _MOVES[direction](board)
+
+
+# Клетки каждой линии в порядке движения плиток (первая - куда сдвигаются)
+_LINES = {
+    'left': [[(i, j) for j in range(SIZE)] for i in range(SIZE)],
+    'right': [[(i, j) for j in reversed(range(SIZE))] for i in range(SIZE)],
+    'up': [[(i, j) for i in range(SIZE)] for j in range(SIZE)],
+    'down': [[(i, j) for i in reversed(range(SIZE))] for j in range(SIZE)],
+}
+
+
+def trace_move(board, direction):
+    """
+    Подробности хода для клиента.
+
+    Возвращает (перемещения, слияния): перемещения - список
+    ((из_i, из_j), (в_i, в_j)) для плиток, сменивших клетку; слияния -
+    список ((i, j), показатель) для клеток, где плитки объединились.
+    """
+    movements = []
+    merges = []
+    for line in _LINES[direction]:
+        target = 0
+        pending = 0  # показатель плитки в line[target], которая ещё может слиться
+        for cell in line:
+            e = get_cell(board, *cell)
+            if not e:
+                continue
+            if pending == e and e < MAX_EXPONENT:
+                movements.append((cell, line[target]))
+                merges.append((line[target], e + 1))
+                target += 1
+                pending = 0
+                continue
+            if pending:
+                target += 1
+            if cell != line[target]:
+                movements.append((cell, line[target]))
+            pending = e
+    return movements, merges
+
+
+def count_occupied(board):
+    """Количество занятых клеток"""
+    x = board | (board >> 1)
+    x |= x >> 2
+    return (x & _LOW_BITS).bit_count()
+
+
+def count_empty(board):
+    """Количество пустых клеток"""
+    return SIZE * SIZE - count_occupied(board)
+
+
+def has_empty(board):
+    """Есть ли на поле пустая клетка"""
+    return count_occupied(board) < SIZE * SIZE
+
+
+def can_move(board):
+    """Проверить, есть ли возможные ходы"""
+    if has_empty(board):
+        return True
+
+    # На заполненном поле ход влево меняет строку только при наличии пары
+    t = transpose(board)
+    for shift in (0, 16, 32, 48):
+        row = (board >> shift) & _ROW_MASK
+        if ROW_LEFT[row] != row:
+            return True
+        col = (t >> shift) & _ROW_MASK
+        if ROW_LEFT[col] != col:
+            return True
+    return False
+
+
+def empty_positions(board):
+    """Индексы пустых клеток (0..15, построчно)"""
+    return [i for i in range(SIZE * SIZE) if not (board >> (4 * i)) & _NIBBLE_MASK]
+
+
+# Сколько случайных чисел тратит одно появление плитки (клетка и значение)
+SPAWN_DRAWS = 2
+
+
+def spawn_tile(board, rng=random, four_probability=FOUR_PROBABILITY):
+    """Добавить новую плитку (4 с вероятностью four_probability, иначе 2)"""
+    empty = empty_positions(board)
+    if not empty:
+        return board
+    pos = rng.choice(empty)
+    exponent = 2 if rng.random() < four_probability else 1
+    return board | (exponent << (4 * pos))
+
+
+def max_exponent(board):
+    """Наибольший показатель на поле"""
+    best = 0
+    while board:
+        e = board & _NIBBLE_MASK
+        if e > best:
+            best = e
+        board >>= 4
+    return best
+
+
+def get_cell(board, i, j):
+    """Показатель в клетке (i, j)"""
+    return (board >> (4 * (SIZE * i + j))) & _NIBBLE_MASK
+
+
+def to_grid(board):
+    """Преобразовать поле в список списков значений плиток"""
+    grid = []
+    for i in range(SIZE):
+        row = []
+        for j in range(SIZE):
+            e = get_cell(board, i, j)
+            row.append(1 << e if e else 0)
+        grid.append(row)
+    return grid
+
+
+def from_grid(grid):
+    """Упаковать список списков значений плиток в битовое поле"""
+    board = 0
+    for i, row in enumerate(grid):
+        for j, value in enumerate(row):
+            if value:
+                board |= (int(value).bit_length() - 1) << (4 * (SIZE * i + j))
+    return board
+
+
+def row_from_values(values):
+    """Упаковать одну строку значений плиток в 16-битное число"""
+    row = 0
+    for c, value in enumerate(values):
+        if value:
+            row |= (int(value).bit_length() - 1) << (4 * c)
+    return row
+
+
+def row_to_values(row):
+    """Распаковать 16-битную строку в список значений плиток"""
+    values = []
+    for c in range(SIZE):
+        e = (row >> (4 * c)) & _NIBBLE_MASK
+        values.append(1 << e if e else 0)
+    return values
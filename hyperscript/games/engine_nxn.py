@@ -0,0 +1,233 @@
+"""
+Движок 2048 для полей произвольного размера (3x3, 5x5, 6x6).
+
+Представление то же, что в engine_2048: поле упаковано в одно целое,
+по 4 бита на клетку, строка i занимает биты 4*N*i .. 4*N*(i+1) - 1,
+младший полубайт строки - её левая клетка. Ход обрабатывает строку
+целиком одним обращением к таблице (таблица строк заполняется лениво и
+ограничена по размеру), столбцы - через транспонирование по таблицам
+кусков строк. Поэтому ход на 6x6 стоит примерно столько же, сколько на 4x4.
+
+get_engine(size) возвращает объект с тем же набором функций, что и модуль
+engine_2048; для 4x4 возвращается сам engine_2048 (битовые доски).
+"""
+import random
+from functools import lru_cache
+
+from . import engine_2048
+
+SUPPORTED_SIZES = (3, 4, 5, 6)
+
+MAX_EXPONENT = engine_2048.MAX_EXPONENT
+FOUR_PROBABILITY = engine_2048.FOUR_PROBABILITY
+SPAWN_DRAWS = engine_2048.SPAWN_DRAWS
+
+# Сколько различных строк помнит таблица ходов каждого направления
+ROW_CACHE_SIZE = 1 << 16
+
+# Клеток в одном куске таблицы транспонирования (4096 значений)
+_CHUNK_CELLS = 3
+
+
+class BoardEngine:
+    """Движок для поля size x size"""
+
+    def __init__(self, size):
+        self.SIZE = size
+        self.cells = size * size
+        self.row_bits = 4 * size
+        self.row_mask = (1 << self.row_bits) - 1
+        self.low_bits = int('1' * self.cells, 16)
+        self.row_shifts = [self.row_bits * i for i in range(size)]
+        self._spread = self._build_spread_tables()
+        self._lines = {
+            'left': [[(i, j) for j in range(size)] for i in range(size)],
+            'right': [[(i, j) for j in reversed(range(size))] for i in range(size)],
+            'up': [[(i, j) for i in range(size)] for j in range(size)],
+            'down': [[(i, j) for i in reversed(range(size))] for j in range(size)],
+        }
+        self.row_left = lru_cache(maxsize=ROW_CACHE_SIZE)(self._row_left)
+        self.row_right = lru_cache(maxsize=ROW_CACHE_SIZE)(self._row_right)
+
+    # ---------- строки ----------
+
+    def _row_left(self, row):
+        """Сдвиг строки влево: (новая строка, очки)"""
+        non_zero = [e for e in ((row >> (4 * c)) & 0xF for c in range(self.SIZE)) if e]
+        result = 0
+        score = 0
+        c = 0
+        i = 0
+        while i < len(non_zero):
+            e = non_zero[i]
+            if i + 1 < len(non_zero) and non_zero[i + 1] == e and e < MAX_EXPONENT:
+                e += 1
+                score += 1 << e
+                i += 2
+            else:
+                i += 1
+            result |= e << (4 * c)
+            c += 1
+        return result, score
+
+    def _reverse_row(self, row):
+        result = 0
+        for c in range(self.SIZE):
+            result = (result << 4) | ((row >> (4 * c)) & 0xF)
+        return result
+
+    def _row_right(self, row):
+        result, score = self.row_left(self._reverse_row(row))
+        return self._reverse_row(result), score
+
+    # ---------- транспонирование ----------
+
+    def _build_spread_tables(self):
+        """
+        Таблицы транспонирования: для каждой строки и каждого её куска из
+        трех клеток (12 бит) - вклад этих клеток в транспонированное поле.
+        """
+        size = self.SIZE
+        tables = []
+        for i in range(size):
+            shift = self.row_bits * i
+            for first in range(0, size, _CHUNK_CELLS):
+                width = min(_CHUNK_CELLS, size - first)
+                table = [0] * (1 << (4 * width))
+                for value in range(len(table)):
+                    result = 0
+                    for k in range(width):
+                        e = (value >> (4 * k)) & 0xF
+                        if e:
+                            result |= e << (4 * ((first + k) * size + i))
+                    table[value] = result
+                tables.append((shift + 4 * first, (1 << (4 * width)) - 1, table))
+        return tables
+
+    def transpose(self, board):
+        result = 0
+        for shift, mask, table in self._spread:
+            result |= table[(board >> shift) & mask]
+        return result
+
+    # ---------- ходы ----------
+
+    def _apply_rows(self, board, row_move):
+        result = 0
+        score = 0
+        mask = self.row_mask
+        for shift in self.row_shifts:
+            new_row, gained = row_move((board >> shift) & mask)
+            result |= new_row << shift
+            score += gained
+        return result, score
+
+    def move(self, board, direction):
+        """Сделать ход. Возвращает (новое поле, набранные очки)"""
+        if direction == 'left':
+            return self._apply_rows(board, self.row_left)
+        if direction == 'right':
+            return self._apply_rows(board, self.row_right)
+        if direction == 'up':
+            result, score = self._apply_rows(self.transpose(board), self.row_left)
+            return self.transpose(result), score
+        if direction == 'down':
+            result, score = self._apply_rows(self.transpose(board), self.row_right)
+            return self.transpose(result), score
+        raise KeyError(direction)
+
+    def trace_move(self, board, direction):
+        """Перемещения и слияния плиток (формат как в engine_2048.trace_move)"""
+        movements = []
+        merges = []
+        for line in self._lines[direction]:
+            target = 0
+            pending = 0
+            for cell in line:
+                e = self.get_cell(board, *cell)
+                if not e:
+                    continue
+                if pending == e and e < MAX_EXPONENT:
+                    movements.append((cell, line[target]))
+                    merges.append((line[target], e + 1))
+                    target += 1
+                    pending = 0
+                    continue
+                if pending:
+                    target += 1
+                if cell != line[target]:
+                    movements.append((cell, line[target]))
+                pending = e
+        return movements, merges
+
+    # ---------- клетки ----------
+
+    def count_occupied(self, board):
+        x = board | (board >> 1)
+        x |= x >> 2
+        return (x & self.low_bits).bit_count()
+
+    def count_empty(self, board):
+        return self.cells - self.count_occupied(board)
+
+    def has_empty(self, board):
+        return self.count_occupied(board) < self.cells
+
+    def can_move(self, board):
+        """Проверить, есть ли возможные ходы"""
+        if self.has_empty(board):
+            return True
+        mask = self.row_mask
+        t = self.transpose(board)
+        for shift in self.row_shifts:
+            row = (board >> shift) & mask
+            if self.row_left(row)[0] != row:
+                return True
+            col = (t >> shift) & mask
+            if self.row_left(col)[0] != col:
+                return True
+        return False
+
+    def empty_positions(self, board):
+        return [i for i in range(self.cells) if not (board >> (4 * i)) & 0xF]
+
+    def spawn_tile(self, board, rng=random, four_probability=FOUR_PROBABILITY):
+        """Добавить новую плитку (4 с вероятностью four_probability, иначе 2)"""
+        empty = self.empty_positions(board)
+        if not empty:
+            return board
+        pos = rng.choice(empty)
+        exponent = 2 if rng.random() < four_probability else 1
+        return board | (exponent << (4 * pos))
+
+    def max_exponent(self, board):
+        return engine_2048.max_exponent(board)
+
+    def get_cell(self, board, i, j):
+        return (board >> (4 * (self.SIZE * i + j))) & 0xF
+
+    def to_grid(self, board):
+        return [
+            [1 << e if e else 0 for e in (self.get_cell(board, i, j) for j in range(self.SIZE))]
+            for i in range(self.SIZE)
+        ]
+
+    def from_grid(self, grid):
+        board = 0
+        for i, row in enumerate(grid):
+            for j, value in enumerate(row):
+                if value:
+                    board |= (int(value).bit_length() - 1) << (4 * (self.SIZE * i + j))
+        return board
+
+
+_ENGINES = {4: engine_2048}
+
+
+def get_engine(size):
+    """Движок для поля size x size (для 4x4 - битовые доски engine_2048)"""
+    if size not in SUPPORTED_SIZES:
+        raise ValueError(f'Неподдерживаемый размер поля: {size}')
+    if size not in _ENGINES:
+        _ENGINES[size] = BoardEngine(size)
+    return _ENGINES[size]
@@ -0,0 +1,197 @@
+"""
+Поиск лучшего хода в 2048 (expectimax) для подсказок и автоигры.
+
+Работает поверх битовых досок из engine_2048. Оценка позиции берётся из
+таблицы на 65536 строк (строки поля + строки транспонированного поля),
+промежуточные результаты кэшируются в таблице транспозиций. Поиск идёт
+с итеративным углублением и прерывается по бюджету времени, поэтому
+обработчик запроса никогда не занят дольше заданного.
+"""
+import time
+
+from . import engine_2048
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 6
+DEFAULT_TIME_BUDGET = 0.05  # секунды
+MAX_TIME_BUDGET = 0.2
+
+# Ветки с вероятностью меньше порога не раскрываются
+CPROB_THRESHOLD = 0.0001
+
+# Параметры эвристики
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+# Как часто (в узлах) проверять, не вышло ли время
+_CLOCK_CHECK_INTERVAL = 256
+
+
+def _row_heuristic(row):
+    """Эвристическая оценка одной строки"""
+    cells = [(row >> (4 * c)) & 0xF for c in range(engine_2048.SIZE)]
+
+    total = 0.0
+    empty = 0
+    merges = 0
+    prev = 0
+    counter = 0
+    for rank in cells:
+        total += rank ** SUM_POWER
+        if rank == 0:
+            empty += 1
+        else:
+            if prev == rank:
+                counter += 1
+            elif counter > 0:
+                merges += 1 + counter
+                counter = 0
+            prev = rank
+    if counter > 0:
+        merges += 1 + counter
+
+    mono_left = 0.0
+    mono_right = 0.0
+    for a, b in zip(cells, cells[1:]):
+        if a > b:
+            mono_left += a ** MONOTONICITY_POWER - b ** MONOTONICITY_POWER
+        else:
+            mono_right += b ** MONOTONICITY_POWER - a ** MONOTONICITY_POWER
+
+    return (
+        LOST_PENALTY
+        + EMPTY_WEIGHT * empty
+        + MERGES_WEIGHT * merges
+        - MONOTONICITY_WEIGHT * min(mono_left, mono_right)
+        - SUM_WEIGHT * total
+    )
+
+
+HEURISTIC_TABLE = [_row_heuristic(row) for row in range(65536)]
+
+
+def evaluate(board):
+    """Оценка позиции: сумма табличных оценок строк и столбцов"""
+    table = HEURISTIC_TABLE
+    t = engine_2048.transpose(board)
+    return (
+        table[board & 0xFFFF] + table[(board >> 16) & 0xFFFF]
+        + table[(board >> 32) & 0xFFFF] + table[(board >> 48) & 0xFFFF]
+        + table[t & 0xFFFF] + table[(t >> 16) & 0xFFFF]
+        + table[(t >> 32) & 0xFFFF] + table[(t >> 48) & 0xFFFF]
+    )
+
+
+class SearchTimeout(Exception):
+    """Бюджет времени поиска исчерпан"""
+
+
+class _Search:
+    """Один проход expectimax на фиксированную глубину"""
+
+    def __init__(self, deadline, table):
+        self.deadline = deadline
+        self.table = table
+        self.nodes = 0
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes % _CLOCK_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def max_node(self, board, depth, cprob):
+        self._tick()
+        best = 0.0
+        for direction in engine_2048.DIRECTIONS:
+            new_board, _ = engine_2048.move(board, direction)
+            if new_board != board:
+                value = self.chance_node(new_board, depth - 1, cprob)
+                if value > best:
+                    best = value
+        return best
+
+    def chance_node(self, board, depth, cprob):
+        if depth <= 0 or cprob < CPROB_THRESHOLD:
+            return evaluate(board)
+
+        cached = self.table.get(board)
+        if cached is not None and cached[0] >= depth:
+            return cached[1]
+
+        empty = engine_2048.empty_positions(board)
+        if not empty:
+            return evaluate(board)
+
+        cprob /= len(empty)
+        total = 0.0
+        for pos in empty:
+            shift = 4 * pos
+            total += 0.9 * self.max_node(board | (1 << shift), depth, cprob * 0.9)
+            total += 0.1 * self.max_node(board | (2 << shift), depth, cprob * 0.1)
+        value = total / len(empty)
+
+        self.table[board] = (depth, value)
+        return value
+
+    def root(self, board, depth):
+        """Оценки всех допустимых ходов из корня"""
+        scores = {}
+        for direction in engine_2048.DIRECTIONS:
+            new_board, _ = engine_2048.move(board, direction)
+            if new_board != board:
+                scores[direction] = self.chance_node(new_board, depth - 1, 1.0)
+        return scores
+
+
+def legal_moves(board):
+    """Ходы, которые меняют поле"""
+    return [d for d in engine_2048.DIRECTIONS if engine_2048.move(board, d)[0] != board]
+
+
+def best_move(board, depth=DEFAULT_DEPTH, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Найти лучший ход для поля.
+
+    Возвращает словарь с направлением (None, если ходов нет), глубиной
+    последнего завершённого прохода, числом узлов и затраченным временем.
+    """
+    depth = max(1, min(int(depth), MAX_DEPTH))
+    time_budget = max(0.0, min(float(time_budget), MAX_TIME_BUDGET))
+
+    started = time.perf_counter()
+    deadline = started + time_budget
+    table = {}
+
+    moves = legal_moves(board)
+    result = {
+        'direction': None,
+        'depth': 0,
+        'nodes': 0,
+        'scores': {},
+    }
+
+    if moves:
+        # Жадный ход на случай, если не успеет завершиться даже первый проход
+        result['direction'] = max(moves, key=lambda d: evaluate(engine_2048.move(board, d)[0]))
+
+        for current_depth in range(1, depth + 1):
+            search = _Search(deadline, table)
+            try:
+                scores = search.root(board, current_depth)
+            except SearchTimeout:
+                result['nodes'] += search.nodes
+                break
+            result['nodes'] += search.nodes
+            result['direction'] = max(scores, key=scores.get)
+            result['depth'] = current_depth
+            result['scores'] = scores
+            if time.perf_counter() > deadline:
+                break
+
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
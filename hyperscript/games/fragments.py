@@ -0,0 +1,231 @@
+"""
+Быстрая отрисовка игровых фрагментов (hangman_game.html, 2048_game.html,
+quiz_game.html, memory_game.html).
+
+Фрагмент собирается из кусков, которые отрисовывает сам шаблон: ветки
+{% if %} и {% with %} раскрываются по ходу, а тело каждого {% for %}
+отрисовывается один раз для каждого сочетания значений, от которых оно
+зависит (строка поля 2048, плитка, кнопка буквы), и хранится в
+ограниченном LRU. Если переменная встречается в теле только как правая
+часть условия {% if x in y %} (кнопка буквы и список названных букв), в
+ключ входит результат проверки, а не весь список. Готовый фрагмент - склейка кусков, поэтому результат
+побайтно совпадает с render_to_string для того же шаблона.
+"""
+import threading
+from collections import OrderedDict
+
+from django.template import Context
+from django.template.base import FilterExpression, Node, NodeList, TextNode, Variable, VariableDoesNotExist
+from django.template.defaulttags import ForNode, IfNode, TemplateLiteral, WithNode
+from django.template.loader import get_template
+from django.template.smartif import TokenBase
+from django.utils.safestring import mark_safe
+
+DEFAULT_MAX_SIZE = 4096
+
+_MISSING = object()
+
+
+def _freeze(value):
+    """Значение контекста в виде, пригодном для ключа кэша"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def _plain_name(literal):
+    """Имя переменной без фильтров и атрибутов или None"""
+    if not isinstance(literal, TemplateLiteral):
+        return None
+    expression = literal.value
+    if expression.filters or not isinstance(expression.var, Variable) or len(expression.var.lookups) != 1:
+        return None
+    return expression.var.lookups[0]
+
+
+def _collect_names(obj, names, memberships=None):
+    """
+    Имена переменных контекста, которые использует узел шаблона.
+
+    Если передан memberships, условия вида "x in y" с простыми переменными
+    попадают туда парой (x, y), а y не добавляется в names.
+    """
+    if memberships is not None and isinstance(obj, TokenBase) and obj.id in ('in', 'not in'):
+        item, container = _plain_name(obj.first), _plain_name(obj.second)
+        if item and container:
+            names.add(item)
+            memberships.add((item, container))
+            return names
+    if isinstance(obj, FilterExpression):
+        if isinstance(obj.var, Variable) and obj.var.lookups:
+            names.add(obj.var.lookups[0])
+        for _, args in obj.filters:
+            for lookup, arg in args:
+                if lookup:
+                    names.add(arg.lookups[0])
+    elif isinstance(obj, (Node, TokenBase)):
+        for value in vars(obj).values():
+            _collect_names(value, names, memberships)
+    elif isinstance(obj, (list, tuple, NodeList)):
+        for item in obj:
+            _collect_names(item, names, memberships)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _collect_names(item, names, memberships)
+    return names
+
+
+def _contains(container, item):
+    # Как оператор in шаблонов: ошибка - это False
+    try:
+        return item in container
+    except Exception:
+        return False
+
+
+class FragmentRenderer:
+    """Отрисовка шаблона с кэшированием тел циклов"""
+
+    def __init__(self, template_name, max_size=DEFAULT_MAX_SIZE):
+        self.template_name = template_name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._template = None
+        self._cache = OrderedDict()
+        self._names = {}
+        self._lock = threading.Lock()
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = get_template(self.template_name).template
+        return self._template
+
+    def render(self, context):
+        """То же, что render_to_string(template_name, context)"""
+        template = self.template
+        context = Context(context, autoescape=template.engine.autoescape)
+        with context.render_context.push_state(template):
+            with context.bind_template(template):
+                context.template_name = template.name
+                return mark_safe(self._render_nodelist(template.nodelist, context))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'template': self.template_name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+            'max_size': self.max_size,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    # ---------- узлы ----------
+
+    def _render_nodelist(self, nodelist, context):
+        return ''.join([self._render_node(node, context) for node in nodelist])
+
+    def _render_node(self, node, context):
+        if isinstance(node, TextNode):
+            return node.s
+        if isinstance(node, IfNode):
+            # Как IfNode.render, но выбранная ветка тоже собирается из кусков
+            for condition, nodelist in node.conditions_nodelists:
+                if condition is not None:
+                    try:
+                        match = condition.eval(context)
+                    except VariableDoesNotExist:
+                        match = None
+                else:
+                    match = True
+                if match:
+                    return self._render_nodelist(nodelist, context)
+            return ''
+        if isinstance(node, WithNode):
+            values = {key: value.resolve(context) for key, value in node.extra_context.items()}
+            with context.push(**values):
+                return self._render_nodelist(node.nodelist, context)
+        if isinstance(node, ForNode) and self._splittable(node):
+            return self._render_loop(node, context)
+        return node.render_annotated(context)
+
+    def _splittable(self, node):
+        """Цикл без forloop, распаковки и reversed можно собирать по элементам"""
+        return (
+            len(node.loopvars) == 1
+            and not node.is_reversed
+            and 'forloop' not in _collect_names(node.nodelist_loop, set())
+        )
+
+    def _render_loop(self, node, context):
+        sequence = node.sequence.resolve(context, ignore_failures=True)
+        if sequence is None:
+            sequence = []
+        elif not hasattr(sequence, '__len__'):
+            sequence = list(sequence)
+        if not sequence:
+            return node.nodelist_empty.render(context)
+
+        loopvar = node.loopvars[0]
+        parts = []
+        with context.push():
+            for item in sequence:
+                context[loopvar] = item
+                parts.append(self._memoized(node.nodelist_loop, context))
+        return ''.join(parts)
+
+    # ---------- кэш ----------
+
+    def _key_parts(self, nodelist):
+        """(имена, пары (x, y) из условий "x in y") для ключа тела цикла"""
+        key = id(nodelist)
+        if key not in self._names:
+            memberships = set()
+            names = _collect_names(nodelist, set(), memberships)
+            self._names[key] = (tuple(sorted(names)), tuple(sorted(memberships)))
+        return self._names[key]
+
+    def _memoized(self, nodelist, context):
+        names, memberships = self._key_parts(nodelist)
+        key = (
+            (id(nodelist),)
+            + tuple(_freeze(context.get(name, _MISSING)) for name in names)
+            + tuple(_contains(context.get(container), context.get(item)) for item, container in memberships)
+        )
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = self._render_nodelist(nodelist, context)
+        with self._lock:
+            self._cache[key] = html
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return html
+
+
+HANGMAN_GAME = FragmentRenderer('games/hangman_game.html')
+GAME_2048 = FragmentRenderer('games/2048_game.html')
+QUIZ_GAME = FragmentRenderer('games/quiz_game.html')
+MEMORY_GAME = FragmentRenderer('games/memory_game.html')
+
+RENDERERS = (HANGMAN_GAME, GAME_2048, QUIZ_GAME, MEMORY_GAME)
+
+
+def stats():
+    """Статистика кэшей всех фрагментов процесса"""
+    return [renderer.stats() for renderer in RENDERERS]
@@ -0,0 +1,280 @@
+"""
+Таблицы лидеров: рекорд 2048, лучшая серия побед в Виселице, доля побед в КНБ.
+
+Каждая таблица - упорядоченный список ключей в памяти процесса (RankedList),
+поэтому "топ-100" и "мое место" не требуют ORDER BY по всем игрокам. Данные
+берутся из сводок GameStats: при первом обращении таблицы строятся целиком,
+затем раз в REFRESH_INTERVAL секунд процесс дочитывает сводки, измененные
+с прошлой синхронизации (индекс по updated_at). Так места во всех воркерах
+совпадают с точностью до REFRESH_INTERVAL, а после игры в этом же процессе
+таблица обновляется при следующем обращении.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import GameStats, games_recorded
+
+# Секунд между дочитываниями измененных сводок
+REFRESH_INTERVAL = 5
+
+# Запас на часы разных процессов и незакоммиченные транзакции при дочитывании
+SYNC_OVERLAP = timedelta(seconds=2)
+
+# Минимум раундов КНБ для таблицы доли побед
+RPS_MIN_GAMES = 20
+
+TOP_LIMIT = 100
+
+
+class RankedList:
+    """
+    Отсортированный список с местом элемента за O(log n).
+
+    Элементы лежат в корзинах по ~LOAD штук; дерево Фенвика по размерам
+    корзин дает число элементов до любой корзины.
+    """
+
+    LOAD = 512
+
+    def __init__(self, items=()):
+        self._build(sorted(items))
+
+    def _build(self, items):
+        load = self.LOAD
+        self._buckets = [items[i:i + load] for i in range(0, len(items), load)] or [[]]
+        self._reindex()
+
+    def _reindex(self):
+        self._maxes = [bucket[-1] if bucket else None for bucket in self._buckets]
+        n = len(self._buckets)
+        tree = [0] * (n + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._len = sum(len(bucket) for bucket in self._buckets)
+
+    def _bump(self, index, delta):
+        index += 1
+        tree = self._tree
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def _before(self, index):
+        """Элементов в корзинах до index"""
+        total = 0
+        tree = self._tree
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def _locate(self, item):
+        if self._maxes[0] is None:
+            return 0
+        index = bisect_left(self._maxes, item)
+        return min(index, len(self._buckets) - 1)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, item):
+        index = self._locate(item)
+        bucket = self._buckets[index]
+        insort(bucket, item)
+        self._maxes[index] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[index:index + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._reindex()
+        else:
+            self._bump(index, 1)
+
+    def remove(self, item):
+        index = self._locate(item)
+        bucket = self._buckets[index]
+        position = bisect_left(bucket, item)
+        if position == len(bucket) or bucket[position] != item:
+            raise ValueError(f'{item!r} нет в списке')
+        del bucket[position]
+        self._len -= 1
+        if not bucket and len(self._buckets) > 1:
+            del self._buckets[index]
+            self._reindex()
+        else:
+            self._maxes[index] = bucket[-1] if bucket else None
+            self._bump(index, -1)
+
+    def index(self, item):
+        """Сколько элементов меньше item"""
+        index = self._locate(item)
+        return self._before(index) + bisect_left(self._buckets[index], item)
+
+    def head(self, n):
+        """Первые n элементов"""
+        result = []
+        for bucket in self._buckets:
+            result.extend(bucket[:n - len(result)])
+            if len(result) >= n:
+                break
+        return result
+
+
+class Leaderboard:
+    """Одна таблица: значение на игрока, лучшие - первые"""
+
+    def __init__(self, name, title, game_type, value):
+        self.name = name
+        self.title = title
+        self.game_type = game_type
+        self.value = value  # поля сводки -> значение или None (игрок не в таблице)
+        self._keys = {}     # id пользователя -> ключ в списке
+        self._list = RankedList()
+
+    def load(self, rows):
+        """Построить таблицу по сводкам заново"""
+        self._keys = {}
+        for row in rows:
+            value = self.value(row)
+            if value is not None:
+                self._keys[row['user_id']] = (-value, row['user_id'])
+        self._list = RankedList(self._keys.values())
+
+    def update(self, row):
+        user_id = row['user_id']
+        value = self.value(row)
+        old = self._keys.pop(user_id, None)
+        if old is not None:
+            self._list.remove(old)
+        if value is not None:
+            key = (-value, user_id)
+            self._keys[user_id] = key
+            self._list.add(key)
+
+    def __len__(self):
+        return len(self._list)
+
+    def top(self, n=TOP_LIMIT):
+        """[(место, id пользователя, значение)]; равные значения делят место"""
+        result = []
+        for position, key in enumerate(self._list.head(n), 1):
+            rank = result[-1][0] if result and -key[0] == result[-1][2] else position
+            result.append((rank, key[1], -key[0]))
+        return result
+
+    def rank(self, user_id):
+        """(место, значение) игрока или None"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._rank_of(key), -key[0]
+
+    def _rank_of(self, key):
+        # Место = 1 + число игроков со строго лучшим значением
+        return self._list.index((key[0],)) + 1
+
+
+def _best_score(row):
+    return row['best_score'] or None
+
+
+def _best_streak(row):
+    return row['best_streak'] or None
+
+
+def _win_rate(row):
+    if row['games'] < RPS_MIN_GAMES:
+        return None
+    return round(row['wins'] / row['games'] * 100, 2)
+
+
+_FIELDS = ('user_id', 'user__username', 'game_type', 'games', 'wins', 'best_score', 'best_streak', 'updated_at')
+
+
+class LeaderboardService:
+    """Таблицы лидеров процесса с периодической синхронизацией по GameStats"""
+
+    def __init__(self, boards, refresh_interval=REFRESH_INTERVAL):
+        self.boards = {board.name: board for board in boards}
+        self.refresh_interval = refresh_interval
+        self.usernames = {}
+        self._synced_at = None   # время БД, до которого сводки прочитаны
+        self._checked = 0.0      # time.monotonic() последней синхронизации
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def standings(self, name, user_id=None, limit=TOP_LIMIT):
+        """Первые limit мест таблицы name и место пользователя user_id"""
+        with self._lock:
+            self._sync()
+            board = self.boards[name]
+            me = board.rank(user_id) if user_id is not None else None
+            return {
+                'board': board.name,
+                'title': board.title,
+                'total': len(board),
+                'top': [
+                    {'rank': rank, 'username': self.usernames.get(player), 'value': value}
+                    for rank, player, value in board.top(limit)
+                ],
+                'me': {'rank': me[0], 'value': me[1]} if me else None,
+            }
+
+    def invalidate(self):
+        """Дочитать сводки при следующем обращении (игра записана в этом процессе)"""
+        self._stale = True
+
+    def reset(self):
+        with self._lock:
+            self._synced_at = None
+            self.usernames = {}
+            for board in self.boards.values():
+                board.load([])
+
+    def _rows(self, **filters):
+        game_types = {board.game_type for board in self.boards.values()}
+        return GameStats.objects.filter(game_type__in=game_types, **filters).values(*_FIELDS).iterator(
+            chunk_size=10000
+        )
+
+    def _sync(self):
+        if self._synced_at is not None and not self._stale \
+                and time.monotonic() - self._checked < self.refresh_interval:
+            return
+        now = timezone.now()
+        self._stale = False
+        self._checked = time.monotonic()
+        if self._synced_at is None:
+            by_type = {}
+            for row in self._rows():
+                self.usernames[row['user_id']] = row['user__username']
+                by_type.setdefault(row['game_type'], []).append(row)
+            for board in self.boards.values():
+                board.load(by_type.get(board.game_type, []))
+        else:
+            for row in self._rows(updated_at__gte=self._synced_at - SYNC_OVERLAP):
+                self.usernames[row['user_id']] = row['user__username']
+                for board in self.boards.values():
+                    if board.game_type == row['game_type']:
+                        board.update(row)
+        self._synced_at = now
+
+
+leaderboards = LeaderboardService([
+    Leaderboard('2048', 'Рекорд в 2048', '2048', _best_score),
+    Leaderboard('hangman_streak', 'Серия побед в Виселице', 'hangman', _best_streak),
+    Leaderboard('rps_win_rate', 'Доля побед в КНБ, %', 'rps', _win_rate),
+])
+
+
+@receiver(games_recorded)
+def invalidate_on_record(sender, sessions, **kwargs):
+    leaderboards.invalidate()
@@ -0,0 +1,79 @@
+import random
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games.leaderboard import Leaderboard, _best_score
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк таблицы лидеров в памяти против ORDER BY/COUNT в SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1_000_000, help='Игроков в таблице')
+        parser.add_argument('--queries', type=int, default=10000, help='Запросов места и обновлений')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора')
+
+    def handle(self, *args, **options):
+        players = options['players']
+        queries = options['queries']
+        if players <= 0 or queries <= 0:
+            raise CommandError('--players и --queries должны быть положительными')
+
+        rng = random.Random(options['seed'])
+        rows = [
+            {'user_id': user_id, 'best_score': int(rng.lognormvariate(8, 1.2))}
+            for user_id in range(1, players + 1)
+        ]
+        probes = [rng.randint(1, players) for _ in range(queries)]
+        self.stdout.write(f'Игроков: {players}, запросов: {queries}')
+
+        board = Leaderboard('2048', 'Рекорд в 2048', '2048', _best_score)
+        started = time.perf_counter()
+        board.load(rows)
+        self._line('Построение таблицы', time.perf_counter() - started)
+        self._measure('Топ-100', lambda _: board.top(100), range(100))
+        self._measure('Место игрока', board.rank, probes)
+
+        def update(user_id):
+            rows[user_id - 1]['best_score'] += rng.randint(0, 5000)
+            board.update(rows[user_id - 1])
+
+        self._measure('Обновление после игры', update, probes)
+
+        # То же самое запросами к SQLite в памяти (с индексом по счету, значения после обновлений)
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE stats (user_id INTEGER PRIMARY KEY, best_score INTEGER)')
+        db.executemany('INSERT INTO stats VALUES (?, ?)', ((row['user_id'], row['best_score']) for row in rows))
+        db.execute('CREATE INDEX stats_score ON stats (best_score)')
+
+        def sql_top(_):
+            return db.execute('SELECT user_id, best_score FROM stats ORDER BY best_score DESC LIMIT 100').fetchall()
+
+        def sql_rank(user_id):
+            return db.execute(
+                'SELECT COUNT(*) FROM stats WHERE best_score > (SELECT best_score FROM stats WHERE user_id = ?)',
+                (user_id,),
+            ).fetchone()
+
+        self._measure('SQLite: топ-100', sql_top, range(100))
+        self._measure('SQLite: место игрока', sql_rank, probes[:max(1, queries // 10)])
+
+        # Проверка: места совпадают с подсчетом в SQLite
+        for user_id in probes[:100]:
+            rank, _ = board.rank(user_id)
+            if rank != sql_rank(user_id)[0] + 1:
+                raise CommandError(f'Место игрока {user_id} не совпадает с SQLite')
+        self.stdout.write(self.style.SUCCESS('Места совпадают с подсчетом в SQLite'))
+
+    def _measure(self, title, func, args):
+        args = list(args)
+        started = time.perf_counter()
+        for arg in args:
+            func(arg)
+        self._line(title, (time.perf_counter() - started) / len(args))
+
+    def _line(self, title, seconds):
+        self.stdout.write(f'  {title:<28}{seconds * 1000:>12.4f} мс')
+
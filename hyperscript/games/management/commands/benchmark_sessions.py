@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from games import dictionary_hangman, engine_2048
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached': 'hyperscript.session_backend',
+}
+
+PATHS = ('game_2048_move', 'hangman_guess', 'rps_play')
+
+
+def _play_2048(client, n):
+    direction = engine_2048.DIRECTIONS[n % 4]
+    response = client.post('/games/2048/move/', data={'direction': direction}, content_type='application/json')
+    if response.json().get('game_state', {}).get('game_over'):
+        client.post('/games/2048/new/')
+
+
+def _play_hangman(client, n):
+    letter = dictionary_hangman.ALPHABET[n % len(dictionary_hangman.ALPHABET)]
+    response = client.post('/games/hangman/guess/', data={'letter': letter}, content_type='application/json')
+    if response.status_code != 200 or response.json()['game_state']['game_over']:
+        client.post('/games/hangman/new/')
+
+
+def _play_rps(client, n):
+    client.post('/games/rock-paper-scissors/', data={'choice': ('rock', 'paper', 'scissors')[n % 3]})
+
+
+PLAYERS = {
+    'game_2048_move': ('/games/2048/new/', _play_2048),
+    'hangman_guess': ('/games/hangman/new/', _play_hangman),
+    'rps_play': ('/games/rock-paper-scissors/', _play_rps),
+}
+
+
+def _worker(args):
+    """Один воркер: свой пользователь и свое соединение с базой"""
+    engine, path, worker, requests, cache_dir = args
+    connections.close_all()
+    caches_setting = dict(settings.CACHES, sessions=dict(settings.CACHES['sessions'], LOCATION=cache_dir))
+    with override_settings(SESSION_ENGINE=ENGINES[engine], CACHES=caches_setting):
+        user, _ = User.objects.get_or_create(username=f'bench-{engine}-{path}-{worker}')
+        client = Client()
+        client.force_login(user)
+        start_url, play = PLAYERS[path]
+        if path == 'rps_play':
+            client.get(start_url)
+        else:
+            client.post(start_url)
+
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for n in range(requests):
+                started = time.perf_counter()
+                play(client, n)
+                latencies.append(time.perf_counter() - started)
+
+    session_reads = sum(1 for q in queries if 'django_session' in q['sql'] and q['sql'].startswith('SELECT'))
+    session_writes = sum(
+        1 for q in queries if 'django_session' in q['sql'] and q['sql'].startswith(('UPDATE', 'INSERT'))
+    )
+    connections.close_all()
+    return latencies, session_reads, session_writes
+
+
+class Command(BaseCommand):
+    help = 'Сравнить бэкенды сессий (db и кэш с записью при изменении) на игровых запросах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество параллельных процессов')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на воркер')
+        parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS[:2]),
+                            help='Какие запросы измерять')
+        parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES),
+                            help='Какие бэкенды сравнивать')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Бенчмарк рассчитан на SQLite')
+        if options['workers'] <= 0 or options['requests'] <= 0:
+            raise CommandError('--workers и --requests должны быть положительными')
+
+        # Бенчмарк работает с копией базы, чтобы не оставлять в ней пользователей и партий
+        tmp = tempfile.mkdtemp(prefix='hyperscript-bench-')
+        try:
+            db_path = os.path.join(tmp, 'db.sqlite3')
+            if os.path.exists(database['NAME']):
+                shutil.copyfile(database['NAME'], db_path)
+            connections.close_all()
+            database['NAME'] = connections['default'].settings_dict['NAME'] = db_path
+            call_command('migrate', verbosity=0)
+            connections.close_all()
+
+            context = multiprocessing.get_context('fork')
+            self.stdout.write(f"Воркеров: {options['workers']}, запросов на воркер: {options['requests']}")
+            self.stdout.write(f"{'запрос':<16}{'бэкенд':<8}{'запр/с':>9}{'p50, мс':>9}{'p95, мс':>9}"
+                              f"{'чтений':>9}{'записей':>9}")
+            for path in options['paths']:
+                for engine in options['engines']:
+                    cache_dir = os.path.join(tmp, f'cache-{engine}-{path}')
+                    jobs = [(engine, path, worker, options['requests'], cache_dir)
+                            for worker in range(options['workers'])]
+                    started = time.perf_counter()
+                    with context.Pool(options['workers']) as pool:
+                        results = pool.map(_worker, jobs)
+                    elapsed = time.perf_counter() - started
+                    self._report(path, engine, results, elapsed)
+            self.stdout.write('Чтения и записи - запросов к django_session на один игровой запрос')
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _report(self, path, engine, results, elapsed):
+        latencies = sorted(latency for result in results for latency in result[0])
+        total = len(latencies)
+        reads = sum(result[1] for result in results)
+        writes = sum(result[2] for result in results)
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(total * 0.95) - 1] * 1000
+        self.stdout.write(f"{path:<16}{engine:<8}{total / elapsed:>9.0f}{p50:>9.2f}{p95:>9.2f}"
+                          f"{reads / total:>9.2f}{writes / total:>9.2f}")
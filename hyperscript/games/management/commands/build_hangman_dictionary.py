@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games import dictionary_hangman
+
+
+class Command(BaseCommand):
+    help = 'Скомпилировать список слов Виселицы в двоичный словарь для чтения через mmap'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            type=str,
+            default=str(dictionary_hangman.DEFAULT_WORDS_FILE),
+            help='Текстовый файл, одно слово в строке',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=str(dictionary_hangman.DEFAULT_DICTIONARY_FILE),
+            help='Куда записать двоичный словарь',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            words = dictionary_hangman.read_words(options['input'])
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать {options["input"]}: {e}')
+        if not words:
+            raise CommandError('В списке нет подходящих слов')
+
+        buckets = dictionary_hangman.build_dictionary(words, options['output'])
+        elapsed = time.perf_counter() - started
+
+        total = sum(buckets.values())
+        self.stdout.write(f'Слов: {total}, корзин: {len(buckets)}, за {elapsed:.2f} с')
+        for difficulty in dictionary_hangman.DIFFICULTIES:
+            count = sum(n for (_, d), n in buckets.items() if d == difficulty)
+            self.stdout.write(f'  {difficulty}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Словарь записан в {options["output"]}'))
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from games import quiz_import, quiz_pool
+
+
+class Command(BaseCommand):
+    help = 'Импортировать вопросы викторины из JSON Lines или CSV пакетами через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Файлы .jsonl или .csv')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Формат (по умолчанию по расширению)')
+        parser.add_argument('--delimiter', default=',', help='Разделитель полей CSV')
+        parser.add_argument('--batch-size', type=int, default=quiz_import.BATCH_SIZE, help='Вопросов в пакете')
+        parser.add_argument('--category', help='Категория для записей без category')
+        parser.add_argument('--difficulty', help='Сложность для записей без difficulty')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить, ничего не записывать')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size должен быть положительным')
+
+        verbosity = options['verbosity']
+
+        def progress(stats):
+            # При DEBUG журнал запросов хранит SQL каждого bulk_create
+            reset_queries()
+            if verbosity > 1:
+                self.stdout.write(f'  пакет {stats.batches}: прочитано {stats.read}, добавлено {stats.created}')
+
+        for path in options['files']:
+            started = time.perf_counter()
+            try:
+                stats = quiz_import.import_file(
+                    path,
+                    fmt=options['format'],
+                    delimiter=options['delimiter'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                    category=options['category'],
+                    difficulty=options['difficulty'],
+                    on_batch=progress,
+                )
+            except quiz_import.QuestionError as e:
+                raise CommandError(str(e))
+            except (OSError, UnicodeDecodeError) as e:
+                raise CommandError(f'Не удалось прочитать {path}: {e}')
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f'{path}: записей {stats.read}, добавлено {stats.created}, '
+                f'дубликатов {stats.duplicates}, с ошибками {stats.invalid}, за {elapsed:.2f} с'
+            )
+            for line_no, message in stats.errors:
+                self.stderr.write(f'  строка {line_no}: {message}')
+            if stats.invalid > len(stats.errors):
+                self.stderr.write(f'  ... и еще {stats.invalid - len(stats.errors)} ошибок')
+
+        # bulk_create не посылает post_save: пулы этого процесса сбрасываются
+        # здесь, веб-процессы перечитают их не позже чем через POOL_TTL
+        quiz_pool.pools.invalidate()
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Пробный запуск: ничего не записано'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Готово. Новые вопросы появятся в викторине в течение {quiz_pool.POOL_TTL} с'
+            ))
@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games import engine_2048, expectimax_2048
+
+
+class Command(BaseCommand):
+    help = 'Пакетная симуляция партий 2048 на NumPy (бенчмарк движка и правил появления плиток)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10000, help='Количество партий')
+        parser.add_argument(
+            '--policy',
+            choices=['random', 'greedy', 'expectimax'],
+            default='random',
+            help='Стратегия выбора хода',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора случайных чисел')
+        parser.add_argument(
+            '--four-probability',
+            type=float,
+            default=engine_2048.FOUR_PROBABILITY,
+            help='Вероятность появления плитки 4',
+        )
+        parser.add_argument('--max-moves', type=int, default=None, help='Ограничение ходов в партии')
+        parser.add_argument('--depth', type=int, default=2, help='Глубина expectimax')
+        parser.add_argument('--budget-ms', type=float, default=20, help='Бюджет времени expectimax на ход (мс)')
+        parser.add_argument(
+            '--verify',
+            type=int,
+            default=0,
+            help='Сверять ходы первых N партий со скалярным движком',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from games import batch_2048
+        except ImportError:
+            raise CommandError('Для симуляции нужен NumPy: pip install numpy')
+
+        games = options['games']
+        if games <= 0:
+            raise CommandError('--games должно быть положительным')
+        if not 0 <= options['four_probability'] <= 1:
+            raise CommandError('--four-probability должно быть в диапазоне [0, 1]')
+
+        if options['policy'] == 'random':
+            policy = batch_2048.choose_random
+        elif options['policy'] == 'greedy':
+            policy = batch_2048.choose_greedy
+        else:
+            policy = batch_2048.make_expectimax_policy(options['depth'], options['budget_ms'] / 1000)
+
+        rng = np.random.default_rng(options['seed'])
+
+        started = time.perf_counter()
+        try:
+            result = batch_2048.simulate(
+                games,
+                policy,
+                rng,
+                four_probability=options['four_probability'],
+                max_moves=options['max_moves'],
+                verify=options['verify'],
+            )
+        except AssertionError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        scores = result['scores']
+        moves = result['moves']
+        max_tiles = batch_2048.max_exponent(result['boards'])
+
+        self.stdout.write(f"Партий: {games}, стратегия: {options['policy']}")
+        self.stdout.write(f"Ходов: {result['total_moves']} за {elapsed:.2f} с "
+                          f"({result['total_moves'] / elapsed:,.0f} ходов/с)")
+        self.stdout.write(f"Ходов в партии: среднее {moves.mean():.1f}, максимум {moves.max()}")
+
+        self.stdout.write('Очки:')
+        self.stdout.write(f"  среднее {scores.mean():.1f}, минимум {scores.min()}, максимум {scores.max()}")
+        for q in (25, 50, 75, 90, 99):
+            self.stdout.write(f"  p{q}: {np.percentile(scores, q):.0f}")
+
+        self.stdout.write('Максимальная плитка:')
+        exponents, counts = np.unique(max_tiles, return_counts=True)
+        for exponent, count in zip(exponents.tolist(), counts.tolist()):
+            self.stdout.write(f"  {1 << exponent:>6}: {count:>8} ({count / games * 100:.2f}%)")
+
+        if options['verify']:
+            self.stdout.write(self.style.SUCCESS('Проверка правил слияния пройдена'))
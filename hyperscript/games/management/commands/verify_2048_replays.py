@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from games import replay_2048
+from games.models import GameSession
+
+
+class Command(BaseCommand):
+    help = 'Переиграть записанные партии 2048 и проверить заявленные счета'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, default=None, help='Проверять партии только этого пользователя')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пакета для переигровки')
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Сохранить результат проверки в game_data["verified"]',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from games import batch_2048
+        except ImportError:
+            batch_2048 = None
+            self.stdout.write(self.style.WARNING('NumPy не установлен, партии переигрываются по одной'))
+
+        queryset = GameSession.objects.filter(game_type='2048').order_by('id')
+        if options['user']:
+            queryset = queryset.filter(user__username=options['user'])
+
+        checked = 0
+        invalid = []
+        started = time.perf_counter()
+
+        batch = []
+        for session in queryset.only('id', 'score', 'game_data').iterator(chunk_size=options['batch_size']):
+            batch.append(session)
+            if len(batch) >= options['batch_size']:
+                invalid.extend(self._verify_batch(batch, batch_2048, options['update']))
+                checked += len(batch)
+                batch = []
+        if batch:
+            invalid.extend(self._verify_batch(batch, batch_2048, options['update']))
+            checked += len(batch)
+
+        elapsed = time.perf_counter() - started
+        rate = checked / elapsed if elapsed > 0 else 0
+        self.stdout.write(f'Проверено партий: {checked} за {elapsed:.2f} с ({rate:,.0f} партий/с)')
+        if invalid:
+            self.stdout.write(self.style.ERROR(f'Не подтверждено: {len(invalid)}'))
+            for session_id in invalid[:50]:
+                self.stdout.write(f'  GameSession #{session_id}')
+        else:
+            self.stdout.write(self.style.SUCCESS('Все партии подтверждены'))
+
+    def _verify_batch(self, sessions, batch_2048, update):
+        """Проверить пакет партий, вернуть id неподтвержденных"""
+        results = {}
+        replayable = []
+        for session in sessions:
+            data = session.game_data or {}
+            if data.get('log') is None or data.get('seed') is None or not isinstance(data.get('moves'), int):
+                results[session.id] = False
+            else:
+                replayable.append(session)
+
+        # Пакетный движок работает только с полем 4x4, остальные размеры - по одной
+        batched = []
+        if batch_2048 is not None:
+            batched = [s for s in replayable if s.game_data.get('size', 4) == 4]
+        if batched:
+            replayed = batch_2048.replay_logs(
+                [s.game_data['seed'] for s in batched],
+                [replay_2048.decode_log(s.game_data['log']) for s in batched],
+                [s.game_data['moves'] for s in batched],
+            )
+            for session, valid, score in zip(batched, replayed['valid'].tolist(), replayed['scores'].tolist()):
+                results[session.id] = valid and score == session.score
+        for session in replayable:
+            if session.id not in results:
+                results[session.id] = replay_2048.verify(session.game_data, session.score)
+
+        if update:
+            changed = []
+            for session in sessions:
+                if session.game_data.get('verified') != results[session.id]:
+                    session.game_data['verified'] = results[session.id]
+                    changed.append(session)
+            GameSession.objects.bulk_update(changed, ['game_data'])
+
+        return [session.id for session in sessions if not results[session.id]]
@@ -0,0 +1,111 @@
+"""
+Игра на память: поле из пар карт без списка карт в состоянии.
+
+Раскладка - перестановка позиций 0..2n-1, заданная 64-битным seed:
+небольшая сеть Фейстеля на ключе seed (раундовая функция - splitmix64)
+с «проходом по циклу» до попадания в диапазон. Карта на позиции p - пара
+perm(p) // 2, поэтому узнать карту можно за постоянное число шагов, не
+строя всю раскладку, а по уже открытым картам раскладку не восстановить.
+
+Состояние партии - несколько целых чисел:
+    seed, pairs, matched (маска найденных пар по номеру пары),
+    first (позиция открытой карты без пары или -1), moves, mistakes,
+    started (время начала, unix-секунды).
+"""
+import secrets
+import time
+
+from .engine_2048 import SeededRandom
+
+# Число пар на выбор и по умолчанию
+PAIR_CHOICES = (6, 8, 12)
+DEFAULT_PAIRS = 8
+
+SYMBOLS = ('🍎', '🍌', '🍇', '🍒', '🍋', '🍉', '🥝', '🍑', '🍍', '🥥', '🍓', '🫐')
+
+# Очки за пару и штраф за промах
+PAIR_POINTS = 10
+MISTAKE_PENALTY = 2
+
+_ROUNDS = 4
+
+
+def new_game(pairs=DEFAULT_PAIRS):
+    return {
+        'seed': secrets.randbits(64),
+        'pairs': pairs,
+        'matched': 0,
+        'first': -1,
+        'moves': 0,
+        'mistakes': 0,
+        'started': int(time.time()),
+    }
+
+
+def card(state, position):
+    """Номер пары карты на позиции position"""
+    seed = state['seed']
+    cards = state['pairs'] * 2
+    bits = (cards - 1).bit_length()
+    half = (bits + 1) // 2
+    mask = (1 << half) - 1
+    value = position
+    while True:
+        left, right = value >> half, value & mask
+        for k in range(_ROUNDS):
+            left, right = right, left ^ (SeededRandom(seed + (k << 32) + right).next64() & mask)
+        value = left << half | right
+        if value < cards:
+            return value >> 1
+
+
+def symbol(pair):
+    return SYMBOLS[pair]
+
+
+def is_finished(state):
+    return state['matched'] == (1 << state['pairs']) - 1
+
+
+def is_matched(state, position):
+    return bool(state['matched'] >> card(state, position) & 1)
+
+
+def can_flip(state, position):
+    """Можно ли открыть карту: она на поле, не найдена и еще не открыта"""
+    return (
+        not is_finished(state)
+        and 0 <= position < state['pairs'] * 2
+        and position != state['first']
+        and not is_matched(state, position)
+    )
+
+
+def flip(state, position):
+    """
+    Открыть карту position (после can_flip). Возвращает (пара карты,
+    'first' | 'match' | 'miss'); при 'match'/'miss' первая открытая карта
+    закрывается или остается открытой вместе с найденной парой.
+    """
+    pair = card(state, position)
+    first = state['first']
+    if first < 0:
+        state['first'] = position
+        return pair, 'first'
+
+    state['first'] = -1
+    state['moves'] += 1
+    if card(state, first) == pair:
+        state['matched'] |= 1 << pair
+        return pair, 'match'
+    state['mistakes'] += 1
+    return pair, 'miss'
+
+
+def score(state):
+    return max(0, state['matched'].bit_count() * PAIR_POINTS - state['mistakes'] * MISTAKE_PENALTY)
+
+
+def layout(state):
+    """Пары на всех позициях (для отрисовки поля; не нужно для ходов)"""
+    return [card(state, position) for position in range(state['pairs'] * 2)]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamesession',
+            name='game_type',
+            field=models.CharField(choices=[('rps', 'Камень-Ножницы-Бумага'), ('hangman', 'Виселица'), ('quiz', 'Викторина'), ('memory', 'Игра на память'), ('2048', '2048')], max_length=20, verbose_name='Тип игры'),
+        ),
+    ]
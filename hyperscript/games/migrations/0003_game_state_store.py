@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0002_alter_gamesession_game_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game2048',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.JSONField(default=dict, verbose_name='Состояние игры')),
+                ('score', models.IntegerField(default=0, verbose_name='Счет')),
+                ('moves', models.IntegerField(default=0, verbose_name='Ходы')),
+                ('size', models.IntegerField(default=4, verbose_name='Размер поля')),
+                ('status', models.CharField(choices=[('active', 'Активная'), ('finished', 'Завершена'), ('abandoned', 'Брошена')], default='active', max_length=10, verbose_name='Статус игры')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата обновления')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('version', models.IntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Партия 2048',
+                'verbose_name_plural': 'Партии 2048',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='hangmangame',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='hangmangame',
+            name='version',
+            field=models.IntegerField(default=0, verbose_name='Версия'),
+        ),
+        migrations.AlterField(
+            model_name='hangmangame',
+            name='status',
+            field=models.CharField(choices=[('active', 'Активная'), ('won', 'Выиграна'), ('lost', 'Проиграна'), ('abandoned', 'Брошена')], default='active', max_length=10, verbose_name='Статус игры'),
+        ),
+        migrations.AddIndex(
+            model_name='hangmangame',
+            index=models.Index(fields=['user', 'status'], name='games_hangm_user_id_b0644a_idx'),
+        ),
+        migrations.AddField(
+            model_name='game2048',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='game2048',
+            index=models.Index(fields=['user', 'status'], name='games_game2_user_id_72aa04_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_stats(apps, schema_editor):
+    """Сводки по уже записанным играм"""
+    GameSession = apps.get_model('games', 'GameSession')
+    GameStats = apps.get_model('games', 'GameStats')
+    ranked = ~models.Q(game_type='2048') | (
+        (models.Q(game_data__size=4) | ~models.Q(game_data__has_key='size'))
+        & models.Q(game_data__verified=True, game_data__assisted=False)
+    )
+    totals = GameSession.objects.values('user_id', 'game_type').annotate(
+        games=models.Count('id'),
+        wins=models.Count('id', filter=models.Q(result='win')),
+        losses=models.Count('id', filter=models.Q(result='lose')),
+        draws=models.Count('id', filter=models.Q(result='draw')),
+        total_score=models.Sum('score', default=0),
+        best_score=models.Max('score', filter=ranked, default=0),
+    ).order_by()
+    rows = []
+    for fields in totals:
+        streak = best_streak = 0
+        results = GameSession.objects.filter(
+            user_id=fields['user_id'], game_type=fields['game_type']
+        ).order_by('created_at', 'id').values_list('result', flat=True)
+        for result in results.iterator():
+            streak = streak + 1 if result == 'win' else 0
+            best_streak = max(best_streak, streak)
+        rows.append(GameStats(streak=streak, best_streak=best_streak, **fields))
+    GameStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_game_state_store'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_type', models.CharField(choices=[('rps', 'Камень-Ножницы-Бумага'), ('hangman', 'Виселица'), ('quiz', 'Викторина'), ('memory', 'Игра на память'), ('2048', '2048')], max_length=20, verbose_name='Тип игры')),
+                ('games', models.IntegerField(default=0, verbose_name='Всего игр')),
+                ('wins', models.IntegerField(default=0, verbose_name='Победы')),
+                ('losses', models.IntegerField(default=0, verbose_name='Поражения')),
+                ('draws', models.IntegerField(default=0, verbose_name='Ничьи')),
+                ('total_score', models.BigIntegerField(default=0, verbose_name='Сумма очков')),
+                ('best_score', models.IntegerField(default=0, verbose_name='Рекорд')),
+                ('streak', models.IntegerField(default=0, verbose_name='Серия побед')),
+                ('best_streak', models.IntegerField(default=0, verbose_name='Лучшая серия побед')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата обновления')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_stats', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сводка игр',
+                'verbose_name_plural': 'Сводки игр',
+                'constraints': [models.UniqueConstraint(fields=('user', 'game_type'), name='unique_game_stats')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
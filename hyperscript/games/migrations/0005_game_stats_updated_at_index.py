@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_game_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamestats',
+            index=models.Index(fields=['updated_at'], name='games_games_updated_02e6b1_idx'),
+        ),
+    ]
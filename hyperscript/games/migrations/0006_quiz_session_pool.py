@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reset_old_sessions(apps, schema_editor):
+    """
+    Списки id пройденных вопросов заменяются пустой маской шагов.
+
+    Старые активные сессии не имеют места в пуле (offset и step), поэтому
+    завершаются: продолжить их нельзя, игрок начнет новую.
+    """
+    QuizSession = apps.get_model('games', 'QuizSession')
+    QuizSession.objects.filter(is_active=True).update(is_active=False)
+    batch = []
+    for session in QuizSession.objects.only('id', 'completed_questions').iterator(chunk_size=1000):
+        if not isinstance(session.completed_questions, int):
+            session.completed_questions = 0
+            batch.append(session)
+        if len(batch) >= 1000:
+            QuizSession.objects.bulk_update(batch, ['completed_questions'])
+            batch = []
+    QuizSession.objects.bulk_update(batch, ['completed_questions'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_game_stats_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='offset',
+            field=models.IntegerField(default=0, verbose_name='Смещение в пуле'),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='step',
+            field=models.IntegerField(default=0, verbose_name='Шаг'),
+        ),
+        migrations.AlterField(
+            model_name='quizsession',
+            name='completed_questions',
+            field=models.JSONField(default=int, verbose_name='Завершенные вопросы'),
+        ),
+        migrations.RunPython(reset_old_sessions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['user', 'is_active'], name='games_quizs_user_id_6b7395_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:45
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalize(text):
+    return ' '.join(unicodedata.normalize('NFKC', str(text)).casefold().split())
+
+
+def fill_hashes(apps, schema_editor):
+    """Хэши уже добавленных вопросов (как QuizQuestion.hash_content)"""
+    QuizQuestion = apps.get_model('games', 'QuizQuestion')
+    batch = []
+    for question in QuizQuestion.objects.only('id', 'question', 'options').iterator(chunk_size=1000):
+        parts = [_normalize(question.question)]
+        parts.extend(sorted(_normalize(option) for option in question.options))
+        question.content_hash = hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
+        batch.append(question)
+        if len(batch) >= 1000:
+            QuizQuestion.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    QuizQuestion.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_quiz_session_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizquestion',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32, verbose_name='Хэш содержимого'),
+        ),
+        migrations.RunPython(fill_hashes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,19 @@
-from django.db import models
+import hashlib
+import logging
+import unicodedata
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+# Отправляется после записи пакета законченных игр (sessions=[GameSession])
+games_recorded = Signal()
+
+
 class GameSession(models.Model):
     """
     Модель для хранения игровых сессий пользователей
@@ -13,6 +25,7 @@ class GameSession(models.Model):
         ('hangman', 'Виселица'),
         ('quiz', 'Викторина'),
         ('memory', 'Игра на память'),
+        ('2048', '2048'),
     ]
     
     # Результаты игры
@@ -88,31 +101,225 @@ class GameSession(models.Model):
         seconds = self.duration % 60
         return f"{minutes:02d}:{seconds:02d}"
     
+    @property
+    def is_ranked(self):
+        """Идет ли счет в рекорд (для 2048 - подтвержденная партия 4x4 без автоигры)"""
+        if self.game_type != '2048':
+            return True
+        data = self.game_data or {}
+        return data.get('size', 4) == 4 and data.get('verified') is True and data.get('assisted') is False
+    
+    @staticmethod
+    def ranked_q():
+        """Условие is_ranked для запросов"""
+        return ~models.Q(game_type='2048') | (
+            (models.Q(game_data__size=4) | ~models.Q(game_data__has_key='size'))
+            & models.Q(game_data__verified=True, game_data__assisted=False)
+        )
+    
+    @classmethod
+    def record(cls, user, game_type, result, score=0, game_data=None, duration=0):
+        """Записать законченную игру и обновить сводку GameStats"""
+        session = cls(
+            user=user,
+            game_type=game_type,
+            score=score,
+            result=result,
+            game_data=game_data or {},
+            duration=duration,
+        )
+        cls.record_many([session])
+        return session
+    
+    @classmethod
+    def record_many(cls, sessions):
+        """Записать пакет игр одним bulk_create и обновить сводки в той же транзакции"""
+        with transaction.atomic():
+            cls.objects.bulk_create(sessions)
+            GameStats.add(sessions)
+        # Игры уже записаны: ошибка получателя не должна приводить к повторной записи
+        for receiver, response in games_recorded.send_robust(sender=cls, sessions=sessions):
+            if isinstance(response, Exception):
+                logger.error('Ошибка обработчика games_recorded %r', receiver, exc_info=response)
+    
+    @classmethod
+    def best_2048_score(cls, user):
+        """Лучший подтвержденный (переигранный по записи) счет в 2048 4x4 без автоигры"""
+        return cls.objects.filter(
+            cls.ranked_q(),
+            user=user,
+            game_type='2048',
+        ).aggregate(models.Max('score'))['score__max'] or 0
+    
+    @classmethod
+    def aggregate_stats(cls, queryset):
+        """Сводка по играм queryset одним запросом (условная агрегация)"""
+        return queryset.aggregate(
+            games=models.Count('id'),
+            wins=models.Count('id', filter=models.Q(result='win')),
+            losses=models.Count('id', filter=models.Q(result='lose')),
+            draws=models.Count('id', filter=models.Q(result='draw')),
+            total_score=models.Sum('score', default=0),
+            best_score=models.Max('score', filter=cls.ranked_q(), default=0),
+        )
+    
     @classmethod
     def get_user_stats(cls, user, game_type=None):
-        """Получение статистики пользователя"""
-        queryset = cls.objects.filter(user=user)
-        
+        """Получение статистики пользователя (из GameStats, без сводки - одним запросом к играм)"""
+        rollups = GameStats.objects.filter(user=user)
         if game_type:
-            queryset = queryset.filter(game_type=game_type)
+            rollups = rollups.filter(game_type=game_type)
+        rollups = list(rollups)
         
-        total_games = queryset.count()
-        wins = queryset.filter(result='win').count()
-        losses = queryset.filter(result='lose').count()
-        draws = queryset.filter(result='draw').count()
-        total_score = queryset.aggregate(models.Sum('score'))['score__sum'] or 0
+        if rollups:
+            totals = {
+                'games': sum(stats.games for stats in rollups),
+                'wins': sum(stats.wins for stats in rollups),
+                'losses': sum(stats.losses for stats in rollups),
+                'draws': sum(stats.draws for stats in rollups),
+                'total_score': sum(stats.total_score for stats in rollups),
+            }
+        else:
+            queryset = cls.objects.filter(user=user)
+            if game_type:
+                queryset = queryset.filter(game_type=game_type)
+            totals = cls.aggregate_stats(queryset)
         
+        total_games = totals['games']
+        wins = totals['wins']
+        total_score = totals['total_score']
         return {
             'total_games': total_games,
             'wins': wins,
-            'losses': losses,
-            'draws': draws,
+            'losses': totals['losses'],
+            'draws': totals['draws'],
             'win_rate': (wins / total_games * 100) if total_games > 0 else 0,
             'total_score': total_score,
             'average_score': total_score / total_games if total_games > 0 else 0,
         }
 
 
+class GameStats(models.Model):
+    """
+    Сводка игр пользователя по типу игры (обновляется при записи GameSession)
+    """
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='game_stats',
+        verbose_name="Пользователь"
+    )
+    
+    game_type = models.CharField(
+        max_length=20,
+        choices=GameSession.GAME_CHOICES,
+        verbose_name="Тип игры"
+    )
+    
+    games = models.IntegerField(default=0, verbose_name="Всего игр")
+    wins = models.IntegerField(default=0, verbose_name="Победы")
+    losses = models.IntegerField(default=0, verbose_name="Поражения")
+    draws = models.IntegerField(default=0, verbose_name="Ничьи")
+    total_score = models.BigIntegerField(default=0, verbose_name="Сумма очков")
+    
+    # Лучший счет среди игр, идущих в рекорд (GameSession.is_ranked)
+    best_score = models.IntegerField(default=0, verbose_name="Рекорд")
+    
+    # Текущая и лучшая серия побед подряд
+    streak = models.IntegerField(default=0, verbose_name="Серия побед")
+    best_streak = models.IntegerField(default=0, verbose_name="Лучшая серия побед")
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата обновления"
+    )
+    
+    class Meta:
+        verbose_name = "Сводка игр"
+        verbose_name_plural = "Сводки игр"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'game_type'], name='unique_game_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.get_game_type_display()}: {self.games} игр"
+    
+    @property
+    def win_rate(self):
+        """Доля побед в процентах"""
+        return self.wins / self.games * 100 if self.games else 0
+    
+    @classmethod
+    def add(cls, sessions):
+        """Учесть записанные игры (атомарно, выражениями F; одно UPDATE на игрока и тип игры)"""
+        groups = {}
+        for session in sessions:
+            groups.setdefault((session.user_id, session.game_type), []).append(session)
+        
+        for (user_id, game_type), group in groups.items():
+            changes = cls._changes(group)
+            rows = cls.objects.filter(user_id=user_id, game_type=game_type)
+            if rows.update(**changes):
+                continue
+            
+            # Первая игра этого типа после появления сводок: считаем по уже записанным играм
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, game_type=game_type,
+                                       **cls.from_sessions(user_id, game_type))
+            except IntegrityError:
+                # Сводку только что создал другой запрос
+                rows.update(**changes)
+    
+    @staticmethod
+    def _changes(sessions):
+        """Выражения UPDATE для игр одного игрока и типа (в порядке записи)"""
+        results = [session.result for session in sessions]
+        wins = results.count('win')
+        leading = next((k for k, result in enumerate(results) if result != 'win'), len(results))
+        trailing = next((k for k, result in enumerate(reversed(results)) if result != 'win'), len(results))
+        changes = {
+            'games': models.F('games') + len(results),
+            'wins': models.F('wins') + wins,
+            'losses': models.F('losses') + results.count('lose'),
+            'draws': models.F('draws') + results.count('draw'),
+            'total_score': models.F('total_score') + sum(session.score for session in sessions),
+            # Серия продолжается, только если все игры пакета - победы
+            'streak': models.F('streak') + wins if leading == len(results) else trailing,
+            'updated_at': timezone.now(),
+        }
+        if wins:
+            changes['best_streak'] = Greatest(
+                models.F('best_streak'), models.F('streak') + leading, GameStats._streaks(results)[1]
+            )
+        ranked = [session.score for session in sessions if session.is_ranked]
+        if ranked:
+            changes['best_score'] = Greatest(models.F('best_score'), max(ranked))
+        return changes
+    
+    @classmethod
+    def from_sessions(cls, user_id, game_type):
+        """Поля сводки, посчитанные по GameSession"""
+        sessions = GameSession.objects.filter(user_id=user_id, game_type=game_type)
+        fields = GameSession.aggregate_stats(sessions)
+        fields['streak'], fields['best_streak'] = cls._streaks(
+            sessions.order_by('created_at', 'id').values_list('result', flat=True)
+        )
+        return fields
+    
+    @staticmethod
+    def _streaks(results):
+        streak = best = 0
+        for result in results:
+            streak = streak + 1 if result == 'win' else 0
+            best = max(best, streak)
+        return streak, best
+
+
 class HangmanGame(models.Model):
     """
     Модель для игры 'Виселица'
@@ -123,6 +330,7 @@ class HangmanGame(models.Model):
         ('active', 'Активная'),
         ('won', 'Выиграна'),
         ('lost', 'Проиграна'),
+        ('abandoned', 'Брошена'),
     ]
     
     user = models.ForeignKey(
@@ -184,10 +392,25 @@ class HangmanGame(models.Model):
         verbose_name="Дата завершения"
     )
     
+    # Дата последнего сохранения состояния
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата обновления"
+    )
+    
+    # Номер сохранения (растет при каждой записи из хранилища состояний)
+    version = models.IntegerField(
+        default=0,
+        verbose_name="Версия"
+    )
+    
     class Meta:
         verbose_name = "Игра в виселицу"
         verbose_name_plural = "Игры в виселицу"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
     
     def __str__(self):
         return f"Виселица: {self.user.username} - {self.word} ({self.status})"
@@ -203,6 +426,129 @@ class HangmanGame(models.Model):
         return self.max_mistakes - self.mistakes
 
 
+class Game2048(models.Model):
+    """
+    Модель для текущей партии 2048
+    """
+    
+    # Статусы игры
+    STATUS_CHOICES = [
+        ('active', 'Активная'),
+        ('finished', 'Завершена'),
+        ('abandoned', 'Брошена'),
+    ]
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь"
+    )
+    
+    # Полное состояние партии (поле, счет, генератор, журнал, история отмены)
+    state = models.JSONField(
+        default=dict,
+        verbose_name="Состояние игры"
+    )
+    
+    score = models.IntegerField(
+        default=0,
+        verbose_name="Счет"
+    )
+    
+    moves = models.IntegerField(
+        default=0,
+        verbose_name="Ходы"
+    )
+    
+    # Размер поля
+    size = models.IntegerField(
+        default=4,
+        verbose_name="Размер поля"
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='active',
+        verbose_name="Статус игры"
+    )
+    
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата создания"
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата обновления"
+    )
+    
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Дата завершения"
+    )
+    
+    # Номер сохранения (растет при каждой записи из хранилища состояний)
+    version = models.IntegerField(
+        default=0,
+        verbose_name="Версия"
+    )
+    
+    class Meta:
+        verbose_name = "Партия 2048"
+        verbose_name_plural = "Партии 2048"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"2048: {self.user.username} - {self.score} ({self.status})"
+
+
+class RPSOpponent(models.Model):
+    """
+    Модель ходов игрока для предсказывающего соперника в Камень-Ножницы-Бумага
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='rps_opponent',
+        verbose_name="Пользователь"
+    )
+    
+    # Счетчики марковских моделей (rps_markov.SIZE байт)
+    counts = models.BinaryField(
+        default=bytes,
+        verbose_name="Счетчики"
+    )
+    
+    # Последние ходы игрока (число по основанию 3)
+    history = models.IntegerField(
+        default=0,
+        verbose_name="Последние ходы"
+    )
+    
+    rounds = models.IntegerField(
+        default=0,
+        verbose_name="Раунды"
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Дата обновления"
+    )
+    
+    class Meta:
+        verbose_name = "Соперник КНБ"
+        verbose_name_plural = "Соперники КНБ"
+    
+    def __str__(self):
+        return f"КНБ: {self.user.username} - {self.rounds} раундов"
+
+
 class QuizQuestion(models.Model):
     """
     Модель для вопросов викторины
@@ -265,6 +611,15 @@ class QuizQuestion(models.Model):
         verbose_name="Дата создания"
     )
     
+    # Хэш нормализованного текста и вариантов - для поиска дубликатов
+    content_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Хэш содержимого"
+    )
+    
     class Meta:
         verbose_name = "Вопрос викторины"
         verbose_name_plural = "Вопросы викторины"
@@ -272,6 +627,25 @@ class QuizQuestion(models.Model):
     
     def __str__(self):
         return f"{self.get_category_display()} - {self.question[:50]}..."
+    
+    def save(self, *args, **kwargs):
+        self.content_hash = self.hash_content(self.question, self.options)
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def normalize_text(text):
+        """Текст для сравнения: NFKC, без регистра и лишних пробелов"""
+        return ' '.join(unicodedata.normalize('NFKC', str(text)).casefold().split())
+    
+    @classmethod
+    def hash_content(cls, question, options):
+        """
+        Хэш вопроса для поиска дубликатов. Порядок вариантов не учитывается:
+        тот же вопрос с перемешанными ответами - дубликат.
+        """
+        parts = [cls.normalize_text(question)]
+        parts.extend(sorted(cls.normalize_text(option) for option in options))
+        return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
 
 
 class QuizSession(models.Model):
@@ -326,12 +700,24 @@ class QuizSession(models.Model):
         verbose_name="Текущий вопрос"
     )
     
-    # Прогресс (вопросы которые уже были)
+    # Пройденные шаги: битовая маска, бит k - отвечен вопрос шага k (games/quiz_pool.py)
     completed_questions = models.JSONField(
-        default=list,
+        default=int,
         verbose_name="Завершенные вопросы"
     )
     
+    # Смещение сессии в пуле вопросов (категория, сложность)
+    offset = models.IntegerField(
+        default=0,
+        verbose_name="Смещение в пуле"
+    )
+    
+    # Номер следующего вопроса сессии
+    step = models.IntegerField(
+        default=0,
+        verbose_name="Шаг"
+    )
+    
     # Статус сессии
     is_active = models.BooleanField(
         default=True,
@@ -353,6 +739,9 @@ class QuizSession(models.Model):
         verbose_name = "Сессия викторины"
         verbose_name_plural = "Сессии викторины"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active']),
+        ]
     
     def __str__(self):
         status = "Активная" if self.is_active else "Завершенная"
@@ -369,5 +758,5 @@ class QuizSession(models.Model):
     def progress(self):
         """Прогресс в процентах"""
         if self.total_questions > 0:
-            return (len(self.completed_questions) / self.total_questions) * 100
+            return (self.step / self.total_questions) * 100
         return 0
\ No newline at end of file
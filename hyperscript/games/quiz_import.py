@@ -0,0 +1,213 @@
+"""
+Потоковый импорт банков вопросов викторины из JSON Lines и CSV.
+
+Файл читается построчно, вопросы проверяются и копятся в пакет не больше
+batch_size штук; пакет сверяется с базой одним запросом по content_hash и
+записывается одним bulk_create. Память не зависит от размера файла: в ней
+только текущий пакет и первые MAX_ERRORS сообщений об ошибках.
+
+Формат записи (JSON Lines - объект в строке, CSV - строка с заголовком):
+    category, difficulty, question, options, correct_answer, explanation
+В CSV варианты ответов - JSON-массив или значения через "|".
+correct_answer - индекс правильного варианта в options (с нуля).
+
+Дубликаты определяются по QuizQuestion.hash_content: совпадают текст
+вопроса и набор вариантов после нормализации.
+"""
+import csv
+import json
+from pathlib import Path
+
+from django.db import transaction
+
+from .models import QuizQuestion
+
+BATCH_SIZE = 500
+MAX_ERRORS = 20
+MIN_OPTIONS = 2
+
+CATEGORIES = dict(QuizQuestion.CATEGORY_CHOICES)
+DIFFICULTIES = dict(QuizQuestion.DIFFICULTY_CHOICES)
+
+
+class QuestionError(ValueError):
+    """Запись не является корректным вопросом"""
+
+
+class ImportStats:
+    """Счетчики импорта"""
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.batches = 0
+        self.errors = []  # (номер строки, сообщение), не больше MAX_ERRORS
+
+    def error(self, line_no, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_no, message))
+
+
+# ---------- чтение файлов ----------
+
+def detect_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if suffix == '.csv':
+        return 'csv'
+    raise QuestionError(f'Не удалось определить формат файла {path}, укажите --format')
+
+
+def read_jsonl(file):
+    """(номер строки, запись) из файла JSON Lines"""
+    for line_no, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, QuestionError(f'некорректный JSON: {e.msg}')
+            continue
+        yield line_no, record
+
+
+def read_csv(file, delimiter=','):
+    """(номер строки, запись) из CSV с заголовком"""
+    reader = csv.DictReader(file, delimiter=delimiter)
+    for record in reader:
+        options = record.get('options') or ''
+        if options.lstrip().startswith('['):
+            try:
+                record['options'] = json.loads(options)
+            except json.JSONDecodeError as e:
+                yield reader.line_num, QuestionError(f'некорректный JSON в options: {e.msg}')
+                continue
+        else:
+            record['options'] = options.split('|') if options else []
+        yield reader.line_num, record
+
+
+def read_records(file, fmt, delimiter=','):
+    if fmt == 'jsonl':
+        return read_jsonl(file)
+    return read_csv(file, delimiter)
+
+
+# ---------- проверка ----------
+
+def _index(value):
+    if isinstance(value, bool):
+        raise QuestionError('correct_answer должен быть целым числом')
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QuestionError('correct_answer должен быть целым числом')
+
+
+def build_question(record, category=None, difficulty=None):
+    """Несохраненный QuizQuestion с content_hash или QuestionError"""
+    if isinstance(record, QuestionError):
+        raise record
+    if not isinstance(record, dict):
+        raise QuestionError('запись должна быть объектом')
+
+    category = str(record.get('category') or category or '').strip()
+    if category not in CATEGORIES:
+        raise QuestionError(f'неизвестная категория "{category}"')
+    difficulty = str(record.get('difficulty') or difficulty or '').strip()
+    if difficulty not in DIFFICULTIES:
+        raise QuestionError(f'неизвестная сложность "{difficulty}"')
+
+    text = record.get('question')
+    if not isinstance(text, str) or not text.strip():
+        raise QuestionError('пустой текст вопроса')
+
+    options = record.get('options')
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        raise QuestionError('options должен быть списком строк')
+    options = [option.strip() for option in options]
+    if len(options) < MIN_OPTIONS or not all(options):
+        raise QuestionError(f'нужно не меньше {MIN_OPTIONS} непустых вариантов ответа')
+    if len({QuizQuestion.normalize_text(option) for option in options}) != len(options):
+        raise QuestionError('варианты ответа повторяются')
+
+    correct_answer = _index(record.get('correct_answer'))
+    if not 0 <= correct_answer < len(options):
+        raise QuestionError(f'correct_answer {correct_answer} вне диапазона 0..{len(options) - 1}')
+
+    explanation = record.get('explanation') or ''
+    if not isinstance(explanation, str):
+        raise QuestionError('explanation должен быть строкой')
+
+    text = text.strip()
+    return QuizQuestion(
+        category=category,
+        difficulty=difficulty,
+        question=text,
+        options=options,
+        correct_answer=correct_answer,
+        explanation=explanation.strip(),
+        content_hash=QuizQuestion.hash_content(text, options),
+    )
+
+
+# ---------- импорт ----------
+
+def import_questions(records, batch_size=BATCH_SIZE, dry_run=False, category=None, difficulty=None,
+                     on_batch=None):
+    """
+    Импортировать записи (line_no, record) пакетами по batch_size.
+
+    on_batch(stats) вызывается после каждого пакета. При dry_run ничего не
+    записывается; дубликаты между пакетами тогда не видны.
+    """
+    stats = ImportStats()
+    batch = {}
+
+    def flush():
+        if not batch:
+            return
+        existing = set(
+            QuizQuestion.objects.filter(content_hash__in=list(batch)).values_list('content_hash', flat=True)
+        )
+        new = [question for content_hash, question in batch.items() if content_hash not in existing]
+        if new and not dry_run:
+            with transaction.atomic():
+                QuizQuestion.objects.bulk_create(new)
+        stats.created += len(new)
+        stats.duplicates += len(batch) - len(new)
+        stats.batches += 1
+        batch.clear()
+        if on_batch is not None:
+            on_batch(stats)
+
+    for line_no, record in records:
+        stats.read += 1
+        try:
+            question = build_question(record, category, difficulty)
+        except QuestionError as e:
+            stats.error(line_no, str(e))
+            continue
+        if question.content_hash in batch:
+            stats.duplicates += 1
+            continue
+        batch[question.content_hash] = question
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+def import_file(path, fmt=None, delimiter=',', **kwargs):
+    """Импортировать файл вопросов; аргументы как у import_questions"""
+    fmt = fmt or detect_format(path)
+    newline = '' if fmt == 'csv' else None
+    with open(path, encoding='utf-8-sig', newline=newline) as file:
+        return import_questions(read_records(file, fmt, delimiter), **kwargs)
@@ -0,0 +1,99 @@
+"""
+Пулы вопросов викторины без ORDER BY RANDOM().
+
+Для каждой пары (категория, сложность) процесс держит массив id активных
+вопросов, перемешанный детерминированно: вопросы упорядочены по
+splitmix64(id), поэтому порядок одинаков во всех воркерах и при добавлении
+вопроса сдвигается только на одну позицию. Сессия викторины хранит
+случайное смещение в пуле и номер шага; следующий вопрос - элемент пула
+(offset + step) % len(pool), то есть одна выборка по первичному ключу.
+
+Пройденные шаги сессии хранятся битовой маской (бит k - вопрос шага k
+отвечен) вместо растущего JSON-списка id.
+
+Пулы перестраиваются после изменения вопросов в этом процессе (сигналы
+post_save/post_delete) и не реже раза в POOL_TTL секунд.
+"""
+import threading
+import time
+from array import array
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .engine_2048 import SeededRandom
+from .models import QuizQuestion
+
+# Секунд, после которых пулы перечитываются из таблицы
+POOL_TTL = 300
+
+_SALT = 0x51A9_7E3C_0D15_2B6F
+
+
+def _order_key(question_id):
+    return SeededRandom(question_id ^ _SALT).next64()
+
+
+class QuestionPools:
+    """Перемешанные id активных вопросов по (категория, сложность)"""
+
+    def __init__(self, ttl=POOL_TTL):
+        self.ttl = ttl
+        self._pools = None
+        self._built = 0.0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        grouped = {}
+        rows = QuizQuestion.objects.filter(is_active=True).values_list('id', 'category', 'difficulty')
+        for question_id, category, difficulty in rows.iterator(chunk_size=10000):
+            grouped.setdefault((category, difficulty), []).append(question_id)
+        return {key: array('q', sorted(ids, key=_order_key)) for key, ids in grouped.items()}
+
+    def pools(self):
+        with self._lock:
+            if self._pools is None or time.monotonic() - self._built > self.ttl:
+                self._pools = self._build()
+                self._built = time.monotonic()
+            return self._pools
+
+    def pool(self, category, difficulty):
+        return self.pools().get((category, difficulty), array('q'))
+
+    def size(self, category, difficulty):
+        return len(self.pool(category, difficulty))
+
+    def question_id(self, category, difficulty, offset, step):
+        """id вопроса шага step сессии со смещением offset (None, если пул пуст)"""
+        pool = self.pool(category, difficulty)
+        if not pool:
+            return None
+        return pool[(offset + step) % len(pool)]
+
+    def invalidate(self):
+        with self._lock:
+            self._pools = None
+
+
+pools = QuestionPools()
+
+
+@receiver(post_save, sender=QuizQuestion)
+@receiver(post_delete, sender=QuizQuestion)
+def invalidate_pools(sender, **kwargs):
+    pools.invalidate()
+
+
+# ---------- пройденные шаги ----------
+
+def mark_completed(completed, step):
+    """Маска пройденных шагов с отмеченным шагом step"""
+    return completed | (1 << step)
+
+
+def is_completed(completed, step):
+    return bool(completed >> step & 1)
+
+
+def completed_count(completed):
+    return completed.bit_count()
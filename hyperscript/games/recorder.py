@@ -0,0 +1,189 @@
+"""
+Пакетная запись законченных игр в GameSession (write-behind).
+
+Законченные игры копятся в очереди процесса и записываются одним
+bulk_create (вместе с обновлением сводок GameStats) в одной транзакции,
+когда в очереди набирается BATCH_SIZE игр или самой старой игре в очереди
+исполняется FLUSH_MS миллисекунд. Так вечерний поток партий берет
+блокировку записи SQLite один раз на пакет, а не на каждую игру.
+
+Очередь записывается при остановке процесса (atexit). При FLUSH_MS = 0
+игры пишутся сразу в потоке запроса. Настройки - GAME_RECORDER_BATCH_SIZE
+и GAME_RECORDER_FLUSH_MS в settings.py.
+
+Пакет, который не удалось записать, возвращается в очередь: до следующей
+попытки проходит не меньше FLUSH_MS (RETRY_MS при FLUSH_MS = 0), а после
+MAX_ATTEMPTS неудач игра отбрасывается с записью в лог. Очередь не длиннее
+MAX_QUEUE игр - лишние самые старые тоже отбрасываются.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import GameSession
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+FLUSH_MS = 500
+
+# Попыток записать игру, пауза между попытками при FLUSH_MS = 0 и длина очереди
+MAX_ATTEMPTS = 3
+RETRY_MS = 1000
+MAX_QUEUE = 5000
+
+
+class GameRecorder:
+    """Очередь законченных игр с записью пакетами"""
+
+    def __init__(self):
+        self.recorded = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._queue = []
+        self._oldest = None  # time.monotonic() самой старой игры в очереди
+        self._retry_at = 0.0  # раньше этого времени запрос не пишет очередь сам
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'GAME_RECORDER_BATCH_SIZE', BATCH_SIZE)
+
+    @property
+    def flush_ms(self):
+        return getattr(settings, 'GAME_RECORDER_FLUSH_MS', FLUSH_MS)
+
+    def record(self, user, game_type, result, score=0, game_data=None, duration=0):
+        """Поставить законченную игру в очередь; возвращает несохраненный GameSession"""
+        session = GameSession(
+            user=user,
+            game_type=game_type,
+            score=score,
+            result=result,
+            game_data=game_data or {},
+            duration=duration,
+        )
+        with self._lock:
+            self._queue.append(session)
+            if len(self._queue) > MAX_QUEUE:
+                self._drop(self._queue[:len(self._queue) - MAX_QUEUE], 'очередь переполнена')
+                del self._queue[:len(self._queue) - MAX_QUEUE]
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            full = (len(self._queue) >= self.batch_size or self.flush_ms <= 0) and now >= self._retry_at
+            if not full:
+                self._start_thread()
+                self._wakeup.notify()
+        if full:
+            self.flush()
+        return session
+
+    def flush(self):
+        """Записать всю очередь одним пакетом"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+                self._oldest = None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                GameSession.record_many(batch)
+            except Exception:
+                logger.exception('Не удалось записать %s игр', len(batch))
+                self._requeue(batch)
+                return 0
+
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.recorded += len(batch)
+                self.flushes += 1
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                self._total_flush_ms += elapsed
+            return len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': len(self._queue),
+                'recorded': self.recorded,
+                'flushes': self.flushes,
+                'failures': self.failures,
+                'dropped': self.dropped,
+                'batch_size': self.batch_size,
+                'flush_ms': self.flush_ms,
+                'last_flush_ms': round(self.last_flush_ms, 3),
+                'max_flush_ms': round(self.max_flush_ms, 3),
+                'avg_flush_ms': round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+    def _requeue(self, batch):
+        """Вернуть пакет в начало очереди после неудачной записи"""
+        retry = []
+        expired = []
+        with self._lock:
+            for session in batch:
+                session._record_attempts = getattr(session, '_record_attempts', 0) + 1
+                if session._record_attempts >= MAX_ATTEMPTS:
+                    expired.append(session)
+                    continue
+                # bulk_create успел выдать первичные ключи до отката транзакции
+                session.pk = None
+                session._state.adding = True
+                session._state.db = None
+                retry.append(session)
+            if expired:
+                self._drop(expired, f'{MAX_ATTEMPTS} неудачных попыток')
+            self._queue[:0] = retry
+            now = time.monotonic()
+            self._retry_at = now + (self.flush_ms if self.flush_ms > 0 else RETRY_MS) / 1000
+            if self._queue:
+                self._oldest = now
+                self._start_thread()
+                self._wakeup.notify()
+            self.failures += 1
+
+    def _drop(self, sessions, reason):
+        """Отбросить игры (вызывается под self._lock)"""
+        for session in sessions:
+            logger.error('Игра не записана (%s): user=%s game_type=%s result=%s score=%s',
+                         reason, session.user_id, session.game_type, session.result, session.score)
+        self.dropped += len(sessions)
+
+    # ---------- фоновый поток ----------
+
+    def _start_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='game-recorder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._oldest is None:
+                    self._wakeup.wait()
+                delay = max(self._oldest + self.flush_ms / 1000, self._retry_at) - time.monotonic()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                    continue
+            close_old_connections()
+            self.flush()
+
+
+recorder = GameRecorder()
+
+atexit.register(recorder.flush)
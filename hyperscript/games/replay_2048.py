@@ -0,0 +1,102 @@
+"""
+Компактные записи партий 2048 и их проверка.
+
+Партия полностью определяется зерном генератора плиток и списком ходов,
+изменивших поле. Каждый ход занимает 2 бита (индекс в
+engine_2048.DIRECTIONS), четыре хода на байт, младшие биты - первый ход.
+В состоянии игры и в GameSession.game_data журнал хранится строкой base64.
+"""
+import base64
+
+from . import engine_2048, engine_nxn
+
+LOG_VERSION = 1
+
+_DIRECTION_INDEX = {direction: k for k, direction in enumerate(engine_2048.DIRECTIONS)}
+
+
+def pack_moves(directions):
+    """Упаковать список направлений по 2 бита на ход"""
+    packed = bytearray((len(directions) + 3) // 4)
+    for n, direction in enumerate(directions):
+        packed[n // 4] |= _DIRECTION_INDEX[direction] << (2 * (n % 4))
+    return bytes(packed)
+
+
+def unpack_moves(packed, count):
+    """Распаковать count ходов"""
+    return [engine_2048.DIRECTIONS[(packed[n // 4] >> (2 * (n % 4))) & 3] for n in range(count)]
+
+
+def encode_log(packed):
+    return base64.b64encode(packed).decode('ascii')
+
+
+def decode_log(log):
+    return base64.b64decode(log.encode('ascii')) if log else b''
+
+
+def append_move(log, count, direction):
+    """Дописать ход в журнал (строка base64), где уже count ходов"""
+    packed = bytearray(decode_log(log))
+    if count % 4 == 0:
+        packed.append(0)
+    packed[count // 4] |= _DIRECTION_INDEX[direction] << (2 * (count % 4))
+    return encode_log(bytes(packed))
+
+
+def truncate_log(log, count):
+    """Оставить в журнале первые count ходов"""
+    packed = bytearray(decode_log(log)[:(count + 3) // 4])
+    if count % 4:
+        packed[-1] &= (1 << (2 * (count % 4))) - 1
+    return encode_log(bytes(packed))
+
+
+def replay(seed, log, count, size=4):
+    """
+    Переиграть партию по зерну и журналу на поле size x size.
+
+    Возвращает словарь: valid (все ходы меняли поле), score, board,
+    max_tile и moves (сколько ходов удалось применить).
+    """
+    packed = decode_log(log)
+    if len(packed) < (count + 3) // 4:
+        return {'valid': False, 'score': 0, 'board': 0, 'max_tile': 0, 'moves': 0}
+
+    engine = engine_nxn.get_engine(size)
+    rng = engine_2048.SeededRandom(seed)
+    board = engine.spawn_tile(engine.spawn_tile(0, rng), rng)
+    score = 0
+    valid = True
+    applied = 0
+    moves = engine_2048.DIRECTIONS
+    move = engine.move
+
+    for n in range(count):
+        direction = moves[(packed[n >> 2] >> ((n & 3) << 1)) & 3]
+        new_board, gained = move(board, direction)
+        if new_board == board:
+            valid = False
+            break
+        score += gained
+        board = engine.spawn_tile(new_board, rng)
+        applied += 1
+
+    max_exponent = engine.max_exponent(board)
+    return {
+        'valid': valid,
+        'score': score,
+        'board': board,
+        'max_tile': 1 << max_exponent if max_exponent else 0,
+        'moves': applied,
+    }
+
+
+def verify(game_data, claimed_score):
+    """Проверить, что заявленный счет получается из записи партии"""
+    try:
+        result = replay(game_data['seed'], game_data['log'], game_data['moves'], game_data.get('size', 4))
+    except (KeyError, TypeError, ValueError):
+        return False
+    return result['valid'] and result['score'] == claimed_score
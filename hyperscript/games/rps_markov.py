@@ -0,0 +1,103 @@
+"""
+Предсказывающий соперник в Камень-Ножницы-Бумага.
+
+Для каждого игрока хранятся счетчики марковских моделей порядков 0..ORDER:
+сколько раз после последних j ходов игрок выбрал каждый из трех вариантов.
+Все счетчики лежат в одном массиве байтов фиксированного размера
+(3 + 9 + 27 + 81 = 120 байт при ORDER = 3), последние ORDER ходов - в одном
+числе по основанию 3. Предсказание и обновление после раунда трогают по
+одной строке из трех счетчиков на порядок - O(1), без просмотра истории.
+
+Когда счетчик строки доходит до 255, вся строка делится пополам: массив
+остается байтовым, а старые привычки игрока постепенно забываются.
+
+Ход компьютера не детерминирован: ожидаемый ход игрока выбирается случайно
+пропорционально счетчикам, а в доле EXPLORE раундов компьютер играет
+случайно. Иначе игрок, знающий модель, всегда мог бы ее обыграть.
+"""
+import random
+from array import array
+
+CHOICES = ('rock', 'paper', 'scissors')
+
+# Кто бьет вариант с индексом i: BEATS[i]
+BEATS = (1, 2, 0)
+
+# Порядок модели - сколько последних ходов учитывается
+ORDER = 3
+
+# Сколько наблюдений контекста нужно, чтобы ему доверять
+MIN_EVIDENCE = 2
+
+# Доля раундов, в которых компьютер играет случайно
+EXPLORE = 0.1
+
+_COUNT_MAX = 255
+
+# Начало строк порядка j в массиве счетчиков
+_OFFSETS = tuple(sum(3 ** i * 3 for i in range(j)) for j in range(ORDER + 2))
+SIZE = _OFFSETS[ORDER + 1]
+_HISTORY_MOD = 3 ** ORDER
+
+
+def result(player, computer):
+    """'win', 'lose' или 'draw' для игрока (индексы вариантов)"""
+    if player == computer:
+        return 'draw'
+    return 'win' if BEATS[computer] == player else 'lose'
+
+
+class MarkovPredictor:
+    """Счетчики ходов игрока по контекстам последних 0..ORDER ходов"""
+
+    __slots__ = ('counts', 'history', 'rounds')
+
+    def __init__(self, counts=b'', history=0, rounds=0):
+        self.counts = array('B', counts) if len(counts) == SIZE else array('B', bytes(SIZE))
+        self.history = history
+        self.rounds = rounds
+
+    def _row(self, order):
+        return _OFFSETS[order] + self.history % 3 ** order * 3
+
+    def _evidence(self):
+        """Счетчики самого длинного контекста, которому можно доверять, или None"""
+        counts = self.counts
+        for order in range(min(self.rounds, ORDER), -1, -1):
+            row = self._row(order)
+            if counts[row] + counts[row + 1] + counts[row + 2] >= MIN_EVIDENCE:
+                return counts[row], counts[row + 1], counts[row + 2]
+        return None
+
+    def predict(self):
+        """Самый вероятный ход игрока или None, если данных мало или ничья счетчиков"""
+        evidence = self._evidence()
+        if evidence is None:
+            return None
+        best = max(evidence)
+        return evidence.index(best) if evidence.count(best) == 1 else None
+
+    def choose(self, rng=random):
+        """Ход компьютера: бьет ход игрока, выбранный по счетчикам, иначе случайный"""
+        evidence = self._evidence()
+        if evidence is None or rng.random() < EXPLORE:
+            return rng.randrange(3)
+        a, b, c = evidence
+        pick = rng.randrange(a + b + c)
+        predicted = 0 if pick < a else 1 if pick < a + b else 2
+        return BEATS[predicted]
+
+    def update(self, throw):
+        """Учесть ход игрока"""
+        counts = self.counts
+        for order in range(min(self.rounds, ORDER) + 1):
+            row = self._row(order)
+            if counts[row + throw] == _COUNT_MAX:
+                for k in range(row, row + 3):
+                    counts[k] >>= 1
+            counts[row + throw] += 1
+        self.history = (self.history * 3 + throw) % _HISTORY_MOD
+        self.rounds += 1
+
+    def to_bytes(self):
+        return self.counts.tobytes()
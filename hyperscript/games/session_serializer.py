@@ -0,0 +1,299 @@
+"""
+Компактный сериализатор сессий (SESSION_SERIALIZER).
+
+Известные ключи сессии кодируются двоично: счетчики и статистика КНБ -
+varint, хэш пользователя - 32 байта вместо 64 hex-символов, поле 2048 -
+8 байт (по полбайта на клетку), названные буквы Виселицы - маска алфавита,
+партия игры на память - ряд varint.
+Все остальное, а также значения непривычной формы, уходят в JSON-хвост.
+
+Формат: байт версии, затем записи <тег><данные>. JSON никогда не
+начинается с байта версии, поэтому сессии, записанные JSONSerializer,
+читаются как прежде. Поля 2048 и Виселицы в старом виде (grid, guessed)
+встречаются только в сессиях, созданных до переноса партий в
+state_store; порядок названных букв при этом не сохраняется.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+
+from . import dictionary_hangman, engine_2048
+
+VERSION = 1
+_HEADER = bytes([VERSION])
+
+TAG_JSON = 0
+TAG_AUTH_ID = 1
+TAG_AUTH_BACKEND = 2
+TAG_AUTH_HASH = 3
+TAG_COUNTER = 4
+TAG_RPS_STATS = 5
+TAG_RPS_LAST = 6
+TAG_GAME_2048 = 7
+TAG_HANGMAN = 8
+TAG_MEMORY = 9
+
+# Целочисленные ключи сессии (индекс в кортеже - часть формата, только дописывать)
+COUNTERS = ('2048_high_score', 'rps_wins', 'hangman_wins', 'total_games_played')
+
+RPS_STATS_KEYS = ('wins', 'losses', 'draws', 'round')
+RPS_CHOICES = ('rock', 'paper', 'scissors')
+RPS_RESULTS = ('win', 'lose', 'draw')
+
+GAME_2048_KEYS = frozenset(('grid', 'score', 'game_over', 'won', 'moves'))
+HANGMAN_KEYS = frozenset(('word', 'guessed', 'wrong_guesses', 'game_over', 'won'))
+
+# Поля партии игры на память (порядок - часть формата); first хранится как first + 1
+MEMORY_KEYS = ('seed', 'pairs', 'matched', 'first', 'moves', 'mistakes', 'started')
+
+_COUNTER_INDEX = {key: k for k, key in enumerate(COUNTERS)}
+_WORD_ENCODING = 'cp1251'
+
+
+def _backends():
+    return tuple(getattr(settings, 'AUTHENTICATION_BACKENDS', ())) or ('django.contrib.auth.backends.ModelBackend',)
+
+
+# ---------- примитивы ----------
+
+def _is_count(value):
+    return type(value) is int and value >= 0
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _flags(state):
+    return int(state['game_over']) | int(state['won']) << 1
+
+
+# ---------- проверка формы значений ----------
+
+def _fits_auth_id(value):
+    return isinstance(value, str) and value.isdigit() and value.isascii() and str(int(value)) == value
+
+
+def _fits_hash(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+def _fits_rps_stats(value):
+    return (
+        isinstance(value, dict)
+        and tuple(value) == RPS_STATS_KEYS
+        and all(_is_count(item) for item in value.values())
+    )
+
+
+def _fits_rps_last(value):
+    return (
+        isinstance(value, dict)
+        and tuple(value) == ('user_choice', 'computer_choice', 'result')
+        and value['user_choice'] in RPS_CHOICES
+        and value['computer_choice'] in RPS_CHOICES
+        and value['result'] in RPS_RESULTS
+    )
+
+
+def _fits_game_2048(value):
+    if not (isinstance(value, dict) and value.keys() == GAME_2048_KEYS):
+        return False
+    grid = value['grid']
+    return (
+        isinstance(grid, list) and len(grid) == engine_2048.SIZE
+        and all(isinstance(row, list) and len(row) == engine_2048.SIZE for row in grid)
+        and all(type(cell) is int and (cell == 0 or 2 <= cell < 1 << 16 and cell & (cell - 1) == 0)
+                for row in grid for cell in row)
+        and _is_count(value['score']) and _is_count(value['moves'])
+        and type(value['game_over']) is bool and type(value['won']) is bool
+    )
+
+
+def _fits_hangman(value):
+    if not (isinstance(value, dict) and value.keys() == HANGMAN_KEYS):
+        return False
+    word, guessed = value['word'], value['guessed']
+    return (
+        isinstance(word, str) and all(letter in dictionary_hangman.LETTER_BITS for letter in word)
+        and isinstance(guessed, list) and len(set(guessed)) == len(guessed)
+        and all(isinstance(letter, str) and letter in dictionary_hangman.LETTER_BITS for letter in guessed)
+        and _is_count(value['wrong_guesses'])
+        and type(value['game_over']) is bool and type(value['won']) is bool
+    )
+
+
+def _fits_memory(value):
+    return (
+        isinstance(value, dict)
+        and tuple(value) == MEMORY_KEYS
+        and all(type(item) is int for item in value.values())
+        and value['first'] >= -1
+        and all(_is_count(value[key]) for key in MEMORY_KEYS if key != 'first')
+    )
+
+
+# ---------- сериализатор ----------
+
+class CompactSerializer:
+    """Сериализатор сессий: известные ключи - двоично, остальное - JSON"""
+
+    def dumps(self, obj):
+        if not isinstance(obj, dict):
+            return json.dumps(obj, separators=(',', ':')).encode('latin-1')
+
+        out = bytearray(_HEADER)
+        rest = {}
+        for key, value in obj.items():
+            if not self._pack(key, value, out):
+                rest[key] = value
+        if rest:
+            payload = json.dumps(rest, separators=(',', ':')).encode('latin-1')
+            out.append(TAG_JSON)
+            _varint(len(payload), out)
+            out += payload
+        return bytes(out)
+
+    def loads(self, data):
+        if data[:1] != _HEADER:
+            return json.loads(data.decode('latin-1'))
+
+        obj = {}
+        pos = 1
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            pos = self._unpack(tag, data, pos, obj)
+        return obj
+
+    def _pack(self, key, value, out):
+        """Записать пару ключ-значение двоично; False, если форма незнакома"""
+        if key == SESSION_KEY and _fits_auth_id(value):
+            out.append(TAG_AUTH_ID)
+            _varint(int(value), out)
+        elif key == BACKEND_SESSION_KEY and value in _backends():
+            out.append(TAG_AUTH_BACKEND)
+            out.append(_backends().index(value))
+        elif key == HASH_SESSION_KEY and _fits_hash(value):
+            out.append(TAG_AUTH_HASH)
+            out += bytes.fromhex(value)
+        elif key in _COUNTER_INDEX and _is_count(value):
+            out.append(TAG_COUNTER)
+            out.append(_COUNTER_INDEX[key])
+            _varint(value, out)
+        elif key == 'rps_stats' and _fits_rps_stats(value):
+            out.append(TAG_RPS_STATS)
+            for item in value.values():
+                _varint(item, out)
+        elif key == 'rps_last_game' and _fits_rps_last(value):
+            out.append(TAG_RPS_LAST)
+            out.append(
+                RPS_CHOICES.index(value['user_choice']) << 4
+                | RPS_CHOICES.index(value['computer_choice']) << 2
+                | RPS_RESULTS.index(value['result'])
+            )
+        elif key == 'game_2048' and _fits_game_2048(value):
+            out.append(TAG_GAME_2048)
+            out.append(_flags(value))
+            _varint(value['score'], out)
+            _varint(value['moves'], out)
+            out += engine_2048.from_grid(value['grid']).to_bytes(8, 'little')
+        elif key == 'hangman' and _fits_hangman(value):
+            word = value['word'].encode(_WORD_ENCODING)
+            out.append(TAG_HANGMAN)
+            out.append(_flags(value))
+            _varint(value['wrong_guesses'], out)
+            _varint(dictionary_hangman.word_mask(value['guessed']), out)
+            _varint(len(word), out)
+            out += word
+        elif key == 'memory_game' and _fits_memory(value):
+            out.append(TAG_MEMORY)
+            for name, item in value.items():
+                _varint(item + 1 if name == 'first' else item, out)
+        else:
+            return False
+        return True
+
+    def _unpack(self, tag, data, pos, obj):
+        """Прочитать запись с тегом tag в obj; возвращает позицию следующей записи"""
+        if tag == TAG_JSON:
+            size, pos = _read_varint(data, pos)
+            obj.update(json.loads(data[pos:pos + size].decode('latin-1')))
+            return pos + size
+        if tag == TAG_AUTH_ID:
+            value, pos = _read_varint(data, pos)
+            obj[SESSION_KEY] = str(value)
+            return pos
+        if tag == TAG_AUTH_BACKEND:
+            obj[BACKEND_SESSION_KEY] = _backends()[data[pos]]
+            return pos + 1
+        if tag == TAG_AUTH_HASH:
+            obj[HASH_SESSION_KEY] = data[pos:pos + 32].hex()
+            return pos + 32
+        if tag == TAG_COUNTER:
+            key = COUNTERS[data[pos]]
+            obj[key], pos = _read_varint(data, pos + 1)
+            return pos
+        if tag == TAG_RPS_STATS:
+            stats = {}
+            for key in RPS_STATS_KEYS:
+                stats[key], pos = _read_varint(data, pos)
+            obj['rps_stats'] = stats
+            return pos
+        if tag == TAG_RPS_LAST:
+            byte = data[pos]
+            obj['rps_last_game'] = {
+                'user_choice': RPS_CHOICES[byte >> 4],
+                'computer_choice': RPS_CHOICES[byte >> 2 & 3],
+                'result': RPS_RESULTS[byte & 3],
+            }
+            return pos + 1
+        if tag == TAG_GAME_2048:
+            flags = data[pos]
+            score, pos = _read_varint(data, pos + 1)
+            moves, pos = _read_varint(data, pos)
+            board = int.from_bytes(data[pos:pos + 8], 'little')
+            obj['game_2048'] = {
+                'grid': engine_2048.to_grid(board),
+                'score': score,
+                'game_over': bool(flags & 1),
+                'won': bool(flags & 2),
+                'moves': moves,
+            }
+            return pos + 8
+        if tag == TAG_HANGMAN:
+            flags = data[pos]
+            wrong, pos = _read_varint(data, pos + 1)
+            mask, pos = _read_varint(data, pos)
+            size, pos = _read_varint(data, pos)
+            obj['hangman'] = {
+                'word': data[pos:pos + size].decode(_WORD_ENCODING),
+                'guessed': dictionary_hangman.mask_to_letters(mask),
+                'wrong_guesses': wrong,
+                'game_over': bool(flags & 1),
+                'won': bool(flags & 2),
+            }
+            return pos + size
+        if tag == TAG_MEMORY:
+            state = {}
+            for name in MEMORY_KEYS:
+                state[name], pos = _read_varint(data, pos)
+            state['first'] -= 1
+            obj['memory_game'] = state
+            return pos
+        raise ValueError(f'Неизвестный тег сессии: {tag}')
@@ -0,0 +1,294 @@
+"""
+Хранилище текущих партий с отложенной записью (write-behind).
+
+Активные партии живут в кэше 'game_state' (файловый кэш, общий для всех
+воркеров машины), поэтому следующий ход видит последнее состояние, на
+какой бы процесс ни попал запрос, а база на ходу не читается. В таблицы
+HangmanGame и Game2048 партия попадает каждые FLUSH_EVERY ходов, при
+окончании игры, после IDLE_TIMEOUT секунд простоя, при выходе
+пользователя и при остановке процесса. Сессия во время игры не меняется.
+
+Запись в кэше хранит счетчик изменений seq. get запоминает прочитанный
+seq (в пределах потока), и update не проходит, если партию успел изменить
+другой запрос: возвращается False, а следующий get прочитает актуальное
+состояние. Запись в таблицу - условный UPDATE по полю version; если
+партию сохранила другая машина, изменения кэша отбрасываются.
+
+Ограничения: проверка seq и запись в кэш не атомарны (окно - время одной
+записи файла), вытеснение кэша по MAX_ENTRIES теряет до FLUSH_EVERY - 1
+незаписанных ходов, а кэш общий только для воркеров одной машины.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import dictionary_hangman
+from .models import Game2048, HangmanGame
+
+logger = logging.getLogger(__name__)
+
+# Ходов между записями партии в таблицу
+FLUSH_EVERY = 10
+
+# Через сколько секунд простоя партия записывается в таблицу
+IDLE_TIMEOUT = 300
+
+# Псевдоним кэша из settings.CACHES
+CACHE_ALIAS = 'game_state'
+
+
+class GameStateStore:
+    """Текущие партии одного типа: общий кэш поверх таблицы model"""
+
+    def __init__(self, model, to_fields, from_row, cache_alias=CACHE_ALIAS,
+                 flush_every=FLUSH_EVERY, idle_timeout=IDLE_TIMEOUT):
+        self.model = model
+        self.to_fields = to_fields  # состояние -> поля модели
+        self.from_row = from_row    # строка модели -> состояние
+        self.cache_alias = cache_alias
+        self.flush_every = flush_every
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.conflicts = 0
+        self._touched = {}  # id пользователя -> время последнего хода в этом процессе
+        self._read = threading.local()  # seq, прочитанные текущим запросом
+        self._lock = threading.RLock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, user):
+        """
+        Текущая партия пользователя (последняя не брошенная) или None.
+
+        Возвращается копия: изменения попадают в хранилище только через update.
+        """
+        with self._lock:
+            self._flush_idle()
+            entry = self.cache.get(self._key(user.pk))
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                row = self._current_row(user)
+                if row is None:
+                    return None
+                entry = self._entry(row.pk, row.version, self.from_row(row))
+                self.cache.set(self._key(user.pk), entry)
+            self._remember(user.pk, entry['seq'])
+            return entry['state']
+
+    def start(self, user, state):
+        """Новая партия: прежняя активная помечается брошенной"""
+        with self._lock:
+            self.flush_user(user.pk)
+            self.model.objects.filter(user=user, status='active').update(status='abandoned')
+            row = self.model.objects.create(user=user, **self.to_fields(state))
+            self.writes += 1
+            entry = self._entry(row.pk, row.version, state)
+            self.cache.set(self._key(user.pk), entry)
+            self._remember(user.pk, entry['seq'])
+
+    def update(self, user, state, flush=False):
+        """
+        Партия изменилась; в таблицу - по FLUSH_EVERY ходам, в конце игры или при flush.
+
+        Возвращает False, если партию с момента get изменил другой запрос
+        или другая машина: тогда ход не сохранен.
+        """
+        with self._lock:
+            key = self._key(user.pk)
+            entry = self.cache.get(key)
+            read = self._read_seq(user.pk)
+            if entry is None:
+                # Вытеснена из кэша - продолжаем с версии в таблице
+                row = self._current_row(user)
+                if row is None:
+                    self.start(user, state)
+                    return True
+                entry = self._entry(row.pk, row.version, state)
+            elif read is not None and entry['seq'] != read:
+                self.conflicts += 1
+                logger.warning('%s #%s изменена другим запросом, ход не записан',
+                               self.model.__name__, entry['row_id'])
+                return False
+
+            entry['state'] = state
+            entry['seq'] += 1
+            entry['dirty'] += 1
+            entry['touched'] = time.time()
+            self._touched[user.pk] = time.monotonic()
+            if flush or state.get('game_over') or entry['dirty'] >= self.flush_every:
+                if not self._flush(user.pk, entry):
+                    return False
+            else:
+                self.cache.set(key, entry)
+            self._remember(user.pk, entry['seq'])
+            return True
+
+    def flush_user(self, user_id):
+        """Записать несохраненные ходы пользователя в таблицу"""
+        with self._lock:
+            self._touched.pop(user_id, None)
+            entry = self.cache.get(self._key(user_id))
+            if entry is not None and entry['dirty']:
+                self._flush(user_id, entry)
+
+    def flush_all(self):
+        """Записать партии, которые менял этот процесс"""
+        with self._lock:
+            for user_id in list(self._touched):
+                self.flush_user(user_id)
+
+    def clear(self):
+        """Забыть кэш без записи (для тестов)"""
+        with self._lock:
+            self.cache.clear()
+            self._touched.clear()
+            self._read = threading.local()
+
+    def stats(self):
+        return {
+            'model': self.model.__name__,
+            'touched': len(self._touched),
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'conflicts': self.conflicts,
+        }
+
+    # ---------- внутреннее ----------
+
+    def _key(self, user_id):
+        return f'{self.model._meta.label_lower}:{user_id}'
+
+    @staticmethod
+    def _entry(row_id, version, state):
+        return {'row_id': row_id, 'version': version, 'state': state,
+                'seq': 0, 'dirty': 0, 'touched': time.time()}
+
+    def _remember(self, user_id, seq):
+        if not hasattr(self._read, 'seq'):
+            self._read.seq = {}
+        self._read.seq[user_id] = seq
+
+    def _read_seq(self, user_id):
+        return getattr(self._read, 'seq', {}).get(user_id)
+
+    def _current_row(self, user):
+        return (
+            self.model.objects.filter(user=user)
+            .exclude(status='abandoned')
+            .order_by('-id')
+            .first()
+        )
+
+    def _flush_idle(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for user_id, touched in list(self._touched.items()):
+            if touched <= deadline:
+                self.flush_user(user_id)
+
+    def _flush(self, user_id, entry):
+        """Записать партию, если в таблице та же версия, что в кэше"""
+        key = self._key(user_id)
+        updated = self.model.objects.filter(pk=entry['row_id'], version=entry['version']).update(
+            version=entry['version'] + 1, **self.to_fields(entry['state'])
+        )
+        self.writes += 1
+        if not updated:
+            self.conflicts += 1
+            logger.warning('%s #%s сохранена другим процессом, изменения кэша отброшены',
+                           self.model.__name__, entry['row_id'])
+            self.cache.delete(key)  # при следующем get партия перечитается из таблицы
+            return False
+
+        # Пока шла запись, партию мог изменить другой воркер - его ходы остаются несохраненными
+        current = self.cache.get(key)
+        if current is not None and current['row_id'] == entry['row_id'] and current['seq'] > entry['seq']:
+            current['dirty'] = current['seq'] - entry['seq']
+            entry = current
+        else:
+            entry['dirty'] = 0
+        entry['version'] += 1
+        self.cache.set(key, entry)
+        return True
+
+
+# ---------- Виселица ----------
+
+def _hangman_fields(state):
+    fields = {
+        'word': state['word'],
+        'current_state': dictionary_hangman.reveal(state['word'], state['guessed_mask']),
+        'used_letters': ''.join(dictionary_hangman.mask_to_letters(state['guessed_mask'])),
+        'mistakes': state['wrong_guesses'],
+        'max_mistakes': state.get('max_wrong', 7),
+        'status': ('won' if state['won'] else 'lost') if state['game_over'] else 'active',
+        'updated_at': timezone.now(),
+    }
+    if state['game_over']:
+        fields['completed_at'] = fields['updated_at']
+    return fields
+
+
+def _hangman_state(row):
+    return {
+        'word': row.word,
+        'word_mask': dictionary_hangman.word_mask(row.word),
+        'guessed_mask': dictionary_hangman.word_mask(row.used_letters),
+        'wrong_guesses': row.mistakes,
+        'game_over': row.status in ('won', 'lost'),
+        'won': row.status == 'won',
+    }
+
+
+# ---------- 2048 ----------
+
+def _game_2048_fields(state):
+    fields = {
+        'state': state,
+        'score': state['score'],
+        'moves': state['moves'],
+        'size': state.get('size', 4),
+        'status': 'finished' if state['game_over'] else 'active',
+        'updated_at': timezone.now(),
+    }
+    if state['game_over']:
+        fields['completed_at'] = fields['updated_at']
+    return fields
+
+
+def _game_2048_state(row):
+    return row.state
+
+
+hangman_games = GameStateStore(HangmanGame, _hangman_fields, _hangman_state)
+games_2048 = GameStateStore(Game2048, _game_2048_fields, _game_2048_state)
+
+STORES = (hangman_games, games_2048)
+
+
+def flush_all():
+    for store in STORES:
+        store.flush_all()
+
+
+atexit.register(flush_all)
+
+
+@receiver(user_logged_out)
+def flush_on_logout(sender, user, **kwargs):
+    """Записать партии пользователя при выходе, чтобы продолжить с другого устройства"""
+    if user is not None:
+        for store in STORES:
+            store.flush_user(user.pk)
@@ -1,3 +1,1331 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import get_commands
+from django.template.loader import render_to_string
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from hyperscript.session_backend import SessionStore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import (
+    dictionary_hangman, engine_2048, engine_nxn, expectimax_2048, fragments, leaderboard, memory_board, quiz_import,
+    quiz_pool, replay_2048, rps_markov,
+    session_serializer, state_store, undo_2048,
+)
+from .models import Game2048, GameSession, GameStats, HangmanGame, QuizQuestion, QuizSession, RPSOpponent
+from . import recorder as recorder_module
+from .recorder import GameRecorder
+from .views import (
+    apply_2048_move, get_2048_high_score, initialize_2048_game, initialize_hangman_game, merge_2048_row,
+    next_quiz_question, play_rps_rounds, prepare_2048_context, prepare_hangman_context, record_2048_game,
+    save_2048_state, undo_2048_moves,
+)
+
+
+class Engine2048Tests(TestCase):
+    """Тесты битового движка 2048"""
+
+    def test_row_tables_match_merge_2048_row(self):
+        """Таблицы строк совпадают с merge_2048_row на всех 65536 строках"""
+        for row in range(65536):
+            values = engine_2048.row_to_values(row)
+            expected, expected_score = merge_2048_row(values)
+            if max(expected) > 1 << engine_2048.MAX_EXPONENT:
+                # Две плитки 32768 не помещаются в 4 бита и не объединяются
+                continue
+            self.assertEqual(engine_2048.row_to_values(engine_2048.ROW_LEFT[row]), expected)
+            self.assertEqual(engine_2048.ROW_LEFT_SCORE[row], expected_score)
+
+            reversed_expected, reversed_score = merge_2048_row(values[::-1])
+            self.assertEqual(engine_2048.row_to_values(engine_2048.ROW_RIGHT[row]), reversed_expected[::-1])
+            self.assertEqual(engine_2048.ROW_RIGHT_SCORE[row], reversed_score)
+
+    def test_max_tiles_do_not_merge(self):
+        row = engine_2048.row_from_values([32768, 32768, 0, 0])
+        self.assertEqual(engine_2048.ROW_LEFT[row], row)
+        self.assertEqual(engine_2048.ROW_LEFT_SCORE[row], 0)
+
+    def test_grid_round_trip_and_transpose(self):
+        grid = [[2, 4, 8, 16], [32, 64, 128, 256], [512, 1024, 2048, 4096], [0, 2, 0, 4]]
+        board = engine_2048.from_grid(grid)
+        self.assertEqual(engine_2048.to_grid(board), grid)
+        transposed = [list(col) for col in zip(*grid)]
+        self.assertEqual(engine_2048.to_grid(engine_2048.transpose(board)), transposed)
+
+    def test_vertical_moves(self):
+        board = engine_2048.from_grid([[2, 0, 0, 0], [2, 0, 0, 4], [4, 0, 0, 4], [0, 0, 2, 8]])
+        up, up_score = engine_2048.move(board, 'up')
+        self.assertEqual(engine_2048.to_grid(up), [[4, 0, 2, 8], [4, 0, 0, 8], [0, 0, 0, 0], [0, 0, 0, 0]])
+        self.assertEqual(up_score, 12)
+        down, down_score = engine_2048.move(board, 'down')
+        self.assertEqual(engine_2048.to_grid(down), [[0, 0, 0, 0], [0, 0, 0, 0], [4, 0, 0, 8], [4, 0, 2, 8]])
+        self.assertEqual(down_score, 12)
+
+    def test_can_move_and_empty_cells(self):
+        full = engine_2048.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+        self.assertEqual(engine_2048.count_empty(full), 0)
+        self.assertFalse(engine_2048.can_move(full))
+
+        mergeable = engine_2048.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 4]])
+        self.assertTrue(engine_2048.can_move(mergeable))
+
+        vertical = engine_2048.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [2, 8, 16, 32]])
+        self.assertTrue(engine_2048.can_move(vertical))
+
+        self.assertEqual(engine_2048.count_empty(0), 16)
+        self.assertEqual(engine_2048.count_empty(engine_2048.spawn_tile(0)), 15)
+
+    def test_seeded_games_are_reproducible(self):
+        first = initialize_2048_game()
+
+        # Повторяем начальные плитки с того же зерна
+        rng = engine_2048.SeededRandom(first['seed'])
+        board = engine_2048.spawn_tile(engine_2048.spawn_tile(0, rng), rng)
+        second = dict(first, board=board, rng=rng.state)
+        self.assertEqual(first['board'], second['board'])
+
+        for direction in ['left', 'up', 'right', 'down'] * 10:
+            apply_2048_move(first, direction)
+            apply_2048_move(second, direction)
+        self.assertEqual(first['board'], second['board'])
+        self.assertEqual(first['rng'], second['rng'])
+
+
+class Expectimax2048Tests(TestCase):
+    """Тесты поиска подсказок 2048"""
+
+    def test_best_move_is_legal(self):
+        board = engine_2048.from_grid([[2, 2, 4, 8], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])
+        result = expectimax_2048.best_move(board, depth=2, time_budget=0.2)
+        self.assertIn(result['direction'], expectimax_2048.legal_moves(board))
+        self.assertGreaterEqual(result['depth'], 1)
+
+    def test_only_legal_move_is_chosen(self):
+        # Поле заполнено, слияние возможно только по горизонтали в нижней строке
+        board = engine_2048.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [8, 8, 4, 2]])
+        self.assertEqual(set(expectimax_2048.legal_moves(board)), {'left', 'right'})
+        result = expectimax_2048.best_move(board, depth=3, time_budget=0.2)
+        self.assertIn(result['direction'], ('left', 'right'))
+
+    def test_no_moves(self):
+        board = engine_2048.from_grid([[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]])
+        self.assertIsNone(expectimax_2048.best_move(board)['direction'])
+
+    def test_zero_budget_still_answers(self):
+        board = engine_2048.from_grid([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]])
+        result = expectimax_2048.best_move(board, depth=6, time_budget=0)
+        self.assertIsNotNone(result['direction'])
+
+
+class EngineNxNTests(TestCase):
+    """Тесты движка 2048 для полей произвольного размера"""
+
+    def test_generic_engine_matches_bitboards(self):
+        generic = engine_nxn.BoardEngine(4)
+        rng = random.Random(1)
+        for _ in range(500):
+            board = rng.getrandbits(64) & 0x3333333333333333
+            self.assertEqual(generic.transpose(board), engine_2048.transpose(board))
+            for direction in engine_2048.DIRECTIONS:
+                self.assertEqual(generic.move(board, direction), engine_2048.move(board, direction))
+                self.assertEqual(generic.trace_move(board, direction), engine_2048.trace_move(board, direction))
+
+    def test_large_board_moves(self):
+        engine = engine_nxn.get_engine(6)
+        board = engine.from_grid([
+            [2, 2, 4, 4, 0, 8],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [2, 0, 0, 0, 0, 16],
+        ])
+        board, score = engine.move(board, 'left')
+        self.assertEqual(score, 12)
+        self.assertEqual(engine.to_grid(board)[0], [4, 8, 8, 0, 0, 0])
+        board, score = engine.move(board, 'down')
+        self.assertEqual(engine.to_grid(board)[5], [2, 16, 8, 0, 0, 0])
+        self.assertEqual(engine.to_grid(board)[4], [4, 8, 0, 0, 0, 0])
+        self.assertEqual(engine.count_empty(board), 31)
+
+    def test_full_board_without_merges(self):
+        engine = engine_nxn.get_engine(3)
+        board = engine.from_grid([[2, 4, 2], [4, 2, 4], [2, 4, 2]])
+        self.assertFalse(engine.can_move(board))
+        self.assertTrue(engine.can_move(engine.from_grid([[2, 4, 2], [4, 2, 4], [2, 4, 4]])))
+
+    def test_unsupported_size(self):
+        self.assertIs(engine_nxn.get_engine(4), engine_2048)
+        with self.assertRaises(ValueError):
+            engine_nxn.get_engine(7)
+
+
+def play_random_2048_game(seed=0, size=4):
+    """Сыграть партию случайными ходами до конца"""
+    rng = random.Random(seed)
+    game_state = initialize_2048_game(size)
+    while not game_state['game_over']:
+        apply_2048_move(game_state, rng.choice(engine_2048.DIRECTIONS))
+    return game_state
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class Replay2048Tests(TestCase):
+    """Тесты записи и проверки партий 2048"""
+
+    def test_pack_round_trip(self):
+        directions = ['up', 'down', 'left', 'right', 'left', 'up', 'up']
+        packed = replay_2048.pack_moves(directions)
+        self.assertEqual(len(packed), 2)
+        self.assertEqual(replay_2048.unpack_moves(packed, len(directions)), directions)
+
+        log = ''
+        for n, direction in enumerate(directions):
+            log = replay_2048.append_move(log, n, direction)
+        self.assertEqual(replay_2048.decode_log(log), packed)
+
+    def test_recorded_game_is_verified(self):
+        user = User.objects.create_user('replayer', password='secret-pass')
+        game_state = play_random_2048_game()
+
+        replayed = replay_2048.replay(game_state['seed'], game_state['log'], game_state['moves'])
+        self.assertTrue(replayed['valid'])
+        self.assertEqual(replayed['board'], game_state['board'])
+
+        session = record_2048_game(user, game_state)
+        self.assertEqual(session.game_type, '2048')
+        self.assertTrue(session.game_data['verified'])
+        self.assertEqual(GameSession.best_2048_score(user), game_state['score'])
+
+        # Завышенный счет не подтверждается
+        self.assertFalse(replay_2048.verify(session.game_data, game_state['score'] + 4))
+
+    def test_large_board_game_is_verified_but_not_ranked(self):
+        user = User.objects.create_user('replayer', password='secret-pass')
+        game_state = play_random_2048_game(size=5)
+
+        session = record_2048_game(user, game_state)
+        self.assertEqual(session.game_data['size'], 5)
+        self.assertTrue(session.game_data['verified'])
+        self.assertEqual(GameSession.best_2048_score(user), 0)
+
+
+class Undo2048Tests(TestCase):
+    """Тесты отмены ходов 2048"""
+
+    def test_ring_buffer_keeps_last_entries(self):
+        history = undo_2048.empty_history()
+        for n in range(undo_2048.UNDO_CAPACITY + 5):
+            undo_2048.push(history, n, n * 10)
+        self.assertEqual(history['count'], undo_2048.UNDO_CAPACITY)
+        self.assertLess(len(json.dumps(history)), 600)
+
+        popped = []
+        while (entry := undo_2048.pop(history)) is not None:
+            popped.append(entry[0])
+        self.assertEqual(popped, list(range(undo_2048.UNDO_CAPACITY + 4, 4, -1)))
+
+    def test_undo_restores_state_and_keeps_replay_valid(self):
+        game_state = initialize_2048_game()
+        rng = random.Random(5)
+        snapshots = []
+        while game_state['moves'] < 10:
+            snapshots.append((game_state['board'], game_state['score'], game_state['rng']))
+            apply_2048_move(game_state, rng.choice(engine_2048.DIRECTIONS))
+            if len(snapshots) > game_state['moves']:
+                snapshots.pop()
+
+        self.assertEqual(undo_2048_moves(game_state, 3), 3)
+        self.assertEqual(game_state['moves'], 7)
+        self.assertEqual((game_state['board'], game_state['score'], game_state['rng']), snapshots[7])
+        self.assertTrue(game_state['assisted'])
+
+        replayed = replay_2048.replay(game_state['seed'], game_state['log'], game_state['moves'])
+        self.assertTrue(replayed['valid'])
+        self.assertEqual(replayed['board'], game_state['board'])
+        self.assertEqual(replayed['score'], game_state['score'])
+
+    def test_large_board_history(self):
+        history = undo_2048.empty_history(6)
+        board = (1 << 143) | 0xABC
+        undo_2048.push(history, board, 70000)
+        self.assertEqual(undo_2048.pop(history), (board, 70000))
+
+
+@unittest.skipIf(np is None, 'NumPy не установлен')
+class Batch2048Tests(TestCase):
+    """Тесты пакетного движка 2048"""
+
+    def test_batch_moves_match_engine(self):
+        from . import batch_2048
+
+        rng = random.Random(7)
+        boards = [rng.getrandbits(64) for _ in range(500)]
+        array = np.array(boards, dtype=np.uint64)
+        for direction in engine_2048.DIRECTIONS:
+            results, scores = batch_2048.move(array, direction)
+            for board, result, score in zip(boards, results.tolist(), scores.tolist()):
+                self.assertEqual((result, score), engine_2048.move(board, direction))
+
+    def test_simulation_finishes_games(self):
+        from . import batch_2048
+
+        result = batch_2048.simulate(200, batch_2048.choose_random, np.random.default_rng(1), verify=20)
+        for board in result['boards'].tolist():
+            self.assertFalse(engine_2048.can_move(board))
+        self.assertEqual(result['total_moves'], int(result['moves'].sum()))
+
+    def test_batch_replay_matches_scalar(self):
+        from . import batch_2048
+
+        games = [play_random_2048_game(seed) for seed in range(20)]
+        logs = [replay_2048.decode_log(game['log']) for game in games]
+        # Портим одну запись: лишний ход после конца партии
+        counts = [game['moves'] for game in games]
+        counts[3] += 1
+        logs[3] += b'\x00'
+
+        result = batch_2048.replay_logs([game['seed'] for game in games], logs, counts)
+        for n, game in enumerate(games):
+            if n == 3:
+                self.assertFalse(result['valid'][n])
+                continue
+            self.assertTrue(result['valid'][n])
+            self.assertEqual(int(result['scores'][n]), game['score'])
+            self.assertEqual(int(result['boards'][n]), game['board'])
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class Game2048ViewTests(TestCase):
+    """Тесты представлений 2048"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('player', password='secret-pass')
+        self.client.force_login(self.user)
+        state_store.hangman_games.clear()
+        state_store.games_2048.clear()
+
+    def test_move_returns_grid(self):
+        self.client.post('/games/2048/new/')
+        response = self.client.post(
+            '/games/2048/move/',
+            data=json.dumps({'direction': 'left'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        grid = response.json()['game_state']['grid']
+        self.assertEqual(len(grid), 4)
+        self.assertTrue(all(len(row) == 4 for row in grid))
+
+    def test_legacy_grid_session_is_upgraded(self):
+        session = self.client.session
+        session['game_2048'] = {
+            'grid': [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+            'score': 0, 'game_over': False, 'won': False, 'moves': 0,
+        }
+        session.save()
+        response = self.client.post(
+            '/games/2048/move/',
+            data=json.dumps({'direction': 'left'}),
+            content_type='application/json',
+        )
+        state = response.json()['game_state']
+        self.assertEqual(state['score'], 4)
+        self.assertEqual(state['grid'][0][0], 4)
+
+    def test_hint_and_autoplay(self):
+        self.client.post('/games/2048/new/')
+        self.assertFalse(state_store.games_2048.get(self.user)['assisted'])
+        hint = self.client.get('/games/2048/hint/', {'depth': 2, 'budget_ms': 50}).json()
+        self.assertIn(hint['direction'], engine_2048.DIRECTIONS)
+        # Подсказка, как и автоигра, исключает партию из рекордов
+        state_store.games_2048.clear()
+        self.assertTrue(state_store.games_2048.get(self.user)['assisted'])
+
+        response = self.client.post(
+            '/games/2048/autoplay/',
+            data=json.dumps({'depth': 2}),
+            content_type='application/json',
+        ).json()
+        self.assertIn(response['direction'], engine_2048.DIRECTIONS)
+        self.assertTrue(response['moved'])
+        self.assertEqual(response['game_state']['moves'], 1)
+
+    def test_hint_rejects_bad_params(self):
+        response = self.client.get('/games/2048/hint/', {'depth': 'deep'})
+        self.assertEqual(response.status_code, 400)
+
+    def _set_board(self, grid, moves=0):
+        session = self.client.session
+        session['game_2048'] = {
+            'board': engine_2048.from_grid(grid),
+            'score': 0, 'game_over': False, 'won': False, 'moves': moves,
+        }
+        session.save()
+
+    def _state(self):
+        return state_store.games_2048.get(self.user)
+
+    def _move(self, **data):
+        return self.client.post('/games/2048/move/', data=json.dumps(data), content_type='application/json')
+
+    def test_delta_mode(self):
+        self._set_board([[0, 2, 0, 2], [4, 0, 0, 0], [0, 0, 0, 0], [0, 0, 8, 0]])
+        data = self._move(direction='left', mode='delta', moves=0).json()
+        self.assertNotIn('html', data)
+        self.assertTrue(data['moved'])
+        self.assertEqual(data['moves'], 1)
+        delta = data['delta']
+        self.assertEqual(delta['movements'], [[0, 1, 0, 0], [0, 3, 0, 0], [3, 2, 3, 0]])
+        self.assertEqual(delta['merges'], [[0, 0, 4]])
+        self.assertEqual(delta['score_delta'], 4)
+        i, j, value = delta['spawn']
+        self.assertIn(value, (2, 4))
+        self.assertEqual(engine_2048.to_grid(self._state()['board'])[i][j], value)
+
+    def test_delta_mode_noop_move_sends_null(self):
+        self._set_board([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        data = self._move(direction='left', mode='delta', moves=0).json()
+        self.assertFalse(data['moved'])
+        self.assertIsNone(data['delta'])
+
+    def test_delta_mode_resyncs_on_stale_client(self):
+        self._set_board([[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], moves=5)
+        data = self._move(direction='left', mode='delta', moves=3).json()
+        self.assertTrue(data['resync'])
+        self.assertIn('html', data)
+        self.assertEqual(data['game_state']['moves'], 6)
+
+    def test_batched_moves_resync_on_stale_client(self):
+        self._set_board([[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], moves=5)
+        data = self._move(directions=['left', 'right'], mode='delta', moves=2).json()
+        # Полный фрагмент без изменений: клиент заменяет поле и берет счетчик из game_state
+        self.assertTrue(data['resync'])
+        self.assertIn('html', data)
+        self.assertNotIn('deltas', data)
+        self.assertEqual(data['game_state']['moves'], self._state()['moves'])
+        # Следующий запрос с этим счетчиком уже не требует полного фрагмента
+        data = self._move(directions=['up'], mode='delta', moves=data['game_state']['moves']).json()
+        self.assertNotIn('html', data)
+        self.assertIn('deltas', data)
+
+    def test_full_mode_is_default(self):
+        self._set_board([[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        data = self._move(direction='left').json()
+        self.assertIn('html', data)
+        self.assertNotIn('delta', data)
+
+    def test_batched_moves(self):
+        self._set_board([[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+        data = self._move(directions=['left', 'right', 'up'], mode='delta', moves=0).json()
+        self.assertEqual(len(data['deltas']), 3)
+        self.assertEqual(data['deltas'][0]['merges'], [[0, 0, 4]])
+        self.assertEqual(data['moves'], sum(1 for delta in data['deltas'] if delta))
+        self.assertEqual(self._state()['moves'], data['moves'])
+
+    def test_batch_size_is_limited(self):
+        self.client.post('/games/2048/new/')
+        response = self._move(directions=['left'] * 33)
+        self.assertEqual(response.status_code, 400)
+
+    def test_finished_game_is_recorded_once(self):
+        # Единственный ход влево заканчивает партию
+        self._set_board([[2, 2, 8, 16], [8, 4, 32, 64], [16, 8, 4, 2], [32, 16, 2, 4]])
+        self._move(direction='left')
+        self._move(direction='left')
+        self.assertTrue(self._state()['game_over'])
+        self.assertEqual(GameSession.objects.filter(user=self.user, game_type='2048').count(), 1)
+
+    def test_new_game_with_board_size_and_win_tile(self):
+        data = self.client.post('/games/2048/new/', data=json.dumps({'size': 5, 'win_tile': 256}),
+                                content_type='application/json').json()
+        self.assertEqual(len(data['game_state']['grid']), 5)
+        self.assertEqual(data['game_state']['win_tile'], 256)
+        self.assertIn('board-size-5', data['html'])
+
+        state = self._move(direction='left').json()['game_state']
+        self.assertTrue(all(len(row) == 5 for row in state['grid']))
+
+        # Подсказки считаются только для поля 4x4
+        self.assertEqual(self.client.get('/games/2048/hint/').status_code, 400)
+
+        for params in ({'size': 7}, {'win_tile': 1000}, {'win_tile': 4}):
+            response = self.client.post('/games/2048/new/', data=json.dumps(params),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_custom_win_tile(self):
+        session = self.client.session
+        game_state = initialize_2048_game(3, 16)
+        game_state['board'] = engine_nxn.get_engine(3).from_grid([[8, 8, 0], [0, 0, 0], [0, 0, 0]])
+        session['game_2048'] = game_state
+        session.save()
+        state = self._move(direction='left').json()['game_state']
+        self.assertTrue(state['won'])
+
+    def test_undo_endpoint(self):
+        grid = [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        self._set_board(grid)
+        before = engine_2048.from_grid(grid)
+        self._move(direction='left')
+        data = self.client.post('/games/2048/undo/', data=json.dumps({'steps': 5}),
+                                content_type='application/json').json()
+        self.assertEqual(data['undone'], 1)
+        self.assertEqual(data['game_state']['score'], 0)
+        self.assertEqual(data['game_state']['undo_available'], 0)
+        self.assertEqual(self._state()['board'], before)
+
+
+class DictionaryHangmanTests(TestCase):
+    """Тесты словаря Виселицы"""
+
+    def test_masks(self):
+        mask = dictionary_hangman.word_mask('КЛАСС')
+        self.assertEqual(dictionary_hangman.mask_to_letters(mask), ['А', 'К', 'Л', 'С'])
+        self.assertEqual(dictionary_hangman.letter_mask('Я'), 1 << 32)
+        self.assertEqual(dictionary_hangman.letter_mask('Q'), 0)
+        self.assertIsNone(dictionary_hangman.normalize_word('hello'))
+        self.assertEqual(dictionary_hangman.normalize_word(' ёлка\n'), 'ЁЛКА')
+
+    def test_random_word_by_length_and_difficulty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'words.bin')
+            buckets = dictionary_hangman.build_dictionary(
+                ['КОТ', 'КИТ', 'ДОМ', 'ШКАФ', 'СЛОВАРЬ', 'ПРОГРАММА', 'ЪЕЪ'] * 2, path
+            )
+            self.assertEqual(sum(buckets.values()), 7)
+            dictionary = dictionary_hangman.WordDictionary(path)
+            self.assertEqual(len(dictionary), 7)
+            self.assertEqual(dictionary.count(length=3), 4)
+
+            rng = random.Random(0)
+            seen = set()
+            for _ in range(50):
+                word, mask = dictionary.random_word(length=3, rng=rng)
+                self.assertEqual(len(word), 3)
+                self.assertEqual(mask, dictionary_hangman.word_mask(word))
+                seen.add(word)
+            self.assertEqual(seen, {'КОТ', 'КИТ', 'ДОМ', 'ЪЕЪ'})
+            for difficulty in dictionary_hangman.DIFFICULTIES:
+                dictionary.random_word(difficulty=difficulty, rng=rng)
+            with self.assertRaises(ValueError):
+                dictionary.random_word(length=20)
+
+    def test_rebuild_replaces_file_under_open_dictionary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'words.bin')
+            dictionary_hangman.build_dictionary(['КОТ', 'КИТ'], path)
+            old = dictionary_hangman.WordDictionary(path)
+            dictionary_hangman.build_dictionary(['ШКАФ', 'СЛОВАРЬ', 'ДОМ'], path)
+            # Открытый словарь дочитывает прежний файл, новый видит новые слова
+            self.assertEqual(old.count(length=3), 2)
+            self.assertIn(old.random_word(length=3)[0], ('КОТ', 'КИТ'))
+            self.assertEqual(len(dictionary_hangman.WordDictionary(path)), 3)
+            self.assertEqual(os.listdir(tmp), ['words.bin'])
+
+    def test_best_letter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'words.bin')
+            dictionary_hangman.build_dictionary(['КОТ', 'КИТ', 'КОМ', 'ДОМ', 'ЛЕС', 'ШКАФ'], path)
+            dictionary = dictionary_hangman.WordDictionary(path)
+
+            self.assertEqual(dictionary.candidates('___', 0)[1], 5)
+            self.assertEqual(dictionary.best_letter('___', 0), ('К', 0.6, 5))
+
+            # К открыта в начале, Т названа и отсутствует: КОМ
+            guessed = dictionary_hangman.word_mask('КТ')
+            self.assertEqual(dictionary.candidates('К__', guessed)[1], 1)
+            self.assertEqual(dictionary.best_letter('К__', guessed)[0], 'М')
+
+            # О открыта в середине: КОТ, КОМ, ДОМ
+            guessed = dictionary_hangman.word_mask('О')
+            self.assertEqual(dictionary.best_letter('_О_', guessed), ('К', 2 / 3, 3))
+            self.assertEqual(dictionary.best_letter('_О_', guessed, 'split')[0], 'Д')
+            self.assertEqual(dictionary.best_letter('____', dictionary_hangman.word_mask('Ф')), (None, 0.0, 0))
+
+    def test_default_dictionary_loads(self):
+        dictionary = dictionary_hangman.get_dictionary()
+        self.assertGreater(len(dictionary), 500)
+        self.assertEqual(dictionary.random_word(length=16)[0], 'ПРОГРАММИРОВАНИЕ')
+
+    def test_build_script_runs_known_commands(self):
+        # Каждая команда manage.py в build.sh - на своей строке и существует
+        with open(os.path.join(settings.BASE_DIR, 'build.sh'), encoding='utf-8') as build_script:
+            lines = [line.strip() for line in build_script if 'manage.py' in line]
+        self.assertIn('python manage.py build_hangman_dictionary', lines)
+        for line in lines:
+            self.assertEqual(line.count('manage.py'), 1, line)
+            self.assertIn(line.split()[2], get_commands(), line)
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class HangmanViewTests(TestCase):
+    """Тесты представлений Виселицы"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('hangman', password='secret-pass')
+        self.client.force_login(self.user)
+        state_store.hangman_games.clear()
+        state_store.games_2048.clear()
+
+    def _set_word(self, word, guessed=()):
+        session = self.client.session
+        session['hangman'] = {
+            'word': word,
+            'guessed': list(guessed),
+            'wrong_guesses': 0, 'game_over': False, 'won': False,
+        }
+        session.save()
+
+    def _guess(self, letter):
+        return self.client.post('/games/hangman/guess/', data=json.dumps({'letter': letter}),
+                                content_type='application/json')
+
+    def test_guess_and_win(self):
+        self._set_word('КОТ', guessed=['К'])
+        self.assertEqual(self._guess('я').json()['game_state']['wrong_guesses'], 1)
+        self.assertEqual(self._guess('К').json()['status'], 'already_used')
+        self._guess('О')
+        data = self._guess('Т').json()
+        self.assertTrue(data['game_state']['won'])
+        self.assertIn('К О Т', data['html'])
+
+    def test_hint(self):
+        self._set_word('ПРОГРАММИРОВАНИЕ', guessed=['А'])
+        data = self.client.get('/games/hangman/hint/').json()
+        self.assertEqual(data['candidates'], 1)
+        self.assertIn(data['letter'], 'ПРОГМИВНЕ')
+        self.assertEqual(self.client.get('/games/hangman/hint/', {'strategy': 'magic'}).status_code, 400)
+
+    def test_invalid_letter(self):
+        self._set_word('КОТ')
+        self.assertEqual(self._guess('Q').status_code, 400)
+
+    def test_new_game_with_difficulty(self):
+        data = self.client.post('/games/hangman/new/', data=json.dumps({'difficulty': 'easy', 'length': 5}),
+                                content_type='application/json').json()
+        self.assertEqual(len(data['game_state']['word']), 5)
+        self.assertEqual(data['game_state']['guessed_mask'], 0)
+        response = self.client.post('/games/hangman/new/', data=json.dumps({'difficulty': 'extreme'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class GameStateStoreTests(TestCase):
+    """Тесты хранилища текущих партий"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('store', password='secret-pass')
+        self.client.force_login(self.user)
+        state_store.hangman_games.clear()
+        state_store.games_2048.clear()
+
+    def _move(self, direction):
+        return self.client.post('/games/2048/move/', data=json.dumps({'direction': direction}),
+                                content_type='application/json')
+
+    def _row(self):
+        return Game2048.objects.get(user=self.user, status='active')
+
+    def _play(self, count):
+        """Сделать count ходов, меняющих поле"""
+        made = 0
+        while made < count:
+            for direction in engine_2048.DIRECTIONS:
+                if self._move(direction).json()['moved']:
+                    made += 1
+                    break
+            else:
+                self.fail('Нет доступных ходов')
+
+    def test_moves_are_written_every_n(self):
+        self.client.post('/games/2048/new/')
+        session_key = self.client.session.session_key
+        with mock.patch.object(state_store.games_2048, 'flush_every', 3):
+            self._play(2)
+            self.assertEqual(self._row().moves, 0)
+            self._play(1)
+        row = self._row()
+        self.assertEqual((row.moves, row.version), (3, 1))
+        self.assertEqual(row.state['board'], state_store.games_2048.get(self.user)['board'])
+        # Во время игры сессия не меняется
+        self.assertEqual(self.client.session.session_key, session_key)
+        self.assertNotIn('game_2048', self.client.session)
+
+    def test_idle_game_is_written(self):
+        self.client.post('/games/2048/new/')
+        self._play(2)
+        self.assertEqual(self._row().moves, 0)
+        with mock.patch.object(state_store.games_2048, 'idle_timeout', 0):
+            state_store.games_2048.get(self.user)
+        self.assertEqual(self._row().moves, 2)
+
+    def test_processes_share_the_game(self):
+        # Два процесса - два хранилища над одной таблицей
+        first = state_store.GameStateStore(Game2048, state_store._game_2048_fields, state_store._game_2048_state)
+        second = state_store.GameStateStore(Game2048, state_store._game_2048_fields, state_store._game_2048_state)
+        first.start(self.user, initialize_2048_game())
+        second.get(self.user)
+
+        state = first.get(self.user)
+        self.assertTrue(any(apply_2048_move(state, direction) for direction in engine_2048.DIRECTIONS))
+        self.assertTrue(first.update(self.user, state))
+        self.assertEqual(second.get(self.user)['moves'], 1)
+
+        # Ход по устаревшему состоянию не перезаписывает чужой
+        stale = first.get(self.user)
+        self.assertTrue(second.update(self.user, dict(second.get(self.user), score=100)))
+        with self.assertLogs('games.state_store', 'WARNING'):
+            self.assertFalse(first.update(self.user, dict(stale, score=50)))
+        self.assertEqual(first.get(self.user)['score'], 100)
+        self.assertEqual(first.stats()['conflicts'], 1)
+
+    def test_new_game_abandons_previous(self):
+        self.client.post('/games/2048/new/')
+        self.client.post('/games/2048/new/')
+        self.assertEqual(Game2048.objects.filter(user=self.user, status='abandoned').count(), 1)
+        self.assertEqual(Game2048.objects.filter(user=self.user, status='active').count(), 1)
+
+    def test_game_continues_after_logout(self):
+        self.client.post('/games/2048/new/')
+        self._play(3)
+        expected = state_store.games_2048.get(self.user)['board']
+        # Выход записывает партию, и ее можно продолжить без кэша
+        self.client.logout()
+        state_store.games_2048.clear()
+        self.assertEqual(state_store.games_2048.get(self.user)['board'], expected)
+
+    def test_game_saved_elsewhere_is_reloaded(self):
+        self.client.post('/games/2048/new/')
+        self._play(1)
+        # Партию сохранила другая машина
+        row = self._row()
+        state = dict(row.state, score=1000)
+        Game2048.objects.filter(pk=row.pk).update(state=state, score=1000, version=row.version + 1)
+        with self.assertLogs('games.state_store', 'WARNING'):
+            state_store.games_2048.flush_user(self.user.pk)
+        self.assertEqual(state_store.games_2048.get(self.user)['score'], 1000)
+
+    def test_conflicting_move_is_not_recorded(self):
+        self.client.post('/games/hangman/new/', data=json.dumps({'length': 3}), content_type='application/json')
+        word = state_store.hangman_games.get(self.user)['word']
+        letters = sorted(set(word))
+        for letter in letters[:-1]:
+            self.client.post('/games/hangman/guess/', data=json.dumps({'letter': letter}),
+                             content_type='application/json')
+
+        # Между чтением и записью партию изменил другой запрос
+        with mock.patch.object(state_store.hangman_games, '_read_seq', return_value=-1), \
+                self.assertLogs('games.state_store', 'WARNING'):
+            response = self.client.post('/games/hangman/guess/', data=json.dumps({'letter': letters[-1]}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['resync'])
+        self.assertFalse(state_store.hangman_games.get(self.user)['game_over'])
+        self.assertFalse(GameSession.objects.filter(user=self.user).exists())
+
+    def test_high_score_counts_only_ranked_games(self):
+        request = SimpleNamespace(user=self.user, session={'2048_high_score': 100})
+        for assisted, size in ((True, 4), (False, 5)):
+            game_state = initialize_2048_game(size)
+            state_store.games_2048.start(self.user, game_state)
+            game_state.update(score=5000, game_over=True, assisted=assisted)
+            self.assertEqual(get_2048_high_score(request, game_state), 100)
+            save_2048_state(request, game_state)
+            self.assertEqual(request.session['2048_high_score'], 100)
+        self.assertEqual(GameSession.objects.filter(user=self.user, game_type='2048').count(), 2)
+
+    def test_hangman_finished_game_is_written(self):
+        self.client.post('/games/hangman/new/', data=json.dumps({'length': 3}), content_type='application/json')
+        word = state_store.hangman_games.get(self.user)['word']
+        for letter in sorted(set(word)):
+            self.client.post('/games/hangman/guess/', data=json.dumps({'letter': letter}),
+                             content_type='application/json')
+        row = HangmanGame.objects.get(user=self.user)
+        self.assertEqual(row.status, 'won')
+        self.assertEqual(row.current_state, word)
+        self.assertIsNotNone(row.completed_at)
+
+
+class GameStatsTests(TestCase):
+    """Тесты сводок GameStats"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('stats', password='secret-pass')
+
+    def test_record_updates_rollup(self):
+        for result, score in (('win', 10), ('win', 30), ('lose', 5), ('win', 20)):
+            GameSession.record(self.user, 'hangman', result, score=score)
+        stats = GameStats.objects.get(user=self.user, game_type='hangman')
+        self.assertEqual((stats.games, stats.wins, stats.losses, stats.draws), (4, 3, 1, 0))
+        self.assertEqual((stats.total_score, stats.best_score), (65, 30))
+        self.assertEqual((stats.streak, stats.best_streak), (1, 2))
+
+        user_stats = GameSession.get_user_stats(self.user, 'hangman')
+        self.assertEqual(user_stats['total_games'], 4)
+        self.assertEqual(user_stats['win_rate'], 75)
+
+    def test_unverified_2048_is_not_a_record(self):
+        GameSession.record(self.user, '2048', 'lose', score=5000, game_data={'verified': False, 'assisted': False})
+        GameSession.record(self.user, '2048', 'lose', score=900, game_data={'verified': True, 'assisted': False})
+        self.assertEqual(GameStats.objects.get(user=self.user, game_type='2048').best_score, 900)
+        self.assertEqual(GameSession.best_2048_score(self.user), 900)
+
+    def test_rollup_is_built_from_existing_sessions(self):
+        for result in ('win', 'draw', 'lose'):
+            GameSession.objects.create(user=self.user, game_type='rps', result=result, score=int(result == 'win'))
+        # Без сводки - один запрос к сводкам и один агрегирующий
+        with self.assertNumQueries(2):
+            self.assertEqual(GameSession.get_user_stats(self.user)['draws'], 1)
+
+        GameSession.record(self.user, 'rps', 'win', score=1)
+        stats = GameStats.objects.get(user=self.user, game_type='rps')
+        self.assertEqual((stats.games, stats.wins, stats.total_score, stats.streak), (4, 2, 2, 1))
+
+    def test_games_index_reads_rollups(self):
+        GameSession.record(self.user, 'hangman', 'win', score=5)
+        GameSession.record(self.user, 'rps', 'lose')
+        self.client.force_login(self.user)
+        stats = self.client.get('/games/').context['user_games_stats']
+        self.assertEqual(stats['hangman_wins'], 1)
+        self.assertEqual(stats['total_games'], 2)
+
+
+class GameRecorderTests(TestCase):
+    """Тесты пакетной записи игр"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('recorder', password='secret-pass')
+        self.recorder = GameRecorder()
+
+    @override_settings(GAME_RECORDER_BATCH_SIZE=3, GAME_RECORDER_FLUSH_MS=60000)
+    def test_flush_every_n_records(self):
+        self.recorder.record(self.user, 'rps', 'win', score=1)
+        self.recorder.record(self.user, 'rps', 'lose')
+        self.assertEqual(self.recorder.stats()['queued'], 2)
+        self.assertFalse(GameSession.objects.exists())
+
+        # Третья игра - полный пакет: один INSERT на все игры
+        with CaptureQueriesContext(connection) as queries:
+            self.recorder.record(self.user, 'rps', 'win', score=1)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "games_gamesession"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(GameSession.objects.count(), 3)
+        stats = self.recorder.stats()
+        self.assertEqual((stats['queued'], stats['recorded'], stats['flushes']), (0, 3, 1))
+        self.assertGreater(stats['max_flush_ms'], 0)
+
+    @override_settings(GAME_RECORDER_FLUSH_MS=60000)
+    def test_batch_matches_single_records(self):
+        results = ['win', 'win', 'lose', 'win', 'win', 'win', 'draw', 'win']
+        other = User.objects.create_user('single', password='secret-pass')
+        for result in results:
+            self.recorder.record(self.user, 'hangman', result, score=len(result))
+            GameSession.record(other, 'hangman', result, score=len(result))
+        self.assertEqual(self.recorder.flush(), len(results))
+
+        fields = ('games', 'wins', 'losses', 'draws', 'total_score', 'best_score', 'streak', 'best_streak')
+        batched = GameStats.objects.filter(user=self.user).values(*fields).get()
+        single = GameStats.objects.filter(user=other).values(*fields).get()
+        self.assertEqual(batched, single)
+        self.assertEqual((batched['streak'], batched['best_streak']), (1, 3))
+
+        # Пакет продолжает серию, начатую раньше
+        self.recorder.record(self.user, 'hangman', 'win')
+        self.recorder.record(self.user, 'hangman', 'win')
+        self.recorder.flush()
+        stats = GameStats.objects.get(user=self.user)
+        self.assertEqual((stats.streak, stats.best_streak), (3, 3))
+
+
+    @override_settings(GAME_RECORDER_FLUSH_MS=60000)
+    def test_failed_batch_is_retried_then_dropped(self):
+        self.recorder.record(self.user, 'rps', 'win', score=1)
+        self.recorder.record(self.user, 'rps', 'lose')
+        with mock.patch.object(GameStats, 'add', side_effect=RuntimeError('db is locked')), \
+                self.assertLogs('games.recorder', 'ERROR'):
+            self.assertEqual(self.recorder.flush(), 0)
+        # Первичные ключи из откатившегося bulk_create заняты другой записью
+        GameSession.record(self.user, 'rps', 'draw')
+        GameSession.record(self.user, 'rps', 'draw')
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 4)
+
+        self.recorder.record(self.user, 'rps', 'win')
+        with mock.patch.object(GameStats, 'add', side_effect=RuntimeError('db is locked')), \
+                self.assertLogs('games.recorder', 'ERROR') as logs:
+            for _ in range(recorder_module.MAX_ATTEMPTS):
+                self.recorder.flush()
+        stats = self.recorder.stats()
+        self.assertEqual((stats['queued'], stats['dropped'], stats['failures']), (0, 1, 4))
+        self.assertTrue(any('не записана' in line for line in logs.output))
+
+    @override_settings(GAME_RECORDER_FLUSH_MS=60000, GAME_RECORDER_BATCH_SIZE=100)
+    def test_queue_is_bounded(self):
+        with mock.patch.object(recorder_module, 'MAX_QUEUE', 3), self.assertLogs('games.recorder', 'ERROR'):
+            for score in range(5):
+                self.recorder.record(self.user, 'rps', 'win', score=score)
+        self.assertEqual(self.recorder.stats()['queued'], 3)
+        self.assertEqual(self.recorder.stats()['dropped'], 2)
+        self.recorder.flush()
+        self.assertEqual(sorted(GameSession.objects.values_list('score', flat=True)), [2, 3, 4])
+
+
+class LeaderboardTests(TestCase):
+    """Тесты таблиц лидеров"""
+
+    def setUp(self):
+        leaderboard.leaderboards.reset()
+        self.users = [User.objects.create_user(f'leader{k}', password='secret-pass') for k in range(4)]
+
+    def test_ranked_list_matches_sorted(self):
+        rng = random.Random(1)
+        ranked = leaderboard.RankedList()
+        ranked.LOAD = 4
+        items = []
+        for _ in range(500):
+            if items and rng.random() < 0.3:
+                item = items.pop(rng.randrange(len(items)))
+                ranked.remove(item)
+            else:
+                item = (rng.randint(0, 50), rng.random())
+                items.append(item)
+                ranked.add(item)
+            items.sort()
+            probe = (rng.randint(0, 50),)
+            self.assertEqual(ranked.index(probe), sum(1 for x in items if x < probe))
+        self.assertEqual(len(ranked), len(items))
+        self.assertEqual(ranked.head(10), items[:10])
+
+    def test_standings_with_ties(self):
+        for user, score in zip(self.users, (500, 900, 500, 100)):
+            GameSession.record(user, '2048', 'lose', score=score, game_data={'verified': True, 'assisted': False})
+        data = leaderboard.leaderboards.standings('2048', self.users[2].pk)
+        self.assertEqual([(row['rank'], row['value']) for row in data['top']], [(1, 900), (2, 500), (2, 500), (4, 100)])
+        self.assertEqual(data['me'], {'rank': 2, 'value': 500})
+        self.assertEqual(data['total'], 4)
+
+    def test_changes_from_other_workers_are_synced(self):
+        GameSession.record(self.users[0], 'hangman', 'win')
+        service = leaderboard.leaderboards
+        self.assertEqual(service.standings('hangman_streak', self.users[1].pk)['me'], None)
+        # Сводку изменил другой процесс
+        GameStats.objects.create(user=self.users[1], game_type='hangman', games=3, wins=3, best_streak=3)
+        service._checked -= leaderboard.REFRESH_INTERVAL
+        self.assertEqual(service.standings('hangman_streak', self.users[1].pk)['me'], {'rank': 1, 'value': 3})
+
+    def test_view(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get('/games/leaderboard/rps_win_rate/').json()['me'], None)
+        self.assertEqual(self.client.get('/games/leaderboard/chess/').status_code, 404)
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class QuizTests(TestCase):
+    """Тесты викторины на пулах вопросов"""
+
+    def setUp(self):
+        quiz_pool.pools.invalidate()
+        self.user = User.objects.create_user('quizzer', password='secret-pass')
+        self.client.force_login(self.user)
+        self.questions = [
+            QuizQuestion.objects.create(
+                category='science', difficulty='easy', question=f'Вопрос {k}?',
+                options=['a', 'b', 'c', 'd'], correct_answer=k % 4,
+            )
+            for k in range(12)
+        ]
+
+    def _post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def test_pool_order_is_deterministic(self):
+        pool = list(quiz_pool.pools.pool('science', 'easy'))
+        self.assertEqual(sorted(pool), sorted(q.pk for q in self.questions))
+        self.assertEqual(list(quiz_pool.QuestionPools().pool('science', 'easy')), pool)
+        # Новый вопрос не меняет взаимный порядок остальных
+        QuizQuestion.objects.create(category='science', difficulty='easy', question='?', options=['a'], correct_answer=0)
+        self.assertEqual([pk for pk in quiz_pool.pools.pool('science', 'easy') if pk in pool], pool)
+
+    def test_next_question_is_one_query(self):
+        quiz_pool.pools.pools()
+        session = QuizSession(user=self.user, category='science', difficulty='easy', total_questions=5, offset=3)
+        seen = []
+        for _ in range(5):
+            with self.assertNumQueries(1):
+                next_quiz_question(session)
+            seen.append(session.current_question.pk)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(session.step, 5)
+
+    def test_full_quiz_is_recorded(self):
+        response = self._post('/games/quiz/start/', {'category': 'science', 'difficulty': 'easy', 'questions': 3})
+        self.assertEqual(response.status_code, 200)
+        for _ in range(3):
+            question = QuizSession.objects.get(user=self.user, is_active=True).current_question
+            data = self._post('/games/quiz/answer/', {'answer': question.correct_answer}).json()
+            self.assertTrue(data['result']['correct'])
+        self.assertFalse(data['quiz_state']['active'])
+        session = QuizSession.objects.get(user=self.user)
+        self.assertEqual((session.correct_answers, session.score), (3, 3))
+        self.assertEqual(quiz_pool.completed_count(session.completed_questions), 3)
+        self.assertEqual(GameSession.objects.get(user=self.user, game_type='quiz').result, 'win')
+
+    def test_skip_is_not_marked_completed(self):
+        self._post('/games/quiz/start/', {'category': 'science', 'difficulty': 'easy'})
+        data = self._post('/games/quiz/answer/', {'answer': None}).json()
+        self.assertTrue(data['result']['skipped'])
+        self.assertEqual(data['quiz_state']['answered'], 0)
+        self.assertEqual(data['quiz_state']['step'], 2)
+
+    def test_errors(self):
+        self.assertEqual(self._post('/games/quiz/start/', {'category': 'history', 'difficulty': 'easy'}).status_code, 400)
+        self.assertEqual(self._post('/games/quiz/answer/', {'answer': 0}).status_code, 400)
+        self._post('/games/quiz/start/', {'category': 'science', 'difficulty': 'easy'})
+        self.assertEqual(self._post('/games/quiz/answer/', {'answer': 7}).status_code, 400)
+        self.assertEqual(self.client.get('/games/quiz/').status_code, 200)
+
+
+class QuizImportTests(TestCase):
+    """Тесты импорта банков вопросов"""
+
+    def _write(self, suffix, text):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_jsonl_batches_and_dedup(self):
+        QuizQuestion.objects.create(category='science', difficulty='easy', question='Столица?',
+                                    options=['a', 'b'], correct_answer=0)
+        lines = [
+            {'category': 'science', 'difficulty': 'easy', 'question': f'Вопрос {k}?', 'options': ['да', 'нет'],
+             'correct_answer': k % 2}
+            for k in range(7)
+        ]
+        # Тот же вопрос другим регистром, пробелами и порядком вариантов
+        lines.append({'category': 'science', 'difficulty': 'easy', 'question': '  ВОПРОС   3? ',
+                      'options': ['Нет', 'да'], 'correct_answer': 1})
+        lines.append({'category': 'science', 'difficulty': 'easy', 'question': 'столица?',
+                      'options': ['B', 'A'], 'correct_answer': 0})
+        path = self._write('.jsonl', '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines))
+        with CaptureQueriesContext(connection) as queries:
+            stats = quiz_import.import_file(path, batch_size=3)
+        self.assertEqual((stats.read, stats.created, stats.duplicates, stats.invalid), (9, 7, 2, 0))
+        self.assertEqual(stats.batches, 3)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "games_quizquestion"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(QuizQuestion.objects.count(), 8)
+        self.assertTrue(all(QuizQuestion.objects.values_list('content_hash', flat=True)))
+
+    def test_csv_validation(self):
+        path = self._write('.csv', (
+            'category,difficulty,question,options,correct_answer,explanation\n'
+            'history,hard,Год?,1812|1905|1917,0,Война\n'
+            'history,hard,Вне диапазона?,"[""a"", ""b""]",2,\n'
+            'history,hard,Один вариант?,a,0,\n'
+            'sport,hard,Категория?,a|b,0,\n'
+            'history,hard,Повтор вариантов?,a|A,0,\n'
+        ))
+        stats = quiz_import.import_file(path)
+        self.assertEqual((stats.created, stats.invalid), (1, 4))
+        self.assertEqual([line for line, _ in stats.errors], [3, 4, 5, 6])
+        question = QuizQuestion.objects.get()
+        self.assertEqual((question.options, question.correct_answer, question.explanation),
+                         (['1812', '1905', '1917'], 0, 'Война'))
+
+    def test_dry_run_writes_nothing(self):
+        path = self._write('.jsonl', json.dumps(
+            {'category': 'general', 'difficulty': 'medium', 'question': '?', 'options': ['a', 'b'], 'correct_answer': 1}
+        ))
+        self.assertEqual(quiz_import.import_file(path, dry_run=True).created, 1)
+        self.assertFalse(QuizQuestion.objects.exists())
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class RPSTests(TestCase):
+    """Тесты Камень-Ножницы-Бумага и предсказывающего соперника"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('thrower', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def _play(self, data):
+        return self.client.post('/games/rock-paper-scissors/play/', json.dumps(data), content_type='application/json')
+
+    def test_result(self):
+        rock, paper, scissors = range(3)
+        self.assertEqual(rps_markov.result(paper, rock), 'win')
+        self.assertEqual(rps_markov.result(rock, paper), 'lose')
+        self.assertEqual(rps_markov.result(scissors, scissors), 'draw')
+
+    def test_predictor_learns_cycle(self):
+        predictor = rps_markov.MarkovPredictor()
+        results = []
+        for k in range(300):
+            throw = k % 3
+            results.append(rps_markov.result(throw, predictor.choose(random.Random(k))))
+            predictor.update(throw)
+        # Проигрыши, кроме случайных раундов
+        self.assertGreater(results[-200:].count('lose'), 170)
+        self.assertEqual(len(predictor.to_bytes()), rps_markov.SIZE)
+        self.assertLessEqual(max(predictor.counts), 255)
+
+    def test_choice_is_not_deterministic(self):
+        predictor = rps_markov.MarkovPredictor()
+        for throw in (0, 1) * 10:
+            predictor.update(throw)
+        # Из одного состояния модели компьютер отвечает по-разному
+        choices = {predictor.choose(random.Random(seed)) for seed in range(50)}
+        self.assertGreater(len(choices), 1)
+
+    def test_predictor_roundtrip(self):
+        predictor = rps_markov.MarkovPredictor()
+        for throw in (0, 0, 1, 2, 0):
+            predictor.update(throw)
+        copy = rps_markov.MarkovPredictor(predictor.to_bytes(), predictor.history, predictor.rounds)
+        self.assertEqual(copy.counts, predictor.counts)
+        self.assertEqual(copy.predict(), predictor.predict())
+
+    def test_batch_rounds_view(self):
+        data = self._play({'choices': ['rock'] * 30, 'mode': 'predictive'}).json()
+        self.assertEqual(len(data['rounds']), 30)
+        self.assertEqual(data['stats']['round'], 30)
+        # Соперник быстро понял, что игрок всегда выбирает камень
+        computer = [game['computer_choice'] for game in data['rounds'][3:]]
+        self.assertGreater(computer.count('paper'), 18)
+        opponent = RPSOpponent.objects.get(user=self.user)
+        self.assertEqual(opponent.rounds, 30)
+        self.assertEqual(GameStats.objects.get(user=self.user, game_type='rps').games, 30)
+        # Модель сохраняется между запросами
+        predictor = rps_markov.MarkovPredictor(bytes(opponent.counts), opponent.history, opponent.rounds)
+        self.assertEqual(predictor.predict(), rps_markov.CHOICES.index('rock'))
+        data = self._play({'choice': 'rock', 'mode': 'predictive'}).json()
+        self.assertEqual(data['stats']['round'], 31)
+
+    def test_concurrent_rounds_are_merged(self):
+        opponent = RPSOpponent.objects.create(user=self.user)
+        record = recorder_module.recorder.record
+
+        def record_and_race(*args, **kwargs):
+            # Пока идут раунды, другой запрос сохранил 10 своих
+            RPSOpponent.objects.filter(pk=opponent.pk, rounds=0).update(rounds=10)
+            return record(*args, **kwargs)
+
+        with mock.patch.object(recorder_module.recorder, 'record', side_effect=record_and_race):
+            play_rps_rounds(self.user, [0] * 5, 'predictive')
+        opponent.refresh_from_db()
+        self.assertEqual(opponent.rounds, 15)
+
+    def test_errors(self):
+        self.assertEqual(self._play({'choice': 'lizard'}).status_code, 400)
+        self.assertEqual(self._play({'choice': 'rock', 'mode': 'psychic'}).status_code, 400)
+        self.assertEqual(self._play({'choices': ['rock'] * 101}).status_code, 400)
+        self.assertEqual(self._play({'choices': []}).status_code, 400)
+        self.assertEqual(self.client.get('/games/rock-paper-scissors/play/').status_code, 405)
+
+
+@override_settings(GAME_RECORDER_FLUSH_MS=0)
+class MemoryGameTests(TestCase):
+    """Тесты игры на память"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('memo', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def _flip(self, position):
+        return self.client.post('/games/memory/flip/', json.dumps({'position': position}),
+                                content_type='application/json')
+
+    def test_layout_is_pairs_permutation(self):
+        for pairs in memory_board.PAIR_CHOICES:
+            for seed in range(20):
+                state = dict(memory_board.new_game(pairs), seed=seed * 0x9E3779B97F4A7C15)
+                layout = memory_board.layout(state)
+                self.assertEqual(sorted(layout), sorted(list(range(pairs)) * 2))
+
+    def test_full_game_is_recorded(self):
+        self.client.post('/games/memory/new/', json.dumps({'pairs': 6}), content_type='application/json')
+        state = self.client.session['memory_game']
+        positions = {}
+        for position, pair in enumerate(memory_board.layout(state)):
+            positions.setdefault(pair, []).append(position)
+        # Один промах, затем все пары
+        first, second = positions[0][0], positions[1][0]
+        self.assertEqual(self._flip(first).json()['result'], 'first')
+        data = self._flip(second).json()
+        self.assertEqual((data['result'], data['other']), ('miss', first))
+        for a, b in positions.values():
+            self._flip(a)
+            data = self._flip(b).json()
+            self.assertEqual(data['result'], 'match')
+        self.assertTrue(data['memory_state']['finished'])
+        session = GameSession.objects.get(user=self.user, game_type='memory')
+        self.assertEqual((session.score, session.result), (6 * 10 - 2, 'win'))
+        self.assertEqual(session.game_data, {'pairs': 6, 'moves': 7, 'mistakes': 1})
+
+    def test_invalid_flips(self):
+        self.client.get('/games/memory/')
+        state = self.client.session['memory_game']
+        layout = memory_board.layout(state)
+        a, b = [position for position, pair in enumerate(layout) if pair == 0]
+        self.assertEqual(self._flip(99).status_code, 400)
+        self.assertEqual(self._flip('x').status_code, 400)
+        self._flip(a)
+        self.assertEqual(self._flip(a).status_code, 400)
+        self._flip(b)
+        self.assertEqual(self._flip(b).status_code, 400)
+
+    def test_state_is_compact_in_session(self):
+        state = dict(memory_board.new_game(12), first=-1, matched=0b101)
+        serializer = session_serializer.CompactSerializer()
+        data = serializer.dumps({'memory_game': state})
+        self.assertEqual(serializer.loads(data), {'memory_game': state})
+        self.assertLess(len(data), 24)
+
+
+class SessionBackendTests(TestCase):
+    """Тесты бэкенда сессий с записью при изменении"""
+
+    def setUp(self):
+        self.store = SessionStore()
+        self.store['rps_stats'] = {'wins': 1}
+        self.store.save(must_create=True)
+
+    def test_unchanged_session_is_not_written(self):
+        session = SessionStore(self.store.session_key)
+        session['rps_stats'] = {'wins': 1}
+        session.modified = True
+        with self.assertNumQueries(0):
+            session.save()
+
+    def test_changed_session_is_written(self):
+        session = SessionStore(self.store.session_key)
+        session['rps_stats'] = {'wins': 2}
+        session.save()
+        # Значение читается из базы, а не из кэша
+        caches['sessions'].clear()
+        self.assertEqual(SessionStore(self.store.session_key)['rps_stats'], {'wins': 2})
+
+
+class SessionSerializerTests(TestCase):
+    """Тесты компактного сериализатора сессий"""
+
+    def setUp(self):
+        self.serializer = session_serializer.CompactSerializer()
+
+    def test_round_trip(self):
+        session = {
+            '_auth_user_id': '42',
+            '_auth_user_backend': 'django.contrib.auth.backends.ModelBackend',
+            '_auth_user_hash': 'ab' * 32,
+            '2048_high_score': 20480,
+            'rps_stats': {'wins': 3, 'losses': 1, 'draws': 0, 'round': 4},
+            'rps_last_game': {'user_choice': 'rock', 'computer_choice': 'paper', 'result': 'lose'},
+            'game_2048': {
+                'grid': [[2, 0, 0, 4], [0, 8, 0, 0], [0, 0, 32768, 0], [0, 0, 0, 0]],
+                'score': 12, 'game_over': False, 'won': True, 'moves': 300,
+            },
+            'hangman': {'word': 'ЁЛКА', 'guessed': ['Л', 'Ё', 'Я'], 'wrong_guesses': 1,
+                        'game_over': False, 'won': False},
+            'theme': 'тёмная',
+        }
+        data = self.serializer.dumps(session)
+        decoded = self.serializer.loads(data)
+        # Порядок названных букв не сохраняется
+        self.assertEqual(decoded.pop('hangman')['guessed'], ['Ё', 'Л', 'Я'])
+        expected = dict(session)
+        expected.pop('hangman')
+        self.assertEqual(decoded, expected)
+        self.assertLess(len(data), len(json.dumps(session, separators=(',', ':'))) // 2)
+
+    def test_unknown_shapes_fall_back_to_json(self):
+        session = {
+            '_auth_user_id': 'admin',
+            '2048_high_score': -1,
+            'rps_stats': {'wins': 1},
+            'game_2048': {'grid': [[3, 0, 0, 0]] * 4, 'score': 0, 'game_over': False, 'won': False, 'moves': 0},
+        }
+        data = self.serializer.dumps(session)
+        self.assertEqual(data[1], session_serializer.TAG_JSON)
+        self.assertEqual(self.serializer.loads(data), session)
+
+    def test_reads_json_sessions(self):
+        self.assertEqual(self.serializer.loads(b'{"rps_wins":2}'), {'rps_wins': 2})
+        self.assertEqual(self.serializer.loads(self.serializer.dumps([1, 2])), [1, 2])
+
+
+class FragmentRendererTests(TestCase):
+    """Тесты кэшированной отрисовки фрагментов"""
+
+    def test_2048_fragment_matches_template(self):
+        rng = random.Random(3)
+        renderer = fragments.FragmentRenderer('games/2048_game.html')
+        for n in range(60):
+            size = rng.choice(engine_nxn.SUPPORTED_SIZES)
+            game_state = initialize_2048_game(size, rng.choice([256, 2048]))
+            game_state['board'] = rng.getrandbits(4 * size * size) & int('3' * size * size, 16)
+            game_state['won'] = n % 3 == 0
+            game_state['game_over'] = n % 4 == 0
+            context = prepare_2048_context(game_state, SimpleNamespace(session={}))
+            self.assertEqual(renderer.render(context), render_to_string('games/2048_game.html', context))
+        self.assertGreater(renderer.stats()['hit_rate'], 0.5)
+
+    def test_hangman_fragment_matches_template(self):
+        rng = random.Random(4)
+        renderer = fragments.FragmentRenderer('games/hangman_game.html')
+        for n in range(40):
+            game_state = initialize_hangman_game()
+            game_state['guessed_mask'] = rng.getrandbits(33) & rng.getrandbits(33)
+            game_state['wrong_guesses'] = n % 8
+            game_state['game_over'] = n % 5 == 0
+            game_state['won'] = n % 2 == 0
+            context = prepare_hangman_context(game_state)
+            self.assertEqual(renderer.render(context), render_to_string('games/hangman_game.html', context))
+
+    def test_hangman_letters_hit_cache_across_guesses(self):
+        # Кнопка буквы зависит от "letter in guessed_letters", а не от всего списка
+        rng = random.Random(5)
+        renderer = fragments.FragmentRenderer('games/hangman_game.html')
+        for _ in range(10):
+            game_state = initialize_hangman_game()
+            letters = list('АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ')
+            rng.shuffle(letters)
+            for letter in letters[:10]:
+                game_state['guessed_mask'] |= dictionary_hangman.letter_mask(letter)
+                context = prepare_hangman_context(game_state)
+                self.assertEqual(renderer.render(context), render_to_string('games/hangman_game.html', context))
+        self.assertGreater(renderer.stats()['hit_rate'], 0.9)
+
+    def test_cache_is_bounded(self):
+        renderer = fragments.FragmentRenderer('games/2048_game.html', max_size=8)
+        for value in range(1, 15):
+            renderer.render({'grid': [[1 << value] * 4] * 4})
+        self.assertEqual(renderer.stats()['size'], 8)
+
+    def test_stats_endpoint_is_staff_only(self):
+        user = User.objects.create_user('viewer', password='secret-pass')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/games/fragments/stats/').status_code, 403)
+        user.is_staff = True
+        user.save()
+        data = self.client.get('/games/fragments/stats/').json()
+        self.assertEqual({item['template'] for item in data['fragments']},
+                         {'games/hangman_game.html', 'games/2048_game.html', 'games/quiz_game.html',
+                          'games/memory_game.html'})
@@ -0,0 +1,55 @@
+"""
+История отмены ходов 2048 - кольцевой буфер фиксированного размера.
+
+Каждая запись - упакованное поле (8 байт для 4x4, по полбайта на клетку
+для других размеров) и счет (4 байта). Буфер хранится в состоянии игры
+строкой base64 вместе с индексом следующей записи и количеством доступных
+отмен, поэтому 32 шага истории 4x4 занимают около 500 символов сессии
+независимо от длины партии.
+"""
+import base64
+
+UNDO_CAPACITY = 32
+
+_SCORE_BYTES = 4
+
+
+def empty_history(size=4):
+    """Пустая история отмены для поля size x size"""
+    return {'buf': '', 'head': 0, 'count': 0, 'width': (size * size + 1) // 2}
+
+
+def _entry_size(history):
+    return history.get('width', 8) + _SCORE_BYTES
+
+
+def _load(history):
+    if history['buf']:
+        return bytearray(base64.b64decode(history['buf'].encode('ascii')))
+    return bytearray(_entry_size(history) * UNDO_CAPACITY)
+
+
+def push(history, board, score):
+    """Запомнить поле и счет перед ходом (старые записи вытесняются)"""
+    buf = _load(history)
+    width = history.get('width', 8)
+    offset = history['head'] * _entry_size(history)
+    buf[offset:offset + width] = board.to_bytes(width, 'little')
+    buf[offset + width:offset + width + _SCORE_BYTES] = score.to_bytes(_SCORE_BYTES, 'little')
+    history['buf'] = base64.b64encode(bytes(buf)).decode('ascii')
+    history['head'] = (history['head'] + 1) % UNDO_CAPACITY
+    history['count'] = min(history['count'] + 1, UNDO_CAPACITY)
+
+
+def pop(history):
+    """Достать последнюю запись: (поле, счет) или None, если история пуста"""
+    if not history['count']:
+        return None
+    buf = _load(history)
+    history['head'] = (history['head'] - 1) % UNDO_CAPACITY
+    history['count'] -= 1
+    width = history.get('width', 8)
+    offset = history['head'] * _entry_size(history)
+    board = int.from_bytes(buf[offset:offset + width], 'little')
+    score = int.from_bytes(buf[offset + width:offset + width + _SCORE_BYTES], 'little')
+    return board, score
@@ -9,16 +9,40 @@ urlpatterns = [
     
     # Камень-Ножницы-Бумага
     path('rock-paper-scissors/', views.rock_paper_scissors, name='rock_paper_scissors'),
+    path('rock-paper-scissors/play/', views.rps_play, name='rps_play'),
     
     # Виселица
     path('hangman/', views.hangman, name='hangman'),
     path('hangman/guess/', views.hangman_guess, name='hangman_guess'),
     path('hangman/new/', views.hangman_new, name='hangman_new'),
+    path('hangman/hint/', views.hangman_hint, name='hangman_hint'),
     
     # 2048
     path('2048/', views.game_2048, name='game_2048'),
     path('2048/move/', views.game_2048_move, name='game_2048_move'),
     path('2048/new/', views.game_2048_new, name='game_2048_new'),
+    path('2048/hint/', views.game_2048_hint, name='game_2048_hint'),
+    path('2048/autoplay/', views.game_2048_autoplay, name='game_2048_autoplay'),
+    path('2048/undo/', views.game_2048_undo, name='game_2048_undo'),
+    
+    # Викторина
+    path('quiz/', views.quiz, name='quiz'),
+    path('quiz/start/', views.quiz_start, name='quiz_start'),
+    path('quiz/answer/', views.quiz_answer, name='quiz_answer'),
+
+    # Игра на память
+    path('memory/', views.memory, name='memory'),
+    path('memory/new/', views.memory_new, name='memory_new'),
+    path('memory/flip/', views.memory_flip, name='memory_flip'),
+
+    # Таблицы лидеров
+    path('leaderboard/<str:board>/', views.leaderboard_standings, name='leaderboard'),
+    
+    # Статистика кэша фрагментов
+    path('fragments/stats/', views.fragment_stats, name='fragment_stats'),
+    
+    # Статистика пакетной записи игр
+    path('recorder/stats/', views.recorder_stats, name='recorder_stats'),
     
     # Старые маршруты для совместимости (если были)
     path('play-rps/', views.rock_paper_scissors, name='play_rps'),
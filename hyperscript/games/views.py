@@ -1,41 +1,36 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponse
-from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
 import random
 import json
+import secrets
+import time
+
+from . import (
+    dictionary_hangman, engine_2048, engine_nxn, expectimax_2048, fragments, leaderboard, memory_board, quiz_pool,
+    replay_2048, rps_markov, state_store, undo_2048,
+)
+from .models import GameSession, GameStats, QuizQuestion, QuizSession, RPSOpponent
+from .recorder import recorder
 
 # ==================== ВИСЕЛИЦА (Hangman) ====================
 
+# Число ошибок, после которого игра проиграна
+HANGMAN_MAX_WRONG = 7
+
 @login_required
 def hangman(request):
     """Главная страница игры Виселица"""
-    # Слова для игры
-    words = [
-        'ПРОГРАММИРОВАНИЕ', 'КОМПЬЮТЕР', 'АЛГОРИТМ', 'БАЗАДАННЫХ',
-        'ИНТЕРНЕТ', 'ПРИЛОЖЕНИЕ', 'ФРЕЙМВОРК', 'ШАБЛОН', 'ПЕРЕМЕННАЯ',
-        'ФУНКЦИЯ', 'ОБЪЕКТ', 'КЛАСС', 'МЕТОД', 'АТРИБУТ', 'СЕРВЕР'
-    ]
-    
-    # Инициализация игры в сессии
-    if 'hangman' not in request.session:
-        request.session['hangman'] = {
-            'word': random.choice(words),
-            'guessed': [],
-            'wrong_guesses': 0,
-            'game_over': False,
-            'won': False
-        }
-    
-    game_state = request.session['hangman']
+    game_state = load_hangman_state(request)
     
     # Подготовка контекста
     context = prepare_hangman_context(game_state)
     
     # Если это AJAX запрос, возвращаем JSON
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        html = render_to_string('games/hangman_game.html', context)
+        html = fragments.HANGMAN_GAME.render(context)
         return JsonResponse({
             'html': html,
             'game_state': game_state
@@ -55,13 +50,14 @@ def hangman_guess(request):
             else:
                 letter = request.POST.get('letter', '').upper().strip()
             
-            # Проверяем, что буква валидная
-            if not letter or len(letter) != 1 or not letter.isalpha():
+            # Проверяем, что буква из русского алфавита
+            bit = dictionary_hangman.letter_mask(letter)
+            if not bit:
                 return JsonResponse({'error': 'Некорректная буква'}, status=400)
             
             # Получаем текущее состояние игры
-            game_state = request.session.get('hangman', {})
-            if not game_state:
+            game_state = find_hangman_state(request)
+            if game_state is None:
                 return JsonResponse({'error': 'Игра не инициализирована'}, status=400)
             
             # Если игра уже окончена
@@ -69,9 +65,9 @@ def hangman_guess(request):
                 return JsonResponse({'error': 'Игра уже окончена'}, status=400)
             
             # Проверяем, не угадывали ли уже эту букву
-            if letter in game_state['guessed']:
+            if game_state['guessed_mask'] & bit:
                 context = prepare_hangman_context(game_state)
-                html = render_to_string('games/hangman_game.html', context)
+                html = fragments.HANGMAN_GAME.render(context)
                 return JsonResponse({
                     'html': html,
                     'message': f'Буква "{letter}" уже была использована',
@@ -79,34 +75,38 @@ def hangman_guess(request):
                 })
             
             # Добавляем букву в угаданные
-            game_state['guessed'].append(letter)
+            game_state['guessed_mask'] |= bit
             
             # Проверяем, есть ли буква в слове
-            if letter not in game_state['word']:
+            hit = game_state['word_mask'] & bit
+            if not hit:
                 game_state['wrong_guesses'] += 1
             
             # Проверка условий окончания игры
-            message = f'Буква "{letter}" угадана!' if letter in game_state['word'] else f'Буквы "{letter}" нет в слове!'
+            message = f'Буква "{letter}" угадана!' if hit else f'Буквы "{letter}" нет в слове!'
             
-            # Проверяем, выиграл ли игрок
-            if all(l in game_state['guessed'] for l in game_state['word']):
+            # Проверяем, выиграл ли игрок (все буквы слова названы)
+            if not game_state['word_mask'] & ~game_state['guessed_mask']:
                 game_state['game_over'] = True
                 game_state['won'] = True
                 message = '🎉 Поздравляем! Вы выиграли!'
             
-            # Проверяем, проиграл ли игрок (7 ошибок)
-            elif game_state['wrong_guesses'] >= 7:
+            # Проверяем, проиграл ли игрок
+            elif game_state['wrong_guesses'] >= HANGMAN_MAX_WRONG:
                 game_state['game_over'] = True
                 game_state['won'] = False
                 message = '💀 Игра окончена! Вы проиграли!'
             
-            # Сохраняем обновленное состояние
-            request.session['hangman'] = game_state
-            request.session.modified = True
+            # Сохраняем обновленное состояние; партию, измененную другим запросом, не записываем
+            if not state_store.hangman_games.update(request.user, game_state):
+                return state_conflict_response()
+            
+            if game_state['game_over']:
+                record_hangman_game(request.user, game_state)
             
             # Готовим контекст для ответа
             context = prepare_hangman_context(game_state)
-            html = render_to_string('games/hangman_game.html', context)
+            html = fragments.HANGMAN_GAME.render(context)
             
             return JsonResponse({
                 'html': html,
@@ -126,26 +126,26 @@ def hangman_guess(request):
 def hangman_new(request):
     """AJAX: Начать новую игру в Виселицу"""
     if request.method == 'POST':
-        words = [
-            'ПРОГРАММИРОВАНИЕ', 'КОМПЬЮТЕР', 'АЛГОРИТМ', 'БАЗАДАННЫХ',
-            'ИНТЕРНЕТ', 'ПРИЛОЖЕНИЕ', 'ФРЕЙМВОРК', 'ШАБЛОН', 'ПЕРЕМЕННАЯ'
-        ]
-        
-        # Создаем новую игру
-        game_state = {
-            'word': random.choice(words),
-            'guessed': [],
-            'wrong_guesses': 0,
-            'game_over': False,
-            'won': False
-        }
+        try:
+            if request.content_type == 'application/json' and request.body:
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+            length = int(data['length']) if data.get('length') else None
+            difficulty = data.get('difficulty') or None
+            if difficulty is not None and difficulty not in dictionary_hangman.DIFFICULTIES:
+                raise ValueError(difficulty)
+            game_state = initialize_hangman_game(length, difficulty)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Нет слов с такими параметрами'}, status=400)
         
-        request.session['hangman'] = game_state
-        request.session.modified = True
+        state_store.hangman_games.start(request.user, game_state)
         
         # Готовим контекст
         context = prepare_hangman_context(game_state)
-        html = render_to_string('games/hangman_game.html', context)
+        html = fragments.HANGMAN_GAME.render(context)
         
         return JsonResponse({
             'html': html,
@@ -156,54 +156,125 @@ def hangman_new(request):
     
     return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
 
+@login_required
+def hangman_hint(request):
+    """AJAX: Подсказка следующей буквы в Виселице"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    strategy = request.GET.get('strategy', 'likely')
+    if strategy not in ('likely', 'split'):
+        return JsonResponse({'error': 'Некорректная стратегия'}, status=400)
+    
+    game_state = load_hangman_state(request)
+    if game_state.get('game_over', False):
+        return JsonResponse({'letter': None, 'error': 'Игра уже окончена'})
+    
+    started = time.perf_counter()
+    letter, probability, candidates = dictionary_hangman.get_dictionary().best_letter(
+        hangman_pattern(game_state), game_state['guessed_mask'], strategy
+    )
+    return JsonResponse({
+        'letter': letter,
+        'probability': round(probability, 3),
+        'candidates': candidates,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+    })
+
+def initialize_hangman_game(length=None, difficulty=None):
+    """Новая игра в Виселицу со случайным словом из словаря"""
+    word, word_mask = dictionary_hangman.get_dictionary().random_word(length, difficulty)
+    return {
+        'word': word,
+        'word_mask': word_mask,     # буквы слова (dictionary_hangman.word_mask)
+        'guessed_mask': 0,          # названные буквы
+        'wrong_guesses': 0,
+        'game_over': False,
+        'won': False
+    }
+
+def record_hangman_game(user, game_state):
+    """Записать законченную игру в Виселицу в GameSession"""
+    return recorder.record(
+        user,
+        'hangman',
+        'win' if game_state['won'] else 'lose',
+        score=len(game_state['word']) if game_state['won'] else 0,
+        game_data={'word': game_state['word'], 'wrong_guesses': game_state['wrong_guesses']},
+    )
+
+def find_hangman_state(request):
+    """Текущая игра в Виселицу из хранилища или None"""
+    # Игра, начатая до переноса партий из сессии в HangmanGame
+    legacy = request.session.pop('hangman', None)
+    if legacy:
+        if 'guessed_mask' not in legacy:
+            # Сессии, созданные до перехода на битовые маски
+            legacy['word_mask'] = dictionary_hangman.word_mask(legacy['word'])
+            legacy['guessed_mask'] = dictionary_hangman.word_mask(
+                letter for letter in legacy.pop('guessed', []) if dictionary_hangman.letter_mask(letter)
+            )
+        state_store.hangman_games.start(request.user, legacy)
+        return legacy
+    return state_store.hangman_games.get(request.user)
+
+def load_hangman_state(request):
+    """Текущая игра в Виселицу (новая, если игры еще нет)"""
+    game_state = find_hangman_state(request)
+    if game_state is None:
+        game_state = initialize_hangman_game()
+        state_store.hangman_games.start(request.user, game_state)
+    return game_state
+
+def hangman_pattern(game_state):
+    """Открытая часть слова: названные буквы на своих местах, остальное '_'"""
+    return dictionary_hangman.reveal(game_state['word'], game_state['guessed_mask'])
+
 def prepare_hangman_context(game_state):
     """Подготовка контекста для рендеринга Виселицы"""
-    display_word = ''
-    for letter in game_state['word']:
-        if letter in game_state['guessed']:
-            display_word += letter + ' '
-        else:
-            display_word += '_ '
-    
     return {
-        'display_word': display_word.strip(),
-        'guessed_letters': game_state['guessed'],
+        'display_word': ' '.join(hangman_pattern(game_state)),
+        'guessed_letters': dictionary_hangman.mask_to_letters(game_state['guessed_mask']),
         'wrong_guesses': game_state['wrong_guesses'],
         'game_over': game_state['game_over'],
         'won': game_state['won'],
         'word_length': len(game_state['word']),
         'full_word': game_state['word'],
-        'max_wrong': 7,
+        'max_wrong': HANGMAN_MAX_WRONG,
     }
 
 # ==================== 2048 ====================
 
+# Максимум ходов в одном запросе
+MAX_2048_BATCH = 32
+
+# Цели, предлагаемые при создании новой игры
+WIN_TILES_2048 = (256, 512, 1024, 2048, 4096, 8192, 16384)
+
 @login_required
 def game_2048(request):
     """Главная страница игры 2048"""
-    # Инициализация игры
-    if 'game_2048' not in request.session:
-        request.session['game_2048'] = initialize_2048_game()
+    game_state = load_2048_state(request)
     
-    game_state = request.session['game_2048']
+    # Рекорд берется из подтвержденных партий, если его еще нет в сессии
+    if '2048_high_score' not in request.session:
+        request.session['2048_high_score'] = GameSession.best_2048_score(request.user)
     
     # Подготовка контекста
     context = prepare_2048_context(game_state, request)
     
     # Если это AJAX запрос
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        html = render_to_string('games/2048_game.html', context)
+        html = fragments.GAME_2048.render(context)
         return JsonResponse({
             'html': html,
-            'game_state': {
-                'grid': game_state['grid'],
-                'score': game_state['score'],
-                'game_over': game_state['game_over'],
-                'won': game_state['won'],
-                'moves': game_state['moves']
-            }
+            'game_state': serialize_2048_state(game_state)
         })
     
+    # Варианты для новой игры
+    context['board_sizes'] = engine_nxn.SUPPORTED_SIZES
+    context['win_tiles'] = WIN_TILES_2048
+    
     return render(request, 'games/2048.html', context)
 
 @login_required
@@ -214,81 +285,83 @@ def game_2048_move(request):
             # Получаем данные из запроса
             if request.content_type == 'application/json':
                 data = json.loads(request.body)
-                direction = data.get('direction')
             else:
-                direction = request.POST.get('direction')
+                data = request.POST
+            
+            # Одно направление ('direction') или очередь ходов ('directions')
+            directions = data.get('directions')
+            batched = directions is not None
+            if not batched:
+                directions = [data.get('direction')]
             
-            if not direction or direction not in ['up', 'down', 'left', 'right']:
+            if not isinstance(directions, list) or not directions or len(directions) > MAX_2048_BATCH:
+                return JsonResponse({'error': 'Некорректный список ходов'}, status=400)
+            if any(direction not in engine_2048.DIRECTIONS for direction in directions):
                 return JsonResponse({'error': 'Некорректное направление'}, status=400)
             
+            # Режим ответа: 'full' - HTML фрагмент целиком, 'delta' - только изменения
+            mode = data.get('mode', 'full')
+            if mode not in ('full', 'delta'):
+                return JsonResponse({'error': 'Некорректный режим ответа'}, status=400)
+            
             # Получаем текущее состояние
-            game_state = request.session.get('game_2048', {})
-            if not game_state or 'grid' not in game_state:
-                game_state = initialize_2048_game()
-                request.session['game_2048'] = game_state
+            game_state = load_2048_state(request)
+            
+            # Клиент рассинхронизирован - отдаем полный фрагмент
+            resync = mode == 'delta' and str(data.get('moves')) != str(game_state['moves'])
             
             # Если игра окончена
             if game_state.get('game_over', False):
                 context = prepare_2048_context(game_state, request)
-                html = render_to_string('games/2048_game.html', context)
+                html = fragments.GAME_2048.render(context)
                 return JsonResponse({
                     'html': html,
-                    'game_state': {
-                        'grid': game_state['grid'],
-                        'score': game_state['score'],
-                        'game_over': game_state['game_over'],
-                        'won': game_state['won'],
-                        'moves': game_state['moves']
-                    },
+                    'game_state': serialize_2048_state(game_state),
                     'error': 'Игра уже окончена'
                 })
             
-            # Сохраняем старое состояние для сравнения
-            old_grid = [row[:] for row in game_state['grid']]
-            
-            # Делаем ход
-            moved = move_2048_tiles(game_state, direction)
-            
-            if moved:
-                game_state['moves'] += 1
-                add_new_2048_tile(game_state)
-                
-                # Проверка победы
-                if not game_state['won']:
-                    for row in game_state['grid']:
-                        if 2048 in row:
-                            game_state['won'] = True
-                            break
-                
-                # Проверка поражения
-                if not can_2048_move(game_state['grid']):
-                    game_state['game_over'] = True
-            
-            # Сохраняем состояние
-            request.session['game_2048'] = game_state
-            request.session.modified = True  # Важно: помечаем сессию как измененную
-            
-            # Обновляем рекорд
-            current_high_score = request.session.get('2048_high_score', 0)
-            if game_state['score'] > current_high_score:
-                request.session['2048_high_score'] = game_state['score']
-                request.session.modified = True
+            # Делаем ходы по очереди, пока игра не закончится
+            deltas = []
+            moved = False
+            for direction in directions:
+                if game_state['game_over']:
+                    break
+                old_board = game_state['board']
+                old_score = game_state['score']
+                step_moved = apply_2048_move(game_state, direction)
+                # Ход без изменений - null, а не пустой объект (он истинен в JS)
+                deltas.append(build_2048_delta(old_board, old_score, direction, game_state) if step_moved else None)
+                moved = moved or step_moved
+            
+            # Сохраняем состояние (ход, не изменивший поле, не считается)
+            if moved and not save_2048_state(request, game_state):
+                return state_conflict_response()
+            
+            message = 'Ход сделан!' if moved else 'Ход невозможен!'
+            
+            if mode == 'delta' and not resync:
+                response = {'deltas': deltas} if batched else {'delta': deltas[0]}
+                return JsonResponse({
+                    **response,
+                    'score': game_state['score'],
+                    'high_score': get_2048_high_score(request, game_state),
+                    'moves': game_state['moves'],
+                    'game_over': game_state['game_over'],
+                    'won': game_state['won'],
+                    'moved': moved,
+                    'message': message
+                })
             
             # Готовим контекст
             context = prepare_2048_context(game_state, request)
-            html = render_to_string('games/2048_game.html', context)
+            html = fragments.GAME_2048.render(context)
             
             return JsonResponse({
                 'html': html,
-                'game_state': {
-                    'grid': game_state['grid'],
-                    'score': game_state['score'],
-                    'game_over': game_state['game_over'],
-                    'won': game_state['won'],
-                    'moves': game_state['moves']
-                },
+                'game_state': serialize_2048_state(game_state),
                 'moved': moved,
-                'message': 'Ход сделан!' if moved else 'Ход невозможен!'
+                'resync': resync,
+                'message': message
             })
             
         except json.JSONDecodeError:
@@ -305,104 +378,389 @@ def game_2048_move(request):
 def game_2048_new(request):
     """AJAX: Новая игра 2048"""
     if request.method == 'POST':
+        try:
+            if request.content_type == 'application/json' and request.body:
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+            size, win_tile = parse_2048_board_params(data)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Некорректный размер поля или цель'}, status=400)
+        
         # Инициализируем новую игру
-        game_state = initialize_2048_game()
-        request.session['game_2048'] = game_state
-        request.session.modified = True
+        game_state = initialize_2048_game(size, win_tile)
+        state_store.games_2048.start(request.user, game_state)
         
         # Готовим контекст
         context = prepare_2048_context(game_state, request)
-        html = render_to_string('games/2048_game.html', context)
+        html = fragments.GAME_2048.render(context)
         
         return JsonResponse({
             'html': html,
-            'game_state': {
-                'grid': game_state['grid'],
-                'score': game_state['score'],
-                'game_over': game_state['game_over'],
-                'won': game_state['won'],
-                'moves': game_state['moves']
-            },
+            'game_state': serialize_2048_state(game_state),
             'message': '🚀 Новая игра началась!'
         })
     
     return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
 
-def initialize_2048_game():
-    """Инициализация новой игры 2048"""
+@login_required
+def game_2048_hint(request):
+    """AJAX: Подсказка лучшего хода в 2048"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        depth, time_budget = parse_2048_search_params(request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'Некорректные параметры поиска'}, status=400)
+    
+    game_state = load_2048_state(request)
+    if game_state['size'] != 4:
+        return JsonResponse({'error': 'Подсказки доступны только для поля 4x4'}, status=400)
+    if game_state.get('game_over', False):
+        return JsonResponse({'direction': None, 'error': 'Игра уже окончена'})
+    
+    result = expectimax_2048.best_move(game_state['board'], depth, time_budget)
+    
+    # Партия с подсказками, как и с автоигрой, не идет в рекорды и таблицы лидеров
+    if not game_state.get('assisted'):
+        game_state['assisted'] = True
+        if not save_2048_state(request, game_state, flush=True):
+            return state_conflict_response()
+    
+    return JsonResponse({
+        'direction': result['direction'],
+        'depth': result['depth'],
+        'nodes': result['nodes'],
+        'elapsed_ms': result['elapsed_ms'],
+    })
+
+@login_required
+def game_2048_autoplay(request):
+    """AJAX: Автоигра 2048 - сделать лучший ход по подсказке"""
+    if request.method == 'POST':
+        try:
+            if request.content_type == 'application/json' and request.body:
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+            depth, time_budget = parse_2048_search_params(data)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+        except ValueError:
+            return JsonResponse({'error': 'Некорректные параметры поиска'}, status=400)
+        
+        game_state = load_2048_state(request)
+        if game_state['size'] != 4:
+            return JsonResponse({'error': 'Подсказки доступны только для поля 4x4'}, status=400)
+        
+        direction = None
+        moved = False
+        if not game_state.get('game_over', False):
+            result = expectimax_2048.best_move(game_state['board'], depth, time_budget)
+            direction = result['direction']
+            game_state['assisted'] = True
+            if direction:
+                moved = apply_2048_move(game_state, direction)
+            else:
+                game_state['game_over'] = True
+            if not save_2048_state(request, game_state):
+                return state_conflict_response()
+        
+        context = prepare_2048_context(game_state, request)
+        html = fragments.GAME_2048.render(context)
+        
+        return JsonResponse({
+            'html': html,
+            'game_state': serialize_2048_state(game_state),
+            'direction': direction,
+            'moved': moved
+        })
+    
+    return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+
+@login_required
+def game_2048_undo(request):
+    """AJAX: Отменить последние ходы в 2048"""
+    if request.method == 'POST':
+        try:
+            if request.content_type == 'application/json' and request.body:
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+            steps = int(data.get('steps', 1))
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Некорректное число ходов'}, status=400)
+        
+        if steps < 1:
+            return JsonResponse({'error': 'Некорректное число ходов'}, status=400)
+        
+        game_state = load_2048_state(request)
+        
+        # Законченная партия уже записана в GameSession
+        if game_state.get('game_over', False):
+            return JsonResponse({'error': 'Игра уже окончена'}, status=400)
+        
+        undone = undo_2048_moves(game_state, steps)
+        if not save_2048_state(request, game_state):
+            return state_conflict_response()
+        
+        context = prepare_2048_context(game_state, request)
+        html = fragments.GAME_2048.render(context)
+        
+        return JsonResponse({
+            'html': html,
+            'game_state': serialize_2048_state(game_state),
+            'undone': undone,
+            'message': f'Отменено ходов: {undone}' if undone else 'Нечего отменять'
+        })
+    
+    return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+
+def parse_2048_search_params(data):
+    """Глубина и бюджет времени (мс) поиска подсказки из параметров запроса"""
+    depth = int(data.get('depth', expectimax_2048.DEFAULT_DEPTH))
+    budget_ms = float(data.get('budget_ms', expectimax_2048.DEFAULT_TIME_BUDGET * 1000))
+    return depth, budget_ms / 1000
+
+def parse_2048_board_params(data):
+    """Размер поля и целевая плитка новой игры из параметров запроса"""
+    size = int(data.get('size', 4))
+    win_tile = int(data.get('win_tile', 2048))
+    if size not in engine_nxn.SUPPORTED_SIZES:
+        raise ValueError(size)
+    if win_tile < 8 or win_tile > 1 << engine_2048.MAX_EXPONENT or win_tile & (win_tile - 1):
+        raise ValueError(win_tile)
+    return size, win_tile
+
+def get_2048_engine(game_state):
+    """Движок для размера поля партии (4x4 - битовые доски engine_2048)"""
+    return engine_nxn.get_engine(game_state.get('size', 4))
+
+def build_2048_delta(old_board, old_score, direction, game_state):
+    """Изменения поля после хода: перемещения, слияния, новая плитка и прирост счета"""
+    engine = get_2048_engine(game_state)
+    movements, merges = engine.trace_move(old_board, direction)
+    moved_board, _ = engine.move(old_board, direction)
+    
+    # Новая плитка - единственная клетка, отличающаяся от поля после сдвига
+    spawn = None
+    diff = game_state['board'] ^ moved_board
+    if diff:
+        pos = (diff.bit_length() - 1) // 4
+        i, j = divmod(pos, engine.SIZE)
+        spawn = [i, j, 1 << engine.get_cell(game_state['board'], i, j)]
+    
+    return {
+        'movements': [[fi, fj, ti, tj] for (fi, fj), (ti, tj) in movements],
+        'merges': [[i, j, 1 << e] for (i, j), e in merges],
+        'spawn': spawn,
+        'score_delta': game_state['score'] - old_score,
+    }
+
+def initialize_2048_game(size=4, win_tile=2048):
+    """Инициализация новой игры 2048 на поле size x size до плитки win_tile"""
+    seed = secrets.randbits(64)
     game_state = {
-        'grid': [[0, 0, 0, 0] for _ in range(4)],
+        'board': 0,
+        'size': size,
+        'win_tile': win_tile,
         'score': 0,
         'game_over': False,
         'won': False,
-        'moves': 0
+        'moves': 0,
+        'seed': seed,  # начальное зерно партии
+        'rng': seed,   # текущее состояние генератора плиток
+        'log': '',     # журнал ходов (replay_2048), по 2 бита на ход
+        'assisted': False,
+        'started': int(time.time()),
+        'undo': undo_2048.empty_history(size),
     }
     add_new_2048_tile(game_state)
     add_new_2048_tile(game_state)
     return game_state
 
+def load_2048_state(request):
+    """Текущая партия 2048 из хранилища (новая, если партии еще нет)"""
+    # Партия, начатая до переноса партий из сессии в Game2048
+    legacy = request.session.pop('game_2048', None)
+    if legacy:
+        game_state = upgrade_2048_state(legacy)
+        state_store.games_2048.start(request.user, game_state)
+        return game_state
+    
+    game_state = state_store.games_2048.get(request.user)
+    if game_state is None:
+        game_state = initialize_2048_game()
+        state_store.games_2048.start(request.user, game_state)
+    return game_state
+
+def upgrade_2048_state(game_state):
+    """Перевести состояние 2048 старого формата (из сессии) в текущий"""
+    if 'board' not in game_state:
+        # Сессии, созданные до перехода на битовое поле
+        if 'grid' not in game_state:
+            return initialize_2048_game()
+        game_state['board'] = engine_2048.from_grid(game_state.pop('grid'))
+    if 'rng' not in game_state:
+        # Партии, начатые до появления генератора в состоянии игры
+        # (журнал для них неполный, такие партии не подтверждаются)
+        game_state['seed'] = game_state['rng'] = secrets.randbits(64)
+        game_state['log'] = None
+    if 'undo' not in game_state:
+        game_state['undo'] = undo_2048.empty_history()
+    if 'size' not in game_state:
+        # Партии, начатые до появления полей другого размера
+        game_state['size'] = 4
+        game_state['win_tile'] = 2048
+    return game_state
+
+def serialize_2048_state(game_state):
+    """Состояние 2048 в формате ответа (с сеткой grid)"""
+    return {
+        'grid': get_2048_engine(game_state).to_grid(game_state['board']),
+        'size': game_state['size'],
+        'win_tile': game_state['win_tile'],
+        'score': game_state['score'],
+        'game_over': game_state['game_over'],
+        'won': game_state['won'],
+        'moves': game_state['moves'],
+        'undo_available': game_state['undo']['count']
+    }
+
+def apply_2048_move(game_state, direction):
+    """Применить ход: сдвиг, новая плитка, проверка победы и поражения"""
+    old_board = game_state['board']
+    old_score = game_state['score']
+    moved = move_2048_tiles(game_state, direction)
+    
+    if moved:
+        undo_2048.push(game_state['undo'], old_board, old_score)
+        if game_state.get('log') is not None:
+            game_state['log'] = replay_2048.append_move(game_state['log'], game_state['moves'], direction)
+        game_state['moves'] += 1
+        add_new_2048_tile(game_state)
+        
+        # Проверка победы
+        if not game_state['won']:
+            if engine_2048.max_exponent(game_state['board']) >= get_2048_win_exponent(game_state):
+                game_state['won'] = True
+        
+        # Проверка поражения
+        if not can_2048_move(game_state['board'], game_state['size']):
+            game_state['game_over'] = True
+    
+    return moved
+
+def get_2048_win_exponent(game_state):
+    """Показатель целевой плитки партии (11 для 2048)"""
+    return game_state.get('win_tile', 2048).bit_length() - 1
+
+def undo_2048_moves(game_state, steps):
+    """Отменить до steps последних ходов, вернуть число отмененных"""
+    undone = 0
+    while undone < steps:
+        entry = undo_2048.pop(game_state['undo'])
+        if entry is None:
+            break
+        game_state['board'], game_state['score'] = entry
+        undone += 1
+    
+    if undone:
+        game_state['moves'] -= undone
+        game_state['won'] = engine_2048.max_exponent(game_state['board']) >= get_2048_win_exponent(game_state)
+        
+        # Генератор отматывается назад, журнал укорачивается - запись партии остается проверяемой
+        rng = engine_2048.SeededRandom(game_state['rng'])
+        rng.rewind(undone * engine_2048.SPAWN_DRAWS)
+        game_state['rng'] = rng.state
+        if game_state.get('log') is not None:
+            game_state['log'] = replay_2048.truncate_log(game_state['log'], game_state['moves'])
+        game_state['assisted'] = True
+    
+    return undone
+
+def save_2048_state(request, game_state, flush=False):
+    """
+    Сохранить состояние 2048 в хранилище, записать законченную партию и обновить рекорд.
+    
+    Возвращает False, если партию успел изменить другой запрос: тогда ничего не записано.
+    """
+    finished = game_state['game_over'] and not game_state.get('recorded')
+    if finished:
+        game_state['recorded'] = True
+    if not state_store.games_2048.update(request.user, game_state, flush=flush):
+        return False
+    
+    if finished:
+        session = record_2048_game(request.user, game_state)
+        
+        # Рекорд в сессии обновляется только по окончании партии, которая идет в рекорды
+        # (как GameStats.best_score и таблица лидеров)
+        if session.is_ranked and game_state['score'] > request.session.get('2048_high_score', 0):
+            request.session['2048_high_score'] = game_state['score']
+    return True
+
+def state_conflict_response():
+    """Ответ на ход по устаревшему состоянию: клиент должен перечитать партию"""
+    return JsonResponse({'error': 'Партия изменена в другом окне, состояние обновлено', 'resync': True},
+                        status=409)
+
+def get_2048_high_score(request, game_state):
+    """Рекорд с учетом текущей партии (если она может пойти в рекорды)"""
+    record = request.session.get('2048_high_score', 0)
+    if game_state.get('size', 4) != 4 or game_state.get('assisted', False):
+        return record
+    return max(record, game_state.get('score', 0))
+
+def record_2048_game(user, game_state):
+    """Записать законченную партию 2048 (зерно и журнал ходов) в GameSession"""
+    game_data = {
+        'version': replay_2048.LOG_VERSION,
+        'seed': game_state.get('seed'),
+        'log': game_state.get('log'),
+        'moves': game_state['moves'],
+        'size': game_state.get('size', 4),
+        'win_tile': game_state.get('win_tile', 2048),
+        'max_tile': 1 << engine_2048.max_exponent(game_state['board']),
+        'assisted': game_state.get('assisted', False),
+    }
+    game_data['verified'] = game_data['log'] is not None and replay_2048.verify(game_data, game_state['score'])
+    
+    return recorder.record(
+        user,
+        '2048',
+        'win' if game_state['won'] else 'lose',
+        score=game_state['score'],
+        game_data=game_data,
+        duration=max(0, int(time.time()) - game_state.get('started', int(time.time()))),
+    )
+
 def add_new_2048_tile(game_state):
-    """Добавить новую плитку в 2048"""
-    empty_cells = []
-    for i in range(4):
-        for j in range(4):
-            if game_state['grid'][i][j] == 0:
-                empty_cells.append((i, j))
-    
-    if empty_cells:
-        i, j = random.choice(empty_cells)
-        game_state['grid'][i][j] = 2 if random.random() < 0.9 else 4
-        return True
-    return False
+    """Добавить новую плитку в 2048 (генератор партии хранится в состоянии)"""
+    engine = get_2048_engine(game_state)
+    board = game_state['board']
+    if not engine.has_empty(board):
+        return False
+    rng = engine_2048.SeededRandom(game_state['rng'])
+    game_state['board'] = engine.spawn_tile(board, rng)
+    game_state['rng'] = rng.state
+    return True
 
 def move_2048_tiles(game_state, direction):
     """Переместить плитки в 2048"""
-    grid = game_state['grid']
-    moved = False
-    score_add = 0
-    
-    if direction == 'left':
-        for i in range(4):
-            row, added_score = merge_2048_row(grid[i])
-            if row != grid[i]:
-                moved = True
-            grid[i] = row
-            score_add += added_score
-    
-    elif direction == 'right':
-        for i in range(4):
-            row, added_score = merge_2048_row(grid[i][::-1])
-            if row != grid[i][::-1]:
-                moved = True
-            grid[i] = row[::-1]
-            score_add += added_score
-    
-    elif direction == 'up':
-        for j in range(4):
-            column = [grid[i][j] for i in range(4)]
-            new_col, added_score = merge_2048_row(column)
-            if new_col != column:
-                moved = True
-            for i in range(4):
-                grid[i][j] = new_col[i]
-            score_add += added_score
-    
-    elif direction == 'down':
-        for j in range(4):
-            column = [grid[i][j] for i in range(4)]
-            new_col, added_score = merge_2048_row(column[::-1])
-            if new_col != column[::-1]:
-                moved = True
-            new_col = new_col[::-1]
-            for i in range(4):
-                grid[i][j] = new_col[i]
-            score_add += added_score
-    
+    board = game_state['board']
+    new_board, score_add = get_2048_engine(game_state).move(board, direction)
+    game_state['board'] = new_board
     game_state['score'] += score_add
-    return moved
+    return new_board != board
 
 def merge_2048_row(row):
-    """Объединить плитки в строке для 2048"""
+    """Объединить плитки в строке для 2048 (эталонная реализация для тестов движка)"""
     # Удаляем нули
     non_zero = [x for x in row if x != 0]
     added_score = 0
@@ -416,46 +774,25 @@ def merge_2048_row(row):
             non_zero.pop(i + 1)
         i += 1
     
-    # Дополняем нулями до длины 4
-    while len(non_zero) < 4:
+    # Дополняем нулями до длины строки
+    while len(non_zero) < len(row):
         non_zero.append(0)
     
     return non_zero, added_score
 
-def can_2048_move(grid):
+def can_2048_move(board, size=4):
     """Проверить, есть ли возможные ходы в 2048"""
-    # Проверка пустых клеток
-    for i in range(4):
-        for j in range(4):
-            if grid[i][j] == 0:
-                return True
-    
-    # Проверка возможных слияний по горизонтали
-    for i in range(4):
-        for j in range(3):
-            if grid[i][j] == grid[i][j + 1]:
-                return True
-    
-    # Проверка возможных слияний по вертикали
-    for j in range(4):
-        for i in range(3):
-            if grid[i][j] == grid[i + 1][j]:
-                return True
-    
-    return False
+    return engine_nxn.get_engine(size).can_move(board)
 
 def prepare_2048_context(game_state, request):
     """Подготовка контекста для 2048"""
-    high_score = request.session.get('2048_high_score', 0)
     current_score = game_state.get('score', 0)
-    
-    # Обновляем рекорд, если текущий счет больше
-    if current_score > high_score:
-        request.session['2048_high_score'] = current_score
-        high_score = current_score
+    high_score = get_2048_high_score(request, game_state)
     
     return {
-        'grid': game_state.get('grid', [[0,0,0,0],[0,0,0,0],[0,0,0,0],[0,0,0,0]]),
+        'grid': get_2048_engine(game_state).to_grid(game_state.get('board', 0)),
+        'board_size': game_state.get('size', 4),
+        'win_tile': game_state.get('win_tile', 2048),
         'score': current_score,
         'high_score': high_score,
         'game_over': game_state.get('game_over', False),
@@ -463,20 +800,351 @@ def prepare_2048_context(game_state, request):
         'moves': game_state.get('moves', 0),
     }
 
+# ==================== ВИКТОРИНА ====================
+
+# Вопросов в одной викторине по умолчанию и максимум
+QUIZ_DEFAULT_QUESTIONS = 10
+QUIZ_MAX_QUESTIONS = 50
+
+# Очки за правильный ответ по сложности
+QUIZ_POINTS = {'easy': 1, 'medium': 2, 'hard': 3}
+
+@login_required
+def quiz(request):
+    """Главная страница викторины"""
+    session = get_quiz_session(request.user)
+    context = prepare_quiz_context(session)
+    context.update({
+        'categories': QuizQuestion.CATEGORY_CHOICES,
+        'difficulties': QuizQuestion.DIFFICULTY_CHOICES,
+    })
+    return render(request, 'games/quiz.html', context)
+
+@login_required
+def quiz_start(request):
+    """AJAX: Начать викторину по категории и сложности"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        if request.content_type == 'application/json' and request.body:
+            data = json.loads(request.body)
+        else:
+            data = request.POST
+        category = data.get('category', 'general')
+        difficulty = data.get('difficulty', 'easy')
+        count = int(data.get('questions') or QUIZ_DEFAULT_QUESTIONS)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Некорректное число вопросов'}, status=400)
+    
+    if category not in dict(QuizQuestion.CATEGORY_CHOICES) or difficulty not in QUIZ_POINTS:
+        return JsonResponse({'error': 'Некорректная категория или сложность'}, status=400)
+    
+    available = quiz_pool.pools.size(category, difficulty)
+    if not available:
+        return JsonResponse({'error': 'Нет вопросов с такими параметрами'}, status=400)
+    
+    QuizSession.objects.filter(user=request.user, is_active=True).update(is_active=False)
+    session = QuizSession.objects.create(
+        user=request.user,
+        category=category,
+        difficulty=difficulty,
+        total_questions=max(1, min(count, QUIZ_MAX_QUESTIONS, available)),
+        offset=secrets.randbelow(available),
+    )
+    next_quiz_question(session)
+    session.save()
+    
+    return JsonResponse({
+        'html': fragments.QUIZ_GAME.render(prepare_quiz_context(session)),
+        'quiz_state': serialize_quiz_state(session),
+        'message': '🚀 Викторина началась!',
+    })
+
+@login_required
+def quiz_answer(request):
+    """AJAX: Ответить на текущий вопрос (answer - индекс варианта, null - пропустить)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        answer = data.get('answer')
+        if answer is not None:
+            answer = int(answer)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Некорректный ответ'}, status=400)
+    
+    session = get_quiz_session(request.user)
+    if session is None or session.current_question is None:
+        return JsonResponse({'error': 'Викторина не начата'}, status=400)
+    
+    question = session.current_question
+    if answer is not None and not 0 <= answer < len(question.options):
+        return JsonResponse({'error': 'Некорректный ответ'}, status=400)
+    
+    correct = answer == question.correct_answer
+    if answer is not None:
+        session.completed_questions = quiz_pool.mark_completed(session.completed_questions, session.step - 1)
+    if correct:
+        session.correct_answers += 1
+        session.score += QUIZ_POINTS[session.difficulty]
+    
+    if session.step >= session.total_questions:
+        finish_quiz(request.user, session)
+    else:
+        next_quiz_question(session)
+    session.save()
+    
+    return JsonResponse({
+        'html': fragments.QUIZ_GAME.render(prepare_quiz_context(session)),
+        'quiz_state': serialize_quiz_state(session),
+        'result': {
+            'correct': correct,
+            'skipped': answer is None,
+            'correct_answer': question.correct_answer,
+            'explanation': question.explanation,
+        },
+        'message': '✅ Верно!' if correct else ('⏭ Вопрос пропущен' if answer is None else '❌ Неверно'),
+    })
+
+def get_quiz_session(user):
+    """Активная викторина пользователя с текущим вопросом (один запрос) или None"""
+    return (
+        QuizSession.objects.filter(user=user, is_active=True)
+        .select_related('current_question')
+        .order_by('-id')
+        .first()
+    )
+
+def next_quiz_question(session):
+    """Выдать следующий вопрос сессии: одна выборка по первичному ключу из пула"""
+    question = None
+    for _ in range(quiz_pool.pools.size(session.category, session.difficulty)):
+        question_id = quiz_pool.pools.question_id(session.category, session.difficulty, session.offset, session.step)
+        question = QuizQuestion.objects.filter(pk=question_id, is_active=True).first()
+        if question is not None:
+            session.step += 1
+            break
+        # Вопрос отключили после построения пула - сдвигаемся на следующий
+        session.offset += 1
+    
+    session.current_question = question
+    if question is None:
+        session.is_active = False
+        session.completed_at = timezone.now()
+
+def finish_quiz(user, session):
+    """Закончить викторину и записать результат в GameSession"""
+    session.is_active = False
+    session.current_question = None
+    session.completed_at = timezone.now()
+    recorder.record(
+        user,
+        'quiz',
+        'win' if session.correct_answers * 2 >= session.total_questions else 'lose',
+        score=session.score,
+        game_data={
+            'category': session.category,
+            'difficulty': session.difficulty,
+            'correct': session.correct_answers,
+            'total': session.total_questions,
+        },
+        duration=int((session.completed_at - session.created_at).total_seconds()),
+    )
+
+def serialize_quiz_state(session):
+    """Состояние викторины для клиента (без правильного ответа)"""
+    question = session.current_question
+    return {
+        'active': session.is_active,
+        'step': session.step,
+        'total': session.total_questions,
+        'score': session.score,
+        'correct': session.correct_answers,
+        'answered': quiz_pool.completed_count(session.completed_questions),
+        'question': {
+            'id': question.pk,
+            'text': question.question,
+            'options': question.options,
+        } if question is not None else None,
+    }
+
+def prepare_quiz_context(session):
+    """Подготовка контекста для рендеринга викторины"""
+    if session is None:
+        return {'quiz': None}
+    question = session.current_question
+    return {
+        'quiz': session,
+        'question_text': question.question if question else '',
+        'options': list(enumerate(question.options)) if question else [],
+        'step': session.step,
+        'total': session.total_questions,
+        'score': session.score,
+        'correct': session.correct_answers,
+        'finished': not session.is_active,
+    }
+
+# ==================== ИГРА НА ПАМЯТЬ ====================
+
+@login_required
+def memory(request):
+    """Главная страница игры на память"""
+    game_state = request.session.get('memory_game')
+    if game_state is None or memory_board.is_finished(game_state):
+        game_state = memory_board.new_game()
+        request.session['memory_game'] = game_state
+    context = prepare_memory_context(game_state)
+    context['pair_choices'] = memory_board.PAIR_CHOICES
+    return render(request, 'games/memory.html', context)
+
+@login_required
+def memory_new(request):
+    """AJAX: Новая партия (pairs - число пар)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        pairs = int(data.get('pairs') or memory_board.DEFAULT_PAIRS)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Некорректное число пар'}, status=400)
+    if pairs not in memory_board.PAIR_CHOICES:
+        return JsonResponse({'error': 'Некорректное число пар'}, status=400)
+    
+    game_state = memory_board.new_game(pairs)
+    request.session['memory_game'] = game_state
+    return JsonResponse({
+        'html': fragments.MEMORY_GAME.render(prepare_memory_context(game_state)),
+        'memory_state': serialize_memory_state(game_state),
+        'message': '🃏 Новая игра началась!',
+    })
+
+@login_required
+def memory_flip(request):
+    """AJAX: Открыть карту (position). Проверка и ход - постоянная работа, без списка карт"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        position = data.get('position')
+        if isinstance(position, bool):
+            raise TypeError
+        position = int(position)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Некорректная позиция'}, status=400)
+    
+    game_state = request.session.get('memory_game')
+    if game_state is None:
+        return JsonResponse({'error': 'Игра не начата'}, status=400)
+    if not memory_board.can_flip(game_state, position):
+        return JsonResponse({'error': 'Эту карту нельзя открыть'}, status=400)
+    
+    first = game_state['first']
+    pair, result = memory_board.flip(game_state, position)
+    request.session['memory_game'] = game_state
+    
+    response = {
+        'position': position,
+        'symbol': memory_board.symbol(pair),
+        'result': result,
+        'memory_state': serialize_memory_state(game_state),
+    }
+    if result != 'first':
+        response['other'] = first
+    if memory_board.is_finished(game_state):
+        record_memory_game(request.user, game_state)
+        response['message'] = f'🎉 Все пары найдены! Очки: {memory_board.score(game_state)}'
+    return JsonResponse(response)
+
+def record_memory_game(user, game_state):
+    """Записать законченную игру на память в GameSession"""
+    return recorder.record(
+        user,
+        'memory',
+        'win',
+        score=memory_board.score(game_state),
+        game_data={
+            'pairs': game_state['pairs'],
+            'moves': game_state['moves'],
+            'mistakes': game_state['mistakes'],
+        },
+        duration=max(0, int(time.time()) - game_state['started']),
+    )
+
+def serialize_memory_state(game_state):
+    """Состояние партии для клиента (без раскладки)"""
+    return {
+        'pairs': game_state['pairs'],
+        'found': game_state['matched'].bit_count(),
+        'moves': game_state['moves'],
+        'mistakes': game_state['mistakes'],
+        'score': memory_board.score(game_state),
+        'finished': memory_board.is_finished(game_state),
+    }
+
+def prepare_memory_context(game_state):
+    """Подготовка контекста для рендеринга поля: открыты найденные пары и первая карта хода"""
+    cards = []
+    for position, pair in enumerate(memory_board.layout(game_state)):
+        shown = game_state['matched'] >> pair & 1 or position == game_state['first']
+        cards.append((position, memory_board.symbol(pair) if shown else ''))
+    context = serialize_memory_state(game_state)
+    context['cards'] = cards
+    return context
+
 # ==================== ОБЩИЕ ФУНКЦИИ ====================
 
+@login_required
+def fragment_stats(request):
+    """JSON: попадания в кэш игровых фрагментов этого процесса (для персонала)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    return JsonResponse({'fragments': fragments.stats()})
+
+@login_required
+def recorder_stats(request):
+    """JSON: очередь и задержка пакетной записи законченных игр этого процесса (для персонала)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    return JsonResponse({'recorder': recorder.stats()})
+
+@login_required
+def leaderboard_standings(request, board):
+    """JSON: первые места таблицы лидеров и место текущего игрока"""
+    if board not in leaderboard.leaderboards.boards:
+        return JsonResponse({'error': 'Неизвестная таблица'}, status=404)
+    try:
+        limit = int(request.GET.get('limit', leaderboard.TOP_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный limit'}, status=400)
+    limit = max(1, min(limit, leaderboard.TOP_LIMIT))
+    return JsonResponse(leaderboard.leaderboards.standings(board, request.user.pk, limit))
+
 @login_required
 def games_index(request):
     """Главная страница всех игр"""
-    # Статистика для пользователя
+    # Статистика для пользователя (сводки GameStats - один запрос)
     user_stats = {}
     
     if request.user.is_authenticated:
+        rollups = {stats.game_type: stats for stats in GameStats.objects.filter(user=request.user)}
+        empty = GameStats()
         user_stats = {
-            'rps_wins': request.session.get('rps_wins', 0),
-            'hangman_wins': request.session.get('hangman_wins', 0),
-            'game_2048_high_score': request.session.get('2048_high_score', 0),
-            'total_games': request.session.get('total_games_played', 0),
+            'rps_wins': rollups.get('rps', empty).wins,
+            'hangman_wins': rollups.get('hangman', empty).wins,
+            'game_2048_high_score': rollups.get('2048', empty).best_score,
+            'total_games': sum(stats.games for stats in rollups.values()),
         }
     
     context = {
@@ -525,10 +1193,9 @@ def rock_paper_scissors(request):
                 'result': result
             }
             
-            # Обновляем общую статистику побед
-            if result == 'win':
-                request.session['rps_wins'] = request.session.get('rps_wins', 0) + 1
-                request.session.modified = True
+            # Каждый раунд - отдельная игра в общей статистике
+            recorder.record(request.user, 'rps', result, score=int(result == 'win'),
+                            game_data={'user_choice': user_choice, 'computer_choice': computer_choice})
             
             return render(request, 'games/rock_paper_scissors.html', {
                 'wins': stats['wins'],
@@ -558,4 +1225,91 @@ def rock_paper_scissors(request):
         'draws': stats['draws'],
         'round': stats['round'],
         'show_result': False
-    })
\ No newline at end of file
+    })
+
+# Режимы соперника: случайный и предсказывающий по модели ходов игрока
+RPS_MODES = ('random', 'predictive')
+
+# Раундов в одном запросе
+RPS_MAX_ROUNDS = 100
+
+# Попыток сохранить модель соперника, если ее одновременно сохраняет другой запрос
+RPS_SAVE_ATTEMPTS = 5
+
+@login_required
+def rps_play(request):
+    """AJAX: Сыграть раунд (choice) или серию раундов (choices) против выбранного соперника"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    
+    mode = data.get('mode', 'random')
+    if mode not in RPS_MODES:
+        return JsonResponse({'error': 'Некорректный режим'}, status=400)
+    
+    choices = data.get('choices', [data.get('choice')])
+    if not isinstance(choices, list) or not 1 <= len(choices) <= RPS_MAX_ROUNDS:
+        return JsonResponse({'error': f'Нужно от 1 до {RPS_MAX_ROUNDS} ходов'}, status=400)
+    if not all(choice in rps_markov.CHOICES for choice in choices):
+        return JsonResponse({'error': 'Некорректный ход'}, status=400)
+    
+    rounds = play_rps_rounds(request.user, [rps_markov.CHOICES.index(choice) for choice in choices], mode)
+    
+    stats = request.session.get('rps_stats') or {'wins': 0, 'losses': 0, 'draws': 0, 'round': 0}
+    for game in rounds:
+        stats[{'win': 'wins', 'lose': 'losses', 'draw': 'draws'}[game['result']]] += 1
+    stats['round'] += len(rounds)
+    request.session['rps_stats'] = stats
+    request.session['rps_last_game'] = rounds[-1]
+    
+    return JsonResponse({'rounds': rounds, 'stats': stats, 'mode': mode})
+
+def play_rps_rounds(user, throws, mode):
+    """Сыграть раунды (ходы игрока - индексы rps_markov.CHOICES) и записать их в GameSession"""
+    predictor = None
+    if mode == 'predictive':
+        opponent, _ = RPSOpponent.objects.get_or_create(user=user)
+        predictor = rps_markov.MarkovPredictor(bytes(opponent.counts), opponent.history, opponent.rounds)
+    
+    rounds = []
+    for throw in throws:
+        if predictor is not None:
+            # Ход компьютера выбирается до того, как модель узнает ход игрока
+            computer = predictor.choose()
+            predictor.update(throw)
+        else:
+            computer = random.randrange(3)
+        
+        result = rps_markov.result(throw, computer)
+        game = {
+            'user_choice': rps_markov.CHOICES[throw],
+            'computer_choice': rps_markov.CHOICES[computer],
+            'result': result,
+        }
+        rounds.append(game)
+        recorder.record(user, 'rps', result, score=int(result == 'win'),
+                        game_data={'user_choice': game['user_choice'], 'computer_choice': game['computer_choice'],
+                                   'mode': mode})
+    
+    if predictor is not None:
+        # Число раундов служит версией модели: запись проходит, только если
+        # модель не сохранил за это время другой запрос
+        for _ in range(RPS_SAVE_ATTEMPTS):
+            saved = RPSOpponent.objects.filter(pk=opponent.pk, rounds=opponent.rounds).update(
+                counts=predictor.to_bytes(),
+                history=predictor.history,
+                rounds=predictor.rounds,
+                updated_at=timezone.now(),
+            )
+            if saved:
+                break
+            # Добавляем ходы этого запроса к сохраненной модели
+            opponent.refresh_from_db()
+            predictor = rps_markov.MarkovPredictor(bytes(opponent.counts), opponent.history, opponent.rounds)
+            for throw in throws:
+                predictor.update(throw)
+    return rounds
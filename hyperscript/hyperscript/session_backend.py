@@ -0,0 +1,36 @@
+"""
+Сессии с кэшем и записью в базу только при настоящем изменении.
+
+Сессия читается из кэша SESSION_CACHE_ALIAS (по умолчанию файловый кэш,
+общий для всех воркеров одной машины), в базу - только при промахе.
+Представления часто помечают сессию измененной (session.modified = True),
+даже если данные остались прежними; такое сохранение пропускается, поэтому
+ходы в играх не пишут в SQLite и не ждут ее блокировки.
+"""
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'hyperscript.sessions'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._snapshot = None
+
+    def _dump(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._snapshot = self._dump(data)
+        return data
+
+    def changed(self):
+        """Отличаются ли данные от прочитанных из кэша или базы"""
+        return self._snapshot is None or self._dump(self._session) != self._snapshot
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key is not None and not self.changed():
+            return
+        super().save(must_create)
+        self._snapshot = self._dump(self._session)
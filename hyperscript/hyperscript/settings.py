@@ -96,6 +96,48 @@ DATABASES = {
 }
 
 
+# Cache and sessions
+# Сессии читаются из файлового кэша, общего для воркеров одной машины,
+# и пишутся в базу только при изменении (hyperscript/session_backend.py);
+# игровые ключи сессии кодируются двоично (games/session_serializer.py).
+# FileBasedCache хранит записи в pickle, поэтому каталог - свой и закрытый
+# (0700), а не предсказуемый путь в общем /tmp
+
+SESSION_CACHE_DIR = os.environ.get('SESSION_CACHE_DIR', str(BASE_DIR / '.session_cache'))
+os.makedirs(SESSION_CACHE_DIR, mode=0o700, exist_ok=True)
+os.chmod(SESSION_CACHE_DIR, 0o700)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SESSION_CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Текущие партии до записи в таблицы (games/state_store.py): без срока
+    # жизни, в таблицу их пишет само хранилище
+    'game_state': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(SESSION_CACHE_DIR, 'games'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+SESSION_ENGINE = 'hyperscript.session_backend'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SERIALIZER = 'games.session_serializer.CompactSerializer'
+
+
+# Законченные игры пишутся в GameSession пакетами (games/recorder.py):
+# по GAME_RECORDER_BATCH_SIZE игр или через GAME_RECORDER_FLUSH_MS после первой в очереди
+
+GAME_RECORDER_BATCH_SIZE = 50
+GAME_RECORDER_FLUSH_MS = 500
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
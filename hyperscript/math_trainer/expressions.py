@@ -0,0 +1,221 @@
+"""
+Примеры-выражения: смешанные операции ('mixed') и уровень 'expert'.
+
+Выражение - дерево из чисел и операций + - × ÷ со скобками только там,
+где их требует приоритет операций. Все промежуточные результаты - целые
+неотрицательные числа, деление всегда нацело.
+
+Генерация табличная. Для каждого уровня один раз строится таблица всех
+допустимых выражений из 2-3 чисел, отсортированная по значению. Простые
+уровни берут из таблицы случайную строку; сложные соединяют две строки
+корневой операцией, а вторую строку для × и ÷ находят бинарным поиском
+по значению (делимое = делитель × частное), поэтому пример собирается
+за несколько обращений к таблице, без перебора и отбраковки.
+
+Числа примера хранятся в токене как программа в обратной польской записи:
+коды операций 0-3, число n записывается как n + LEAF_BASE.
+"""
+import random
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+ADD, SUB, MUL, DIV = range(4)
+ALL = (ADD, SUB, MUL, DIV)
+SIGNS = ('+', '-', '×', '÷')
+PRECEDENCE = (1, 1, 2, 2)
+
+# Код "операции" у отдельного числа и сдвиг чисел в программе
+LEAF = 4
+LEAF_BASE = 4
+
+# Частное при делении двух выражений
+MAX_QUOTIENT = 9
+
+# Попыток подобрать пару строк для корневой операции
+ATTEMPTS = 8
+
+# ops - операции, numbers - диапазон чисел, leaves - сколько чисел в строке
+# таблицы, combine - соединять ли две строки корневой операцией,
+# limit - наибольшее значение выражения и любой его части
+Level = namedtuple('Level', 'ops numbers leaves combine limit')
+
+LEVELS = {
+    ('mixed', 'easy'): Level(ALL, (1, 10), (3,), False, 100),
+    ('mixed', 'medium'): Level(ALL, (2, 15), (3,), False, 200),
+    ('mixed', 'hard'): Level(ALL, (2, 12), (2,), True, 500),
+    ('mixed', 'expert'): Level(ALL, (2, 12), (2, 3), True, 1000),
+    ('addition', 'expert'): Level((ADD,), (10, 99), (2,), True, 1000),
+    ('subtraction', 'expert'): Level((SUB,), (10, 99), (2,), True, 1000),
+    ('multiplication', 'expert'): Level((MUL,), (2, 12), (2,), True, 10000),
+    ('division', 'expert'): Level((DIV,), (2, 144), (2,), True, 1000),
+}
+
+# PARENS[операция потомка][операция родителя][потомок справа]
+PARENS = tuple(
+    tuple(
+        (child != LEAF and PRECEDENCE[child] < PRECEDENCE[parent],
+         child != LEAF and (PRECEDENCE[child] < PRECEDENCE[parent]
+                            or PRECEDENCE[child] == PRECEDENCE[parent] and parent in (SUB, DIV)))
+        for parent in ALL
+    )
+    for child in ALL + (LEAF,)
+)
+
+
+def is_expression(operation, difficulty):
+    """Генерируется ли пример (operation, difficulty) деревом выражения"""
+    return (operation, difficulty) in LEVELS
+
+
+def apply(op, a, b):
+    """Результат a op b или None, если он не целый неотрицательный"""
+    if op == ADD:
+        return a + b
+    if op == SUB:
+        return a - b if a >= b else None
+    if op == MUL:
+        return a * b
+    if b == 0 or a % b:
+        return None
+    return a // b
+
+
+def evaluate(program):
+    """Значение программы в обратной польской записи (ValueError, если она некорректна)"""
+    stack = []
+    for item in program:
+        if item >= LEAF_BASE:
+            stack.append(item - LEAF_BASE)
+            continue
+        if len(stack) < 2:
+            raise ValueError('Некорректное выражение')
+        b = stack.pop()
+        value = apply(item, stack.pop(), b)
+        if value is None:
+            raise ValueError('Недопустимая операция в выражении')
+        stack.append(value)
+    if len(stack) != 1:
+        raise ValueError('Некорректное выражение')
+    return stack[0]
+
+
+def _wrap(text, top, op, right):
+    return f'({text})' if PARENS[top][op][right] else text
+
+
+class ExpressionTable:
+    """Таблица выражений одного уровня, отсортированная по значению"""
+
+    def __init__(self, level):
+        self.level = level
+        self.ops = level.ops
+        self.limit = level.limit
+
+        rows = {}
+        for size, trees in self._build(level).items():
+            if size in level.leaves:
+                rows.update(trees)
+        rows = sorted(rows.items(), key=lambda row: (row[1][0], row[0]))
+
+        self.texts = [text for text, _ in rows]
+        self.values = [value for _, (value, _, _) in rows]
+        self.programs = [program for _, (_, program, _) in rows]
+        self.tops = [top for _, (_, _, top) in rows]
+        # Первая строка со значением не меньше 2 - множитель или делитель
+        self.factors_from = bisect_left(self.values, 2)
+
+    @staticmethod
+    def _build(level):
+        """{число чисел: {текст: (значение, программа, корневая операция)}}"""
+        low, high = level.numbers
+        trees = {1: {str(n): (n, (n + LEAF_BASE,), LEAF) for n in range(low, high + 1)}}
+        for size in range(2, max(level.leaves) + 1):
+            joined = {}
+            for left_size in range(1, size):
+                for left_text, (a, left_program, left_top) in trees[left_size].items():
+                    for right_text, (b, right_program, right_top) in trees[size - left_size].items():
+                        for op in level.ops:
+                            value = apply(op, a, b)
+                            if value is None or value > level.limit:
+                                continue
+                            text = (f'{_wrap(left_text, left_top, op, False)} {SIGNS[op]} '
+                                    f'{_wrap(right_text, right_top, op, True)}')
+                            joined.setdefault(text, (value, left_program + right_program + (op,), op))
+            trees[size] = joined
+        return trees
+
+    def __len__(self):
+        return len(self.texts)
+
+    def generate(self, rng=random):
+        """Один пример: {'question': '(3 + 4) × 2', 'answer': 14, 'operands': программа}"""
+        if not self.level.combine:
+            index = int(rng.random() * len(self.texts))
+            return {'question': self.texts[index], 'answer': self.values[index], 'operands': self.programs[index]}
+
+        choice = self._pick(rng.random)
+        if choice is None:
+            # Не нашлось пары для × или ÷ - берем одну строку таблицы
+            index = int(rng.random() * len(self.texts))
+            return {'question': self.texts[index], 'answer': self.values[index], 'operands': self.programs[index]}
+        op, left, right = choice
+        return {
+            'question': (f'{_wrap(self.texts[left], self.tops[left], op, False)} {SIGNS[op]} '
+                         f'{_wrap(self.texts[right], self.tops[right], op, True)}'),
+            'answer': apply(op, self.values[left], self.values[right]),
+            'operands': self.programs[left] + self.programs[right] + (op,),
+        }
+
+    def generate_many(self, count, rng=random):
+        generate = self.generate
+        return [generate(rng) for _ in range(count)]
+
+    def _pick(self, random):
+        """(операция, левая строка, правая строка) или None"""
+        values = self.values
+        size = len(values)
+        factors_from = self.factors_from
+        for _ in range(ATTEMPTS):
+            op = self.ops[int(random() * len(self.ops))]
+            if op == ADD:
+                left = int(random() * size)
+                stop = bisect_right(values, self.limit - values[left])
+                if not stop:
+                    continue
+                right = int(random() * stop)
+            elif op == SUB:
+                left = int(random() * size)
+                right = int(random() * size)
+                if values[left] < values[right]:
+                    left, right = right, left
+            elif op == MUL:
+                if factors_from >= size:
+                    return None
+                left = factors_from + int(random() * (size - factors_from))
+                stop = bisect_right(values, self.limit // values[left])
+                if stop <= factors_from:
+                    continue
+                right = factors_from + int(random() * (stop - factors_from))
+            else:
+                if factors_from >= size:
+                    return None
+                right = factors_from + int(random() * (size - factors_from))
+                target = values[right] * (2 + int(random() * (MAX_QUOTIENT - 1)))
+                start = bisect_left(values, target)
+                stop = bisect_right(values, target, start)
+                if start == stop:
+                    continue
+                left = start + int(random() * (stop - start))
+            return op, left, right
+        return None
+
+
+_tables = {}
+
+
+def table(operation, difficulty):
+    """Таблица уровня (строится при первом обращении)"""
+    key = (operation, difficulty)
+    if key not in _tables:
+        _tables[key] = ExpressionTable(LEVELS[key])
+    return _tables[key]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+def fill_checked_until(apps, schema_editor):
+    """Перенести отметку проверки из metrics последнего MathScore в профиль"""
+    MathScore = apps.get_model('math_trainer', 'MathScore')
+    UserMathProfile = apps.get_model('math_trainer', 'UserMathProfile')
+    latest = {}
+    rows = (
+        MathScore.objects.filter(metrics__has_key='checked_until')
+        .order_by('id')
+        .values_list('user_id', 'metrics')
+    )
+    for user_id, metrics in rows.iterator(chunk_size=1000):
+        latest[user_id] = max(latest.get(user_id, 0), metrics['checked_until'])
+    for user_id, checked_until in latest.items():
+        UserMathProfile.objects.update_or_create(user_id=user_id, defaults={'checked_until': checked_until})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('math_trainer', '0002_mathchallenge_usermathprofile_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermathprofile',
+            name='checked_until',
+            field=models.BigIntegerField(default=0, verbose_name='Ответы проверены до'),
+        ),
+        migrations.RunPython(fill_checked_until, migrations.RunPython.noop),
+    ]
@@ -526,6 +526,13 @@ class UserMathProfile(models.Model):
         verbose_name="Последняя активность"
     )
     
+    # Время выдачи (в сотых секунды) самого нового засчитанного токена:
+    # токены не новее отметки повторно не засчитываются
+    checked_until = models.BigIntegerField(
+        default=0,
+        verbose_name="Ответы проверены до"
+    )
+    
     class Meta:
         verbose_name = "Профиль математического тренажера"
         verbose_name_plural = "Профили математического тренажера"
@@ -0,0 +1,207 @@
+"""
+Примеры для тренажера: генерация и пулы заранее готовых примеров.
+
+Для каждой пары (операция, сложность) процесс держит очередь готовых
+примеров. Пакет примеров берется из очереди без генерации в потоке
+запроса; когда в очереди остается меньше LOW_WATER примеров, фоновый
+поток дополняет ее до POOL_SIZE. Если очередь все же опустела, примеры
+генерируются на месте.
+
+Внутри одного пакета примеры не повторяются. Смешанные операции и уровень
+'expert' генерируются модулем expressions.
+"""
+import random
+import threading
+import zlib
+from collections import deque
+
+from . import expressions
+
+# Диапазоны чисел по сложности
+DIFFICULTIES = {
+    'easy': (1, 10),
+    'medium': (10, 50),
+    'hard': (50, 100),
+}
+DEFAULT_DIFFICULTY = 'easy'
+
+# Все уровни сложности; 'expert' - только выражения (expressions.LEVELS)
+LEVELS = ('easy', 'medium', 'hard', 'expert')
+
+OPERATIONS = ('addition', 'subtraction', 'multiplication', 'division', 'mixed')
+
+# Размер пула и порог дозаполнения
+POOL_SIZE = 1024
+LOW_WATER = 256
+
+# Примеров в одном пакете
+MAX_BATCH = 50
+
+# Знак операции в тексте примера
+SIGNS = {
+    'addition': '+',
+    'subtraction': '-',
+    'multiplication': '×',
+    'division': '÷',
+}
+
+
+def operands_for(operation, difficulty, rng=random):
+    """Случайные числа примера операции operation"""
+    min_val, max_val = DIFFICULTIES.get(difficulty, DIFFICULTIES[DEFAULT_DIFFICULTY])
+    if operation == 'addition':
+        return rng.randint(min_val, max_val), rng.randint(min_val, max_val)
+    if operation == 'subtraction':
+        a = rng.randint(min_val, max_val)
+        return a, rng.randint(min_val, a)
+    if operation == 'multiplication':
+        return rng.randint(1, min(10, max_val)), rng.randint(1, min(10, max_val))
+    if operation == 'division':
+        b = rng.randint(1, 10)
+        return b * rng.randint(1, 10), b
+    raise ValueError(f'Неизвестная операция: {operation}')
+
+
+def solve(operation, operands, difficulty=DEFAULT_DIFFICULTY):
+    """Ответ примера по операции и числам"""
+    if expressions.is_expression(operation, difficulty):
+        return expressions.evaluate(operands)
+    a, b = operands
+    if operation == 'addition':
+        return a + b
+    if operation == 'subtraction':
+        return a - b
+    if operation == 'multiplication':
+        return a * b
+    if operation == 'division':
+        return a // b
+    raise ValueError(f'Неизвестная операция: {operation}')
+
+
+def make_problem(operation, operands):
+    a, b = operands
+    return {
+        'question': f"{a} {SIGNS[operation]} {b}",
+        'answer': solve(operation, operands),
+        'operands': operands,
+    }
+
+
+def generate(operation, difficulty, rng=random):
+    """Один пример: {'question': '3 + 4', 'answer': 7, 'operands': (3, 4)}"""
+    if difficulty not in LEVELS:
+        difficulty = DEFAULT_DIFFICULTY
+    if expressions.is_expression(operation, difficulty):
+        return expressions.table(operation, difficulty).generate(rng)
+    return make_problem(operation, operands_for(operation, difficulty, rng))
+
+
+def generate_many(operation, difficulty, count, rng=random):
+    if expressions.is_expression(operation, difficulty):
+        return expressions.table(operation, difficulty).generate_many(count, rng)
+    return [generate(operation, difficulty, rng) for _ in range(count)]
+
+
+def fingerprint(problem):
+    """Короткий отпечаток текста примера (для учета выданных примеров)"""
+    return zlib.crc32(problem['question'].encode())
+
+
+class ProblemPools:
+    """Очереди готовых примеров по (операция, сложность) с фоновым дозаполнением"""
+
+    def __init__(self, size=POOL_SIZE, low_water=LOW_WATER):
+        self.size = size
+        self.low_water = low_water
+        self.served = 0
+        self.generated_inline = 0
+        self.refills = 0
+        self._pools = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def take(self, operation, difficulty, count, exclude=()):
+        """
+        До count неповторяющихся примеров (меньше, если столько разных нет).
+        
+        exclude - отпечатки (fingerprint) уже выданных примеров, они пропускаются.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f'Неизвестная операция: {operation}')
+        if difficulty not in LEVELS:
+            difficulty = DEFAULT_DIFFICULTY
+        key = (operation, difficulty)
+
+        batch = {}
+        attempts = count * 4 + 16
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            while len(batch) < count and pool and attempts:
+                problem = pool.popleft()
+                if not exclude or fingerprint(problem) not in exclude:
+                    batch.setdefault(problem['question'], problem)
+                attempts -= 1
+            if len(pool) < self.low_water:
+                self._pending.add(key)
+                self._start_thread()
+                self._wakeup.notify()
+
+        # Очередь опустела - догенерировать на месте
+        inline = 0
+        while len(batch) < count and attempts:
+            problem = generate(operation, difficulty)
+            if not exclude or fingerprint(problem) not in exclude:
+                batch.setdefault(problem['question'], problem)
+            attempts -= 1
+            inline += 1
+
+        with self._lock:
+            self.served += len(batch)
+            self.generated_inline += inline
+        return list(batch.values())
+
+    def fill(self, operation, difficulty):
+        """Дополнить пул до size (в вызывающем потоке)"""
+        key = (operation, difficulty)
+        with self._lock:
+            missing = self.size - len(self._pools.get(key, ()))
+        if missing <= 0:
+            return
+        problems = generate_many(operation, difficulty, missing)
+        with self._lock:
+            self._pools.setdefault(key, deque()).extend(problems)
+            self.refills += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pools': {f'{operation}/{difficulty}': len(pool) for (operation, difficulty), pool in self._pools.items()},
+                'served': self.served,
+                'generated_inline': self.generated_inline,
+                'refills': self.refills,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+            self._pending.clear()
+
+    # ---------- фоновый поток ----------
+
+    def _start_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='math-problem-pools', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                key = self._pending.pop()
+            self.fill(*key)
+
+
+pools = ProblemPools()
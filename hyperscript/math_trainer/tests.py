@@ -1,3 +1,213 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from . import expressions, problems, tokens, views
+from .models import MathScore, UserMathProfile
+from .views import grade_answers
+
+
+class ProblemPoolTests(TestCase):
+    """Тесты пулов примеров и пакетной выдачи"""
+
+    def setUp(self):
+        problems.pools.clear()
+        self.user = User.objects.create_user('counter', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def test_generate_matches_answer(self):
+        for operation in problems.OPERATIONS:
+            for difficulty in problems.LEVELS:
+                for _ in range(50):
+                    problem = problems.generate(operation, difficulty)
+                    expression = problem['question'].replace('×', '*').replace('÷', '//')
+                    self.assertEqual(eval(expression), problem['answer'])
+
+    def test_batch_has_no_repeats(self):
+        pools = problems.ProblemPools(size=200, low_water=50)
+        pools.fill('multiplication', 'easy')
+        batch = pools.take('multiplication', 'easy', 50)
+        self.assertEqual(len(batch), 50)
+        self.assertEqual(len({problem['question'] for problem in batch}), 50)
+        self.assertEqual(pools.stats()['generated_inline'], 0)
+
+    def test_empty_pool_generates_inline(self):
+        pools = problems.ProblemPools(size=100, low_water=10)
+        self.assertEqual(len(pools.take('addition', 'hard', 10)), 10)
+        self.assertGreaterEqual(pools.stats()['generated_inline'], 10)
+
+    def test_batch_view(self):
+        data = self.client.get('/math/batch/division/?difficulty=medium&count=30').json()
+        self.assertEqual(len(data['problems']), 30)
+        self.assertEqual(len({problem['question'] for problem in data['problems']}), 30)
+        self.assertEqual(len(self.client.get('/math/batch/addition/?count=1000').json()['problems']),
+                         problems.MAX_BATCH)
+        self.assertEqual(self.client.get('/math/batch/logarithm/').status_code, 400)
+        self.assertEqual(self.client.get('/math/batch/addition/?count=x').status_code, 400)
+        self.assertEqual(self.client.get('/math/operation/logarithm/').json(), {'error': 'Invalid operation'})
+
+
+class ProblemTokenTests(TestCase):
+    """Тесты подписанных токенов и серверной проверки ответов"""
+
+    def setUp(self):
+        problems.pools.clear()
+        self.user = User.objects.create_user('signer', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def _check(self, answers):
+        return self.client.post('/math/check/', json.dumps({'answers': answers}), content_type='application/json')
+
+    def _token(self, operands=(3, 4), issued=None):
+        return tokens.issue(self.user.pk, 'addition', 'easy', operands, issued=issued or tokens.now_cs() - 1000)
+
+    def test_roundtrip_and_tampering(self):
+        token = tokens.issue(self.user.pk, 'division', 'hard', (96, 8), issued=12345)
+        self.assertEqual(tokens.verify(token, self.user.pk), ('division', 'hard', (96, 8), 12345))
+        self.assertLess(len(token), 40)
+        with self.assertRaises(tokens.TokenError):
+            tokens.verify(token, self.user.pk + 1)
+        forged = token[:5] + ('A' if token[5] != 'A' else 'B') + token[6:]
+        with self.assertRaises(tokens.TokenError):
+            tokens.verify(forged, self.user.pk)
+        with self.assertRaises(tokens.TokenError):
+            tokens.verify('!!!', self.user.pk)
+
+    def test_check_scores_batch_without_queries_per_answer(self):
+        batch = self.client.get('/math/batch/multiplication/?difficulty=easy&count=20').json()['problems']
+        # Ответа в выдаче нет - его считает тест по числам из токена
+        self.assertTrue(all(set(problem) == {'question', 'token'} for problem in batch))
+        answers = []
+        for k, problem in enumerate(batch):
+            _, _, operands, _ = tokens.verify(problem['token'], self.user.pk)
+            # Время ответов правдоподобно: примеры выданы «30 секунд назад»
+            answers.append({
+                'token': tokens.issue(self.user.pk, 'multiplication', 'easy', operands, issued=tokens.now_cs() - 3000),
+                'answer': problems.solve('multiplication', operands) if k % 4 else -1,
+                'elapsed': 1.5,
+            })
+        # Проверка ответов не обращается к базе
+        with self.assertNumQueries(0):
+            results, accepted = grade_answers(self.user, answers, 0)
+        self.assertEqual(len(accepted), 20)
+        data = self._check(answers).json()
+        self.assertEqual((data['correct_answers'], data['total_questions'], data['score']), (15, 20, 150))
+        saved = MathScore.objects.get(user=self.user)
+        self.assertEqual((saved.operation, saved.score, saved.time_spent, saved.max_streak), ('multiplication', 150, 30, 3))
+        self.assertTrue(saved.metrics['verified'])
+
+    def test_replay_and_implausible_answers_are_rejected(self):
+        token = self._token()
+        self.assertEqual(self._check([{'token': token, 'answer': 7, 'elapsed': 2}]).json()['score'], 10)
+        # Повторная отправка того же токена
+        data = self._check([{'token': token, 'answer': 7, 'elapsed': 2}]).json()
+        self.assertEqual(data['results'], [{'rejected': 'used'}])
+        # Слишком быстрый ответ, просроченный и чужой токен
+        other = User.objects.create_user('other', password='secret-pass')
+        data = self._check([
+            {'token': self._token(), 'answer': 7, 'elapsed': 0.01},
+            {'token': self._token(issued=tokens.now_cs() - 10 ** 6), 'answer': 7, 'elapsed': 2},
+            {'token': tokens.issue(other.pk, 'addition', 'easy', (3, 4)), 'answer': 7, 'elapsed': 2},
+        ]).json()
+        self.assertEqual(data['results'], [{'rejected': 'elapsed'}, {'rejected': 'expired'}, {'rejected': 'invalid'}])
+        # Сумма времени ответов больше времени с выдачи
+        data = self._check([{'token': self._token(issued=tokens.now_cs() - 100), 'answer': 7, 'elapsed': 60}]).json()
+        self.assertEqual(data['results'], [{'rejected': 'elapsed'}])
+        self.assertEqual(MathScore.objects.count(), 1)
+
+    def test_replay_after_new_login_is_rejected(self):
+        token = self._token()
+        self.assertEqual(self._check([{'token': token, 'answer': 7, 'elapsed': 2}]).json()['score'], 10)
+        # Новый вход - новая сессия, но отметка проверки хранится у пользователя
+        self.client.logout()
+        self.client.force_login(self.user)
+        data = self._check([{'token': token, 'answer': 7, 'elapsed': 2}]).json()
+        self.assertEqual(data['results'], [{'rejected': 'used'}])
+        self.assertEqual(MathScore.objects.count(), 1)
+
+    def test_concurrent_repeated_submission_is_rejected(self):
+        answers = [{'token': self._token(), 'answer': 7, 'elapsed': 2}]
+        self.assertEqual(self._check(answers).json()['score'], 10)
+        checked_until = UserMathProfile.objects.get(user=self.user).checked_until
+        self.assertGreater(checked_until, 0)
+        # Повтор прочитал отметку до того, как первая проверка ее сдвинула
+        def stale(user, items, checked_until):
+            return grade_answers(user, items, 0)
+
+        with mock.patch.object(views, 'grade_answers', side_effect=stale):
+            response = self._check(answers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(MathScore.objects.count(), 1)
+        self.assertEqual(UserMathProfile.objects.get(user=self.user).checked_until, checked_until)
+
+    def test_unverified_score_endpoint_is_gone(self):
+        response = self.client.post('/math/save-score/', json.dumps({'operation': 'addition', 'score': 10 ** 6}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(MathScore.objects.exists())
+
+
+class ExpressionTests(TestCase):
+    """Тесты генератора выражений (смешанные операции и уровень 'expert')"""
+
+    def setUp(self):
+        problems.pools.clear()
+        self.user = User.objects.create_user('expressions', password='secret-pass')
+        self.client.force_login(self.user)
+
+    def test_expressions_are_integer_and_respect_precedence(self):
+        for operation, difficulty in expressions.LEVELS:
+            for problem in expressions.table(operation, difficulty).generate_many(300):
+                # Обычное деление: каждое частное должно быть целым
+                value = eval(problem['question'].replace('×', '*').replace('÷', '/'))
+                self.assertEqual(value, problem['answer'], problem['question'])
+                self.assertEqual(expressions.evaluate(problem['operands']), problem['answer'])
+                self.assertGreaterEqual(problem['answer'], 0)
+        add, mul = expressions.LEAF_BASE + 2, expressions.LEAF_BASE + 3
+        self.assertEqual(expressions.evaluate((add, mul, expressions.ADD, add, expressions.MUL)), 10)
+        # Пустая программа, деление с остатком, отрицательная разность, лишние числа
+        for program in ((), (add, mul, expressions.DIV), (add, mul, expressions.SUB), (add, expressions.ADD), (add, add)):
+            with self.assertRaises(ValueError):
+                expressions.evaluate(program)
+
+    def test_parentheses_only_where_needed(self):
+        texts = set(expressions.table('mixed', 'easy').texts)
+        self.assertIn('(2 + 3) × 4', texts)
+        self.assertIn('2 + 3 × 4', texts)
+        self.assertIn('9 - (5 - 2)', texts)
+        self.assertNotIn('(2 × 3) + 4', texts)
+        self.assertNotIn('(9 - 5) - 2', texts)
+
+    def test_no_repeats_within_training(self):
+        url = '/math/batch/mixed/?difficulty=hard&count=50'
+        first = self.client.get(url + '&fresh=1').json()['problems']
+        questions = [problem['question'] for problem in first]
+        for _ in range(5):
+            questions += [problem['question'] for problem in self.client.get(url).json()['problems']]
+        self.assertEqual(len(questions), 300)
+        self.assertEqual(len(set(questions)), 300)
+        # Новая тренировка начинается с чистого листа
+        self.client.get(url + '&fresh=1')
+        self.assertEqual(len(self.client.session['math_seen']['hashes']), 50)
+
+    def test_expert_answers_are_checked_from_tokens(self):
+        batch = self.client.get('/math/batch/division/?difficulty=expert&count=5').json()['problems']
+        self.assertEqual(len(batch), 5)
+        answers = []
+        for problem in batch:
+            operation, difficulty, operands, _ = tokens.verify(problem['token'], self.user.pk)
+            self.assertEqual((operation, difficulty), ('division', 'expert'))
+            answers.append({
+                'token': tokens.issue(self.user.pk, operation, difficulty, operands, issued=tokens.now_cs() - 3000),
+                'answer': problems.solve(operation, operands, difficulty),
+                'elapsed': 3,
+            })
+        data = self.client.post('/math/check/', json.dumps({'answers': answers}),
+                                content_type='application/json').json()
+        self.assertEqual((data['correct_answers'], data['score']), (5, 50))
+        self.assertEqual(MathScore.objects.get(user=self.user).difficulty, 'expert')
+        problem = self.client.get('/math/operation/mixed/?difficulty=expert').json()
+        self.assertNotIn('answer', problem)
+        self.assertEqual(tokens.verify(problem['token'], self.user.pk)[:2], ('mixed', 'expert'))
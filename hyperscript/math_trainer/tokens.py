@@ -0,0 +1,102 @@
+"""
+Подписанные токены примеров тренажера.
+
+Токен несет все, что нужно для проверки ответа: операцию, сложность,
+числа примера и время выдачи. Он подписан HMAC-SHA256 (ключ - SECRET_KEY,
+в подпись входит id пользователя), поэтому ответы проверяются без чтения
+из базы или сессии: сервер восстанавливает пример из токена и сам
+считает правильный ответ.
+
+Формат (base64url без '='):
+    версия | операция | сложность | время выдачи (сотые доли секунды, varint)
+    | число операндов | операнды (varint) | 12 байт подписи
+
+У выражений (смешанные операции, уровень 'expert') операнды - программа
+в обратной польской записи (см. expressions).
+"""
+import base64
+import hmac
+import time
+
+from django.utils.crypto import salted_hmac
+
+from . import problems
+
+VERSION = 1
+SIGNATURE_SIZE = 12
+
+_SALT = 'math_trainer.tokens'
+
+OPERATIONS = problems.OPERATIONS
+DIFFICULTIES = problems.LEVELS
+
+
+class TokenError(ValueError):
+    """Токен поврежден, подделан или выдан другому пользователю"""
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise TokenError('Токен поврежден')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise TokenError('Токен поврежден')
+
+
+def _signature(payload, user_id):
+    return salted_hmac(_SALT, payload + b'|' + str(user_id).encode(), algorithm='sha256').digest()[:SIGNATURE_SIZE]
+
+
+def now_cs():
+    """Текущее время в сотых долях секунды"""
+    return int(time.time() * 100)
+
+
+def issue(user_id, operation, difficulty, operands, issued=None):
+    """Токен примера для пользователя user_id"""
+    payload = bytearray((VERSION, OPERATIONS.index(operation), DIFFICULTIES.index(difficulty)))
+    _varint(now_cs() if issued is None else issued, payload)
+    _varint(len(operands), payload)
+    for operand in operands:
+        _varint(operand, payload)
+    payload = bytes(payload)
+    return base64.urlsafe_b64encode(payload + _signature(payload, user_id)).rstrip(b'=').decode('ascii')
+
+
+def verify(token, user_id):
+    """(операция, сложность, операнды, время выдачи) или TokenError"""
+    if not isinstance(token, str) or not token.isascii():
+        raise TokenError('Некорректный токен')
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except ValueError:
+        raise TokenError('Некорректный токен')
+    payload, signature = data[:-SIGNATURE_SIZE], data[-SIGNATURE_SIZE:]
+    if len(payload) < 4 or not hmac.compare_digest(signature, _signature(payload, user_id)):
+        raise TokenError('Неверная подпись')
+    if payload[0] != VERSION or payload[1] >= len(OPERATIONS) or payload[2] >= len(DIFFICULTIES):
+        raise TokenError('Неизвестный формат токена')
+
+    issued, pos = _read_varint(payload, 3)
+    count, pos = _read_varint(payload, pos)
+    operands = []
+    for _ in range(count):
+        operand, pos = _read_varint(payload, pos)
+        operands.append(operand)
+    if pos != len(payload):
+        raise TokenError('Токен поврежден')
+    return OPERATIONS[payload[1]], DIFFICULTIES[payload[2]], tuple(operands), issued
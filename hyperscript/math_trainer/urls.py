@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.math_trainer, name='math_trainer'),
     path('operation/<str:operation>/', views.math_operation, name='math_operation'),
-    path('save-score/', views.save_math_score, name='save_math_score'),
+    path('batch/<str:operation>/', views.math_batch, name='math_batch'),
+    path('check/', views.math_check, name='math_check'),
     #path('stats/', views.math_stats, name='math_stats'),
 ]
\ No newline at end of file
@@ -1,9 +1,12 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import JsonResponse
-import random
 import json
-from .models import MathScore
+import math
+
+from . import expressions, problems, tokens
+from .models import MathScore, UserMathProfile
 
 @login_required
 def math_trainer(request):
@@ -11,68 +14,220 @@ def math_trainer(request):
 
 @login_required
 def math_operation(request, operation):
-    difficulties = {
-        'easy': (1, 10),
-        'medium': (10, 50),
-        'hard': (50, 100)
-    }
+    difficulty = request.GET.get('difficulty', 'easy')
     
+    try:
+        problem = problems.generate(operation, difficulty)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid operation'})
+    
+    # Ответ не отдается: его знает только сервер (по токену)
+    return JsonResponse({
+        'question': problem['question'],
+        'token': issue_token(request.user, operation, difficulty, problem),
+        'difficulty': difficulty
+    })
+
+@login_required
+def math_batch(request, operation):
+    """Пакет неповторяющихся примеров (count штук) из заранее подготовленного пула"""
     difficulty = request.GET.get('difficulty', 'easy')
-    min_val, max_val = difficulties.get(difficulty, (1, 10))
-    
-    if operation == 'addition':
-        a = random.randint(min_val, max_val)
-        b = random.randint(min_val, max_val)
-        question = f"{a} + {b}"
-        answer = a + b
-    elif operation == 'subtraction':
-        a = random.randint(min_val, max_val)
-        b = random.randint(min_val, a)
-        question = f"{a} - {b}"
-        answer = a - b
-    elif operation == 'multiplication':
-        a = random.randint(1, min(10, max_val))
-        b = random.randint(1, min(10, max_val))
-        question = f"{a} × {b}"
-        answer = a * b
-    elif operation == 'division':
-        b = random.randint(1, 10)
-        a = b * random.randint(1, 10)
-        question = f"{a} ÷ {b}"
-        answer = a // b
+    if difficulty not in problems.LEVELS:
+        difficulty = problems.DEFAULT_DIFFICULTY
+    try:
+        count = int(request.GET.get('count', 20))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid count'}, status=400)
+    count = max(1, min(count, problems.MAX_BATCH))
+    
+    if operation not in problems.OPERATIONS:
+        return JsonResponse({'error': 'Invalid operation'}, status=400)
+    if expressions.is_expression(operation, difficulty):
+        batch = take_unseen(request, operation, difficulty, count)
     else:
-        return JsonResponse({'error': 'Invalid operation'})
+        batch = problems.pools.take(operation, difficulty, count)
     
     return JsonResponse({
-        'question': question,
-        'answer': answer,
+        'problems': [
+            {
+                'question': problem['question'],
+                'token': issue_token(request.user, operation, difficulty, problem),
+            }
+            for problem in batch
+        ],
         'difficulty': difficulty
     })
 
+# Сколько выданных выражений помнить за одну тренировку
+MAX_SEEN = 1000
+
+def take_unseen(request, operation, difficulty, count):
+    """
+    Пакет выражений, которые еще не выдавались в этой тренировке.
+    
+    Отпечатки выданных примеров хранятся в сессии; тренировка начинается
+    заново при смене операции или сложности и по параметру fresh=1.
+    """
+    kind = f'{operation}/{difficulty}'
+    seen = request.session.get('math_seen')
+    if not seen or seen['kind'] != kind or request.GET.get('fresh'):
+        seen = {'kind': kind, 'hashes': []}
+    hashes = seen['hashes']
+    
+    batch = problems.pools.take(operation, difficulty, count, exclude=set(hashes))
+    hashes.extend(problems.fingerprint(problem) for problem in batch)
+    seen['hashes'] = hashes[-MAX_SEEN:]
+    request.session['math_seen'] = seen
+    return batch
+
+# Очки за правильный ответ
+SCORE_PER_CORRECT = 10
+
+# Сколько живет токен примера и допустимое расхождение часов (сотые доли секунды)
+TOKEN_TTL = 15 * 60 * 100
+CLOCK_SKEW = 5 * 100
+
+# Правдоподобное время ответа на один пример (секунды)
+MIN_ANSWER_TIME = 0.2
+MAX_ANSWER_TIME = 300
+
+# Ответов в одной проверке
+MAX_CHECK = 500
+
+def issue_token(user, operation, difficulty, problem):
+    if difficulty not in problems.LEVELS:
+        difficulty = problems.DEFAULT_DIFFICULTY
+    return tokens.issue(user.pk, operation, difficulty, problem['operands'])
+
 @login_required
-def save_math_score(request):
-    if request.method == 'POST':
+def math_check(request):
+    """
+    Проверить пакет ответов [{token, answer, elapsed}] и сохранить результат в MathScore.
+    
+    Пример и правильный ответ восстанавливаются из подписанных токенов, без
+    чтения из базы. Токены, выданные не позже последней проверки этого
+    пользователя (UserMathProfile.checked_until), повторно не засчитываются -
+    в том числе после нового входа. Отметка сдвигается условным UPDATE: из
+    двух одновременных проверок одного пакета результат сохраняет одна.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
         data = json.loads(request.body)
-        operation = data.get('operation')
-        difficulty = data.get('difficulty')
-        score = data.get('score', 0)
-        total_questions = data.get('total_questions', 0)
-        correct_answers = data.get('correct_answers', 0)
-        time_spent = data.get('time_spent', 0)
+        items = data['answers']
+    except (json.JSONDecodeError, TypeError, KeyError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_CHECK:
+        return JsonResponse({'error': f'Expected 1 to {MAX_CHECK} answers'}, status=400)
+    
+    profile, _ = UserMathProfile.objects.get_or_create(user=request.user)
+    results, accepted = grade_answers(request.user, items, profile.checked_until)
+    if not accepted:
+        return JsonResponse({'error': 'No valid answers', 'results': results}, status=400)
+    
+    kinds = {(item['operation'], item['difficulty']) for item in accepted}
+    if len(kinds) > 1:
+        return JsonResponse({'error': 'Answers belong to different trainings'}, status=400)
+    operation, difficulty = kinds.pop()
+    
+    correct = streak = max_streak = 0
+    for item in accepted:
+        streak = streak + 1 if item['correct'] else 0
+        max_streak = max(max_streak, streak)
+        correct += item['correct']
+    time_spent = sum(item['elapsed'] for item in accepted)
+    issued = [item['issued'] for item in accepted]
+    
+    with transaction.atomic():
+        # Отметка сдвигается, только если ее не сдвинула за это время другая проверка
+        claimed = UserMathProfile.objects.filter(
+            user=request.user, checked_until__lt=min(issued)
+        ).update(checked_until=max(issued))
+        if not claimed:
+            return JsonResponse({'error': 'Answers already checked'}, status=409)
         
         math_score = MathScore.objects.create(
             user=request.user,
             operation=operation,
             difficulty=difficulty,
-            score=score,
-            total_questions=total_questions,
-            correct_answers=correct_answers,
-            time_spent=time_spent
+            score=correct * SCORE_PER_CORRECT,
+            total_questions=len(accepted),
+            correct_answers=correct,
+            time_spent=round(time_spent),
+            max_streak=max_streak,
+            metrics={
+                'verified': True,
+                'rejected': len(items) - len(accepted),
+            },
         )
+    
+    return JsonResponse({
+        'status': 'success',
+        'score_id': math_score.id,
+        'score': math_score.score,
+        'correct_answers': correct,
+        'total_questions': len(accepted),
+        'results': results,
+    })
+
+def grade_answers(user, items, checked_until):
+    """Результат по каждому ответу и список засчитанных ответов (в порядке пакета)"""
+    now = tokens.now_cs()
+    seen = set()
+    results = []
+    accepted = []
+    first_issued = None
+    
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({'rejected': 'invalid'})
+            continue
+        try:
+            operation, difficulty, operands, issued = tokens.verify(item.get('token'), user.pk)
+        except tokens.TokenError:
+            results.append({'rejected': 'invalid'})
+            continue
+        if item['token'] in seen:
+            results.append({'rejected': 'duplicate'})
+            continue
+        seen.add(item['token'])
+        if not now - TOKEN_TTL <= issued <= now + CLOCK_SKEW:
+            results.append({'rejected': 'expired'})
+            continue
+        if issued <= checked_until:
+            results.append({'rejected': 'used'})
+            continue
+        
+        elapsed = item.get('elapsed')
+        if (isinstance(elapsed, bool) or not isinstance(elapsed, (int, float)) or not math.isfinite(elapsed)
+                or not MIN_ANSWER_TIME <= elapsed <= MAX_ANSWER_TIME):
+            results.append({'rejected': 'elapsed'})
+            continue
         
-        return JsonResponse({'status': 'success', 'score_id': math_score.id})
+        try:
+            answer = problems.solve(operation, operands, difficulty)
+        except (ValueError, ZeroDivisionError):
+            results.append({'rejected': 'invalid'})
+            continue
+        given = item.get('answer')
+        correct = not isinstance(given, bool) and isinstance(given, (int, float)) and given == answer
+        
+        first_issued = issued if first_issued is None else min(first_issued, issued)
+        accepted.append({
+            'operation': operation,
+            'difficulty': difficulty,
+            'issued': issued,
+            'elapsed': elapsed,
+            'correct': correct,
+        })
+        results.append({'correct': correct, 'answer': answer})
     
-    return JsonResponse({'status': 'error'})
+    # Сумма времени ответов не может превышать время с выдачи первого примера
+    if accepted and sum(item['elapsed'] for item in accepted) * 100 > now - first_issued + CLOCK_SKEW:
+        results = [{'rejected': 'elapsed'} if 'rejected' not in result else result for result in results]
+        accepted = []
+    return results, accepted
 
 @login_required
 def math_stats(request):